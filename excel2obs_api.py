@@ -0,0 +1,271 @@
+"""Local HTTP API (loopback only): pushed cell values, overlay pages over Server-Sent Events, metrics and diagnostics.
+self.server.app is the ExcelToOBS instance; see LocalAPIHandler for the routes."""
+import hmac
+import json
+import logging
+import os
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+from openpyxl.utils.cell import coordinate_from_string, column_index_from_string, get_column_letter, range_boundaries
+from openpyxl.utils.exceptions import CellCoordinatesException
+
+from excel2obs_diagnostics import PROFILE_WINDOW_SECONDS, format_memory_report
+from excel2obs_flight import FLIGHT
+from excel2obs_metrics import METRICS, TRACES, format_trace_report
+
+# Local HTTP API (loopback only) where producers push cell values instead of writing the workbook
+LOCAL_API_HOST = "127.0.0.1"
+LOCAL_API_MAX_BODY_BYTES = 1 << 20
+LOCAL_API_LOCAL_HOSTS = ("127.0.0.1", "localhost", "::1")  # Origin hosts allowed to POST/DELETE; browsers on other sites are refused
+LOCAL_API_TOKEN_HEADER = "X-Excel2OBS-Token"  # must carry obs_settings.local_api_token on POST/DELETE when that is set
+# Overlay pages (served by the local API) get cell values over Server-Sent Events instead of SetInputSettings
+OVERLAY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "overlays")
+OVERLAY_MAX_CELLS = 2000  # per subscription
+OVERLAY_KEEPALIVE_SECONDS = 15
+
+# --- Local HTTP API ---
+def parse_cell_address(address):
+    """'B3' -> (2, 1): the 0-based (row, col) the mapping rows use internally."""
+    try: column, row = coordinate_from_string(str(address).strip().upper())
+    except CellCoordinatesException: raise ValueError(f"Invalid cell address '{address}'") from None
+    if row < 1: raise ValueError(f"Invalid cell address '{address}'")
+    return row - 1, column_index_from_string(column) - 1
+
+def normalize_cell_value(value):
+    """Pushed values are shaped like cached workbook cells: blanks become '' and whole floats become ints."""
+    if value is None: return ""
+    if isinstance(value, float) and value.is_integer(): return int(value)
+    return value
+
+def expand_cell_list(spec):
+    """'B3, C4:D5' -> ['B3', 'C4', 'D4', 'C5', 'D5']. Raises ValueError on bad or oversized lists."""
+    addresses = []
+    for part in filter(None, (part.strip().upper() for part in str(spec).split(","))):
+        if ":" in part:
+            try: min_col, min_row, max_col, max_row = range_boundaries(part)
+            except (ValueError, TypeError, CellCoordinatesException): raise ValueError(f"Invalid cell range '{part}'") from None
+            if None in (min_col, min_row) or (max_row - min_row + 1) * (max_col - min_col + 1) > OVERLAY_MAX_CELLS: raise ValueError(f"Cell range '{part}' is unbounded or too large")
+            addresses += [f"{get_column_letter(col)}{row}" for row in range(min_row, max_row + 1) for col in range(min_col, max_col + 1)]
+        else: parse_cell_address(part); addresses.append(part)
+    if not addresses or len(addresses) > OVERLAY_MAX_CELLS: raise ValueError(f"Request between 1 and {OVERLAY_MAX_CELLS} cells")
+    return list(dict.fromkeys(addresses))
+
+class OverlaySubscriber:
+    """One SSE client. Deltas that arrive faster than the client reads are merged, so a slow page never queues up history."""
+    def __init__(self, cells):
+        self.cells = frozenset(cells); self.cv = threading.Condition()
+        self.primed, self.snapshot, self.pending, self.closed = False, None, {}, False  # primed once the hub has sent a snapshot
+
+    def offer(self, values, snapshot):
+        with self.cv:
+            if snapshot: self.snapshot = {address: values.get(address) for address in self.cells}; self.pending = {}; self.primed = True
+            else: self.pending.update((address, value) for address, value in values.items() if address in self.cells)
+            if self.snapshot is not None or self.pending: self.cv.notify()
+
+    def next_event(self, timeout):
+        """Blocks for the next ('snapshot' | 'delta', values); ('keepalive', None) on timeout, (None, None) once closed."""
+        with self.cv:
+            self.cv.wait_for(lambda: self.closed or self.snapshot is not None or self.pending, timeout)
+            if self.closed: return None, None
+            if self.snapshot is not None: values, self.snapshot = self.snapshot, None; return "snapshot", values
+            if self.pending: values, self.pending = self.pending, {}; return "delta", values
+            return "keepalive", None
+
+    def close(self):
+        with self.cv: self.closed = True; self.cv.notify()
+
+class OverlayHub:
+    """Fans mapped cell values out to overlay subscribers. publish() reads only the subscribed cells and sends each client only what changed."""
+    def __init__(self):
+        self.lock = threading.Lock(); self.subscribers = set(); self.values = {}
+
+    def subscribe(self, cells):
+        subscriber = OverlaySubscriber(cells)
+        with self.lock: self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock: self.subscribers.discard(subscriber)
+
+    def has_subscribers(self): return bool(self.subscribers)
+
+    def publish(self, read_values):
+        """read_values(addresses) -> {address: value}. New subscribers get a snapshot, everyone else a delta."""
+        with self.lock: subscribers = list(self.subscribers)
+        if not subscribers: self.values = {}; return
+        current = read_values(set().union(*(subscriber.cells for subscriber in subscribers)))
+        changed = {address: value for address, value in current.items() if address not in self.values or self.values[address] != value}
+        self.values = current
+        for subscriber in subscribers:
+            needs_snapshot = not subscriber.primed
+            if needs_snapshot or changed: subscriber.offer(current if needs_snapshot else changed, needs_snapshot)
+
+    def close(self):
+        with self.lock: subscribers = list(self.subscribers); self.subscribers.clear()
+        for subscriber in subscribers: subscriber.close()
+
+# Client for overlay pages: fills every element with data-cell="B3" and keeps it current over /events.
+# Served at /overlay.js; /overlay?cells=A1:C5 (no custom page) renders the range as a table.
+OVERLAY_CLIENT_JS = r"""(function () {
+  var params = new URLSearchParams(location.search), cells = params.get("cells") || "";
+  function bound() { return document.querySelectorAll("[data-cell]"); }
+  if (!cells) cells = Array.prototype.map.call(bound(), function (el) { return el.getAttribute("data-cell"); }).join(",");
+  if (!bound().length && cells) {
+    var table = document.createElement("table");
+    cells.split(",").forEach(function (part) {
+      var m = /^([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?$/i.exec(part.trim()); if (!m) return;
+      var num = function (s) { return s.toUpperCase().split("").reduce(function (n, c) { return n * 26 + c.charCodeAt(0) - 64; }, 0); };
+      var name = function (n) { var s = ""; for (; n > 0; n = Math.floor((n - 1) / 26)) s = String.fromCharCode(65 + (n - 1) % 26) + s; return s; };
+      var c0 = num(m[1]), r0 = +m[2], c1 = m[3] ? num(m[3]) : c0, r1 = m[4] ? +m[4] : r0;
+      for (var r = r0; r <= r1; r++) {
+        var tr = table.insertRow();
+        for (var c = c0; c <= c1; c++) tr.insertCell().setAttribute("data-cell", name(c) + r);
+      }
+    });
+    document.body.appendChild(table);
+  }
+  function apply(values) {
+    Object.keys(values).forEach(function (address) {
+      var text = values[address] == null ? "" : String(values[address]);
+      document.querySelectorAll('[data-cell="' + address + '"]').forEach(function (el) { if (el.textContent !== text) el.textContent = text; });
+    });
+  }
+  var events = new EventSource("/events?cells=" + encodeURIComponent(cells));
+  events.addEventListener("snapshot", function (e) { apply(JSON.parse(e.data)); });
+  events.addEventListener("delta", function (e) { apply(JSON.parse(e.data)); });
+})();
+"""
+OVERLAY_DEFAULT_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Excel2OBS Overlay</title>
+<style>body { margin: 0; background: transparent; color: #fff; font: 32px sans-serif; } td { padding: 4px 12px; }</style>
+</head><body><script src="/overlay.js"></script></body></html>
+"""
+OVERLAY_CONTENT_TYPES = {".html": "text/html; charset=utf-8", ".js": "text/javascript; charset=utf-8", ".css": "text/css; charset=utf-8",
+                         ".png": "image/png", ".jpg": "image/jpeg", ".svg": "image/svg+xml", ".woff2": "font/woff2"}
+
+class LocalAPIHandler(BaseHTTPRequestHandler):
+    """Routes of the local API; self.server.app is the ExcelToOBS instance.
+    POST /cells   {"sheet": "Sheet1", "address": "B3", "value": 12}, {"sheet": ..., "cells": {"B3": 12}} or a list of either
+    DELETE /cells[?sheet=Sheet1]   drops pushed values so the workbook shows through again
+    GET /cells?cells=B3,A1:C5   current values of the configured sheet
+    GET /events?cells=...   SSE stream: one 'snapshot' event, then 'delta' events with only the changed cells
+    GET /overlay[/page.html], /overlay.js   overlay pages for OBS browser sources (custom pages live in OVERLAY_DIR)
+    GET /metrics   Prometheus text exposition of METRICS
+    GET /traces[?source=Score&format=text]   per-stage p50/p99 and slowest recent changes from TRACES
+    POST /flight-recorder/dump   writes the flight recorder to disk and returns the file path
+    POST /diagnostics/memory/start[?interval=60], /diagnostics/memory/stop   periodic tracemalloc snapshots and RSS samples
+    GET /diagnostics/memory[?format=text]   top growing allocation sites, RSS trend and structure sizes
+    POST /diagnostics/profile[?seconds=10]   samples the pipeline threads into a collapsed-stack file and cProfiles one update pass
+    GET /diagnostics/profile   whether a capture is running and the files of the last one
+    POST and DELETE need Content-Type: application/json (so a browser has to preflight, which is never answered), no Origin
+    other than a local one, and the LOCAL_API_TOKEN_HEADER token when obs_settings.local_api_token is set."""
+    server_version = "Excel2OBS"
+
+    def log_message(self, format, *args): logging.debug(f"Local API {self.address_string()}: {format % args}")
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status); self.send_header("Content-Type", "application/json; charset=utf-8"); self.send_header("Content-Length", str(len(body)))
+        self.end_headers(); self.wfile.write(body)
+
+    def _send_body(self, status, body, content_type):
+        self.send_response(status); self.send_header("Content-Type", content_type); self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache"); self.end_headers(); self.wfile.write(body)
+
+    def _refuse_write(self):
+        """Answers and returns True when a POST/DELETE must not run: foreign Origin, non-JSON content type or wrong token."""
+        origin = self.headers.get("Origin")
+        if origin is not None and urlsplit(origin).hostname not in LOCAL_API_LOCAL_HOSTS:
+            logging.warning(f"Local API refused {self.command} {self.path} from origin {origin}"); self._send_json(403, {"error": "origin not allowed"}); return True
+        if self.headers.get("Content-Type", "").split(";")[0].strip().lower() != "application/json": self._send_json(415, {"error": "Content-Type must be application/json"}); return True
+        token = self.server.token
+        if token and not hmac.compare_digest(self.headers.get(LOCAL_API_TOKEN_HEADER, "").encode("utf-8"), token.encode("utf-8")):
+            self._send_json(401, {"error": f"missing or wrong {LOCAL_API_TOKEN_HEADER}"}); return True
+        return False
+
+    def do_GET(self):
+        url = urlsplit(self.path); query = parse_qs(url.query)
+        if url.path == "/traces":
+            report = TRACES.report(source=query.get("source", [None])[0])
+            if query.get("format", [""])[0] == "text": return self._send_body(200, format_trace_report(report).encode("utf-8"), "text/plain; charset=utf-8")
+            return self._send_json(200, report)
+        if url.path == "/metrics": return self._send_body(200, METRICS.render().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+        if url.path == "/diagnostics/memory":
+            report = self.server.app.memory_diagnostics.report()
+            if query.get("format", [""])[0] == "text": return self._send_body(200, format_memory_report(report).encode("utf-8"), "text/plain; charset=utf-8")
+            return self._send_json(200, report)
+        if url.path == "/diagnostics/profile": return self._send_json(200, self.server.app.profiler.status())
+        if url.path == "/overlay.js": return self._send_body(200, OVERLAY_CLIENT_JS.encode("utf-8"), OVERLAY_CONTENT_TYPES[".js"])
+        if url.path in ("/overlay", "/overlay/"): return self._send_overlay_file("index.html", default=OVERLAY_DEFAULT_PAGE)
+        if url.path.startswith("/overlay/"): return self._send_overlay_file(url.path[len("/overlay/"):])
+        if url.path not in ("/cells", "/events"): return self._send_json(404, {"error": "not found"})
+        try: cells = expand_cell_list(query.get("cells", [""])[0])
+        except ValueError as e: return self._send_json(400, {"error": str(e)})
+        if url.path == "/cells": return self._send_json(200, self.server.app.read_overlay_cells(cells))
+        self._stream_events(cells)
+
+    def _send_overlay_file(self, name, default=None):
+        path = os.path.realpath(os.path.join(OVERLAY_DIR, name))
+        if not path.startswith(os.path.realpath(OVERLAY_DIR) + os.sep): return self._send_json(404, {"error": "not found"})
+        try:
+            with open(path, "rb") as f: body = f.read()
+        except OSError:
+            if default is None: return self._send_json(404, {"error": "not found"})
+            body = default.encode("utf-8")
+        self._send_body(200, body, OVERLAY_CONTENT_TYPES.get(os.path.splitext(path)[1].lower(), "application/octet-stream"))
+
+    def _stream_events(self, cells):
+        app = self.server.app
+        subscriber = app.overlay_hub.subscribe(cells); app.update_wakeup.set()  # publish the first snapshot right away
+        try:
+            self.send_response(200); self.send_header("Content-Type", "text/event-stream"); self.send_header("Cache-Control", "no-cache"); self.end_headers()
+            while True:
+                event, values = subscriber.next_event(OVERLAY_KEEPALIVE_SECONDS)
+                if event is None: break
+                if values is None: self.wfile.write(b": keepalive\n\n")
+                else: self.wfile.write(f"event: {event}\ndata: {json.dumps(values, ensure_ascii=False, default=str)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError): pass
+        finally: app.overlay_hub.unsubscribe(subscriber)
+
+    def do_POST(self):
+        if self._refuse_write(): return
+        url = urlsplit(self.path)
+        if url.path in ("/diagnostics/memory/start", "/diagnostics/memory/stop"):
+            diagnostics = self.server.app.memory_diagnostics
+            if url.path.endswith("/stop"): diagnostics.stop(); return self._send_json(200, diagnostics.report())
+            try: interval = float(parse_qs(url.query).get("interval", [0])[0])
+            except ValueError: return self._send_json(400, {"error": "interval must be a number of seconds"})
+            diagnostics.start(interval if interval > 0 else None); return self._send_json(200, diagnostics.report())
+        if url.path == "/diagnostics/profile":
+            try: window = float(parse_qs(url.query).get("seconds", [PROFILE_WINDOW_SECONDS])[0])
+            except ValueError: return self._send_json(400, {"error": "seconds must be a number"})
+            started, base_path = self.server.app.start_profile(window)
+            if base_path is None: return self._send_json(500, {"error": "profiler could not start"})
+            return self._send_json(200 if started else 409, {"started": started, "folded": base_path + ".folded", "pstats": base_path + ".pstats"})
+        if url.path == "/flight-recorder/dump":
+            path = FLIGHT.dump("api")
+            return self._send_json(200, {"path": path}) if path else self._send_json(500, {"error": "dump failed"})
+        if url.path != "/cells": return self._send_json(404, {"error": "not found"})
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > LOCAL_API_MAX_BODY_BYTES: return self._send_json(413, {"error": "body too large"})
+        try: accepted = self.server.app.push_cells(json.loads(self.rfile.read(length) or b"null"))
+        except (ValueError, TypeError, KeyError, AttributeError) as e: return self._send_json(400, {"error": str(e)})
+        self._send_json(200, {"accepted": accepted})
+
+    def do_DELETE(self):
+        if self._refuse_write(): return
+        url = urlsplit(self.path)
+        if url.path != "/cells": return self._send_json(404, {"error": "not found"})
+        sheet = parse_qs(url.query).get("sheet", [None])[0]
+        self._send_json(200, {"cleared": self.server.app.clear_pushed_cells(sheet)})
+
+class LocalAPIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    def __init__(self, app, port, host=LOCAL_API_HOST, token=""):
+        super().__init__((host, port), LocalAPIHandler); self.app = app; self.token = token
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True, name="LocalAPI"); self.thread.start()
+
+    def stop(self): self.app.overlay_hub.close(); self.shutdown(); self.server_close()
@@ -0,0 +1,249 @@
+"""Micro-benchmarks for the Excel2OBS hot paths: workbook reload, single-cell lookup, mapping extraction, diff and idle tick.
+
+    python excel2obs_bench.py                          # compare against the stored baseline
+    python excel2obs_bench.py --save-baseline          # record a new baseline on this machine
+    python excel2obs_bench.py --full --sheets 4 --shared-ratio 0.9 --formula-density 0.3
+    python excel2obs_bench.py --idle-guard-only        # just the guards (fast, machine independent); exit 1 on any failure, for CI
+
+Synthetic workbooks are generated once per parameter set and cached in --workdir. Formula cells are written
+without cached results (openpyxl cannot calculate), so they read back empty, like a workbook saved by a tool
+that does not recalculate. Each run prints median timings and exits 1 if any benchmark is slower than its
+baseline by more than --threshold.
+
+Timings only compare on the machine that recorded them, so no baseline is committed. Record one first with
+--save-baseline (on the base revision when checking a change); without a baseline file the comparison run
+stops before benchmarking and exits 2. --idle-guard-only needs no baseline.
+
+The idle-tick guard settles the diff at each of IDLE_GUARD_MAPPINGS, then runs ticks with nothing changed under
+tracemalloc and a call counter. A tick that allocates more than IDLE_TICK_ALLOC_BUDGET_BYTES (2048) above its starting
+level, leaks across ticks, or makes more than IDLE_TICK_CALL_BUDGET (60) function calls fails the run (exit 1, with
+the failing budgets on stderr). The budgets do not scale with the mapping count: an idle tick must not walk the
+mappings. --idle-alloc-budget/--idle-call-budget override them, e.g. --idle-call-budget 1 to see the guard fail.
+
+The push-only check runs a fresh app with no workbook and only some mapped cells pushed (as through POST /cells).
+Both update passes must finish, send every pushed cell and mark the rest out of range; otherwise the run fails (exit 1).
+Like the idle guard it runs with --idle-guard-only.
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import openpyxl
+from openpyxl.utils.cell import coordinate_from_string, column_index_from_string
+
+import excel2obs_refactored5 as e2o
+
+BENCH_COLUMNS = 20
+BENCH_SIZES = (1_000, 10_000, 100_000)
+BENCH_FULL_SIZES = BENCH_SIZES + (1_000_000,)
+BENCH_MAPPING_COUNTS = (10, 1_000, 10_000)
+BENCH_LOOKUPS = 10_000
+BENCH_SHARED_WORDS = 64
+DEFAULT_BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "excel2obs_bench_baseline.json")
+DEFAULT_REGRESSION_THRESHOLD = 0.20
+DEFAULT_WORKDIR = os.path.join(tempfile.gettempdir(), "excel2obs_bench")
+IDLE_GUARD_CELLS = 10_000
+IDLE_GUARD_MAPPINGS = (10, 10_000)
+IDLE_GUARD_TICKS = 50
+IDLE_TICK_ALLOC_BUDGET_BYTES = 2048  # traced peak above the pre-tick level, whatever the mapping count
+IDLE_TICK_CALL_BUDGET = 60  # Python and C function calls per tick; a per-mapping walk costs thousands
+PUSH_ONLY_PUSHED = {"A1": "pushed A1", "C3": "pushed C3"}
+PUSH_ONLY_MAPPED = ("A2", "A1", "B7", "C3")  # unpushed cells first and in between, so a pass that stops early misses a pushed one
+
+def generate_workbook(path, cells, sheets=1, shared_ratio=0.5, formula_density=0.1, seed=1):
+    """Writes a workbook whose first sheet ("Data") holds `cells` cells, BENCH_COLUMNS wide; extra sheets are the same size.
+
+    Of the non-formula cells, 40% are numbers and 60% strings; `shared_ratio` of the strings come from a small
+    vocabulary (shared strings), the rest are unique.
+    """
+    rng = random.Random(seed); words = [f"word{i}" for i in range(BENCH_SHARED_WORDS)]
+    rows = max(1, cells // BENCH_COLUMNS)
+    workbook = openpyxl.Workbook(write_only=True)
+    for sheet_index in range(max(1, sheets)):
+        sheet = workbook.create_sheet("Data" if sheet_index == 0 else f"Sheet{sheet_index + 1}")
+        for r in range(1, rows + 1):
+            row = []
+            for c in range(1, BENCH_COLUMNS + 1):
+                pick = rng.random()
+                if pick < formula_density: row.append(f"=ROW()*{c}")
+                elif rng.random() < 0.4: row.append(round(rng.uniform(0, 1000), 2))
+                elif rng.random() < shared_ratio: row.append(rng.choice(words))
+                else: row.append(f"item-{sheet_index}-{r}-{c}")
+            sheet.append(row)
+    workbook.save(path)
+
+def workbook_path(workdir, cells, sheets, shared_ratio, formula_density):
+    path = os.path.join(workdir, f"bench-{cells}c-{sheets}s-{shared_ratio:g}ss-{formula_density:g}f.xlsx")
+    if not os.path.exists(path):
+        os.makedirs(workdir, exist_ok=True); started = time.perf_counter()
+        generate_workbook(path + ".tmp", cells, sheets, shared_ratio, formula_density); os.replace(path + ".tmp", path)
+        print(f"  generated {os.path.basename(path)} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return path
+
+def median_seconds(fn, repeats):
+    """Median wall time of `repeats` calls to fn()."""
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter(); fn(); samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+def load_mappings(app, count, rows, seed=2):
+    """Replaces the app's groups with one group of `count` Text mappings on random cells, each its own source."""
+    rng = random.Random(seed)
+    mappings = [{"type": "Text", "name": f"bench-source-{i}", "row": rng.randint(1, rows), "col": rng.randint(1, BENCH_COLUMNS), "auto_update": 1} for i in range(count)]
+    app.inputs_data.clear(); app.previous_values.clear(); app.add_group(group_data={"group_name": "Bench", "mappings": mappings})
+
+def bench_workbook(app, path, cells, repeats):
+    """Times one workbook; returns {benchmark name: seconds per operation}."""
+    results = {}; rows = max(1, cells // BENCH_COLUMNS)
+    app.file_path.set(path); app.sheet_name.set("Data")
+    results[f"reload/{cells}"] = median_seconds(lambda: app._ensure_excel_cache(force_read=True), max(1, repeats if cells < 1_000_000 else 1))
+    rng = random.Random(3); positions = [(rng.randrange(rows), rng.randrange(BENCH_COLUMNS)) for _ in range(BENCH_LOOKUPS)]
+    lookup = app._get_cell_value_from_cache
+    results[f"lookup/{cells}"] = median_seconds(lambda: [lookup(r, c) for r, c in positions], repeats) / BENCH_LOOKUPS
+    # An unstarted target takes the enqueued changes, so extraction covers build and enqueue without any socket I/O
+    target = e2o.OBSTarget("bench", 0, ""); app.obs_targets = [target]
+    for count in BENCH_MAPPING_COUNTS:
+        load_mappings(app, count, rows)
+        def extract():
+            app.previous_values.clear(); target.pending.clear(); app.update_obs_data(check_changes=True)
+        results[f"extract/{cells}/{count}"] = median_seconds(extract, repeats)
+        app.update_obs_data(check_changes=True)  # steady state: every mapping matches previous_values
+        def diff():
+            app._mark_inputs_changed(); app.update_obs_data(check_changes=True)  # as after a reload that changed nothing mapped
+        results[f"diff/{cells}/{count}"] = median_seconds(diff, repeats)
+        results[f"idle/{cells}/{count}"] = median_seconds(lambda: app.update_obs_data(check_changes=True), repeats)
+    app.obs_targets = []
+    return results
+
+def profile_idle_ticks(app, ticks):
+    """Runs `ticks` idle update passes twice: under tracemalloc, then under a call counter.
+
+    Returns (worst per-tick peak above the pre-tick level, net traced growth over all ticks, calls per tick).
+    """
+    calls = [0]
+    def count_calls(frame, event, arg):
+        if event == "call" or event == "c_call": calls[0] += 1
+    gc.collect(); tracemalloc.start(); worst = 0
+    try:
+        start_bytes = tracemalloc.get_traced_memory()[0]
+        for _ in range(ticks):
+            before = tracemalloc.get_traced_memory()[0]; tracemalloc.reset_peak()
+            app.update_obs_data(check_changes=True)
+            worst = max(worst, tracemalloc.get_traced_memory()[1] - before)
+        growth = tracemalloc.get_traced_memory()[0] - start_bytes
+    finally: tracemalloc.stop()
+    sys.setprofile(count_calls)
+    try:
+        for _ in range(ticks): app.update_obs_data(check_changes=True)
+    finally: sys.setprofile(None)
+    return worst, growth, calls[0] / ticks
+
+def idle_guard(app, path, ticks=IDLE_GUARD_TICKS, alloc_budget=IDLE_TICK_ALLOC_BUDGET_BYTES, call_budget=IDLE_TICK_CALL_BUDGET):
+    """Checks idle ticks against the allocation and call budgets at each IDLE_GUARD_MAPPINGS count; returns the failures."""
+    failures = []; rows = max(1, IDLE_GUARD_CELLS // BENCH_COLUMNS)
+    app.file_path.set(path); app.sheet_name.set("Data"); app.obs_targets = [e2o.OBSTarget("bench", 0, "")]
+    try:
+        for count in IDLE_GUARD_MAPPINGS:
+            load_mappings(app, count, rows)
+            for _ in range(3): app.update_obs_data(check_changes=True)  # first sight of every mapping, the pass that settles, warm-up
+            worst, growth, calls = profile_idle_ticks(app, ticks)
+            over = [(label, value, budget) for label, value, budget in (("peak", worst, alloc_budget), ("growth", growth, alloc_budget), ("calls", calls, call_budget)) if value > budget]
+            print(f"idle-guard/{count:<17} peak {worst:>6} B   growth {growth:>6} B   {calls:>6.1f} calls/tick{'  OVER BUDGET (' + ', '.join(label for label, _, _ in over) + ')' if over else ''}")
+            failures += [f"idle-guard/{count} {label} {value:.0f} > {budget}" for label, value, budget in over]
+    finally: app.obs_targets = []
+    return failures
+
+def push_only_check():
+    """No workbook, a partial push: returns the failures (empty when every pushed cell reached the target)."""
+    app = e2o.ExcelToOBS(); failures = []
+    try:
+        app.sheet_name.set("Data"); target = e2o.OBSTarget("bench", 0, ""); app.obs_targets = [target]
+        mappings = []
+        for address in PUSH_ONLY_MAPPED:
+            column, row = coordinate_from_string(address)
+            mappings.append({"type": "Text", "name": f"push-{address}", "row": row, "col": column_index_from_string(column), "auto_update": 1})
+        app.add_group(group_data={"group_name": "Push only", "mappings": mappings})
+        app.push_cells({"sheet": "Data", "cells": PUSH_ONLY_PUSHED})
+        for check_changes in (False, True):
+            target.pending.clear(); app.previous_values.clear(); app._mark_inputs_changed()
+            try: app.update_obs_data(check_changes=check_changes)
+            except Exception as e: failures.append(f"push-only pass (check_changes={check_changes}) raised {type(e).__name__}: {e}"); continue
+            missing = [address for address in PUSH_ONLY_PUSHED if f"push-{address}" not in target.pending]
+            if missing: failures.append(f"push-only pass (check_changes={check_changes}) did not send {', '.join(missing)}")
+    finally: app.obs_targets = []; app.stop()
+    print(f"push-only {'ok' if not failures else 'FAILED: ' + '; '.join(failures)}")
+    return failures
+
+def compare(results, baseline, threshold):
+    """Prints each result next to its baseline; returns the names that regressed by more than `threshold`."""
+    regressions = []
+    for name, seconds in results.items():
+        base = baseline.get(name)
+        if base is None: print(f"{name:<28} {seconds * 1000:>12.3f} ms   (no baseline)"); continue
+        change = seconds / base - 1 if base else 0.0
+        flag = "  REGRESSION" if change > threshold else ""
+        if flag: regressions.append(name)
+        print(f"{name:<28} {seconds * 1000:>12.3f} ms   baseline {base * 1000:>10.3f} ms   {change:+7.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", help=f"comma-separated cell counts (default {','.join(map(str, BENCH_SIZES))})")
+    parser.add_argument("--full", action="store_true", help="include the 1M-cell workbook")
+    parser.add_argument("--sheets", type=int, default=1, help="sheets per workbook (only the first is mapped)")
+    parser.add_argument("--shared-ratio", type=float, default=0.5, help="fraction of string cells drawn from a shared vocabulary")
+    parser.add_argument("--formula-density", type=float, default=0.1, help="fraction of cells holding a formula")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR, help="where generated workbooks are cached")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline instead of comparing")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD, help="allowed slowdown before a benchmark is flagged (0.2 = 20%%)")
+    parser.add_argument("--idle-guard-only", action="store_true", help="skip the timings and only run the idle-tick and push-only guards (exit 1 on failure)")
+    parser.add_argument("--idle-alloc-budget", type=int, default=IDLE_TICK_ALLOC_BUDGET_BYTES, help="bytes an idle tick may allocate (peak and growth)")
+    parser.add_argument("--idle-call-budget", type=int, default=IDLE_TICK_CALL_BUDGET, help="function calls an idle tick may make")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    sizes = [int(size) for size in args.sizes.split(",")] if args.sizes else list(BENCH_FULL_SIZES if args.full else BENCH_SIZES)
+
+    baseline = None
+    if not args.save_baseline and not args.idle_guard_only:
+        try:
+            with open(args.baseline, "r", encoding="utf-8") as f: baseline = json.load(f)
+        except FileNotFoundError:
+            print(f"No baseline at {args.baseline}. Timings are machine specific, so record one here first:\n"
+                  f"    python {' '.join(sys.argv)} --save-baseline", file=sys.stderr)
+            return 2
+    app = e2o.ExcelToOBS()
+    results = {}
+    try:
+        guard_failures = idle_guard(app, workbook_path(args.workdir, IDLE_GUARD_CELLS, 1, 0.5, 0.1), alloc_budget=args.idle_alloc_budget, call_budget=args.idle_call_budget)
+        guard_failures += push_only_check()
+        if args.idle_guard_only:
+            if guard_failures: print(f"FAILED {len(guard_failures)} guard(s): {', '.join(guard_failures)}", file=sys.stderr)
+            return 1 if guard_failures else 0
+        for cells in sizes:
+            print(f"Workbook: {cells} cells, {args.sheets} sheet(s)", file=sys.stderr)
+            path = workbook_path(args.workdir, cells, args.sheets, args.shared_ratio, args.formula_density)
+            results.update(bench_workbook(app, path, cells, args.repeats))
+    finally: app.stop()
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f: json.dump(results, f, indent=2, sort_keys=True)
+        for name, seconds in results.items(): print(f"{name:<28} {seconds * 1000:>12.3f} ms")
+        print(f"Baseline saved to {args.baseline}"); return 0
+    regressions = compare(results, baseline, args.threshold)
+    if regressions: print(f"{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+    if guard_failures: print(f"Guard failures: {', '.join(guard_failures)}")
+    return 1 if regressions or guard_failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
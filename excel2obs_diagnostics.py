@@ -0,0 +1,159 @@
+"""Memory diagnostics for soak runs (tracemalloc snapshots and the RSS trend) and the on-demand sampling profiler."""
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict, deque
+
+from excel2obs_stats import rss_slope_mb_per_hour
+
+try: import psutil
+except ImportError: psutil = None  # optional: RSS is read from /proc (Linux only) without psutil
+
+# Memory diagnostics (local API /diagnostics/memory, --headless --diagnostics, excel2obs_load.py --soak)
+MEMORY_DIAG_INTERVAL_SECONDS = 60
+MEMORY_DIAG_FRAMES = 1  # sites are grouped by their innermost frame; deeper tracebacks multiply the tracing cost
+MEMORY_DIAG_TOP = 15
+MEMORY_DIAG_RSS_HISTORY = 1440            # a day of samples at the default interval
+MEMORY_DIAG_WARMUP_SAMPLES = 3            # caches fill during the first samples; the RSS trend ignores them
+MEMORY_DIAG_RSS_SLOPE_LIMIT_MB_PER_HOUR = 2.0
+# On-demand profiling (Profile button, SIGUSR1/SIGBREAK when headless, local API POST /diagnostics/profile)
+PROFILE_DIR = os.path.join(os.path.expanduser("~"), ".excel2obs", "profiles")
+PROFILE_WINDOW_SECONDS = 10
+PROFILE_MAX_WINDOW_SECONDS = 300
+PROFILE_SAMPLE_INTERVAL_SECONDS = 0.005  # 200 Hz from one sampler thread; the sampled threads are never interrupted
+PROFILE_THREAD_PREFIXES = ("UpdateThread", "OBSTarget-", "OBSEvents-", "FileWatcher", "ImageAsset", "TextFileSink")
+
+# --- Memory Diagnostics (soak runs: is the process growing, and where?) ---
+def current_rss_bytes():
+    """Resident set size of this process, or None where it cannot be read (no psutil and no /proc)."""
+    if psutil is not None: return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f: return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError): return None
+
+class MemoryDiagnostics:
+    """Periodic tracemalloc snapshots and RSS samples. The first snapshot after start() is the baseline: report()
+    lists the allocation sites that grew most since then and fits a line through RSS (after the warm-up samples)
+    so steady growth stands out from noise. structure_sizes is a callable returning {name: entry count}."""
+    def __init__(self, interval=MEMORY_DIAG_INTERVAL_SECONDS, frames=MEMORY_DIAG_FRAMES, structure_sizes=None):
+        self.interval, self.frames, self.structure_sizes = interval, frames, structure_sizes
+        self.lock = threading.Lock(); self.wakeup = threading.Event()
+        self.thread = None; self.started_tracing = False; self.started_at = None
+        self.baseline = None; self.latest = None; self.rss = deque(maxlen=MEMORY_DIAG_RSS_HISTORY)
+
+    @property
+    def running(self): return self.thread is not None and self.thread.is_alive()
+
+    def start(self, interval=None):
+        if interval: self.interval = interval
+        if self.running: return
+        if not tracemalloc.is_tracing(): tracemalloc.start(self.frames); self.started_tracing = True
+        with self.lock: self.baseline = self.latest = None; self.rss.clear(); self.started_at = time.time()
+        self.sample(); self.wakeup.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True, name="MemoryDiagnostics"); self.thread.start()
+        logging.info(f"Memory diagnostics started (snapshot every {self.interval:g}s).")
+
+    def stop(self):
+        if not self.running: return
+        self.wakeup.set(); self.thread.join(timeout=5)
+        if self.started_tracing: tracemalloc.stop(); self.started_tracing = False
+        logging.info("Memory diagnostics stopped.")
+
+    def _run(self):
+        while not self.wakeup.wait(self.interval):
+            try: self.sample()
+            except Exception as e: logging.exception(f"Memory diagnostics sample failed: {e}")
+
+    def sample(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")))
+        rss = current_rss_bytes()
+        with self.lock:
+            if self.baseline is None: self.baseline = snapshot
+            self.latest = snapshot
+            if rss is not None: self.rss.append((time.time(), rss))
+
+    def report(self, top=MEMORY_DIAG_TOP):
+        with self.lock: baseline, latest, rss = self.baseline, self.latest, list(self.rss)
+        growth = []
+        if baseline is not None and latest is not None and latest is not baseline:
+            for stat in latest.compare_to(baseline, "lineno")[:top]:
+                if stat.size_diff <= 0: continue
+                frame = stat.traceback[0]
+                growth.append({"site": f"{frame.filename}:{frame.lineno}", "size_diff_kb": round(stat.size_diff / 1024, 1), "count_diff": stat.count_diff, "size_kb": round(stat.size / 1024, 1)})
+        slope = rss_slope_mb_per_hour(rss[MEMORY_DIAG_WARMUP_SAMPLES:])
+        traced, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        return {"running": self.running, "uptime_s": round(time.time() - self.started_at, 1) if self.started_at else 0, "samples": len(rss),
+                "rss_mb": round(rss[-1][1] / 2**20, 1) if rss else None, "rss_start_mb": round(rss[0][1] / 2**20, 1) if rss else None,
+                "rss_slope_mb_per_hour": round(slope, 3) if slope is not None else None,
+                "rss_flat": None if slope is None else slope <= MEMORY_DIAG_RSS_SLOPE_LIMIT_MB_PER_HOUR,
+                "traced_mb": round(traced / 2**20, 1), "traced_peak_mb": round(peak / 2**20, 1), "top_growth": growth,
+                "structures": self.structure_sizes() if self.structure_sizes else {}}
+
+def format_memory_report(report):
+    """Plain-text rendering of MemoryDiagnostics.report() for logs and the API's ?format=text."""
+    flat = {None: "not enough samples yet", True: "flat", False: "GROWING"}[report["rss_flat"]]
+    lines = [f"Memory: RSS {report['rss_start_mb']} -> {report['rss_mb']} MB over {report['uptime_s']:.0f}s ({report['samples']} samples), "
+             f"trend {report['rss_slope_mb_per_hour']} MB/h ({flat}); traced {report['traced_mb']} MB, peak {report['traced_peak_mb']} MB"]
+    if report["top_growth"]: lines.append("Top growing allocation sites since the first snapshot:")
+    lines += [f"  {entry['size_diff_kb']:>10.1f} KiB {entry['count_diff']:>+8} blocks  {entry['site']}" for entry in report["top_growth"]]
+    if report["structures"]: lines.append("Structures: " + ", ".join(f"{name}={size}" for name, size in report["structures"].items()))
+    return "\n".join(lines)
+
+# --- Sampling Profiler (collapsed stacks of the pipeline threads, plus one cProfile'd update pass) ---
+class SamplingProfiler:
+    """Samples the stacks of the PROFILE_THREAD_PREFIXES threads for a fixed window and writes them as collapsed
+    stacks ("thread;outer;...;inner count" lines, read by flamegraph.pl, speedscope and inferno). start() also leaves a
+    .pstats path for the update loop to claim (claim_cycle_profile), so the next update pass runs under cProfile."""
+    def __init__(self, folder=PROFILE_DIR, thread_prefixes=PROFILE_THREAD_PREFIXES, on_done=None):
+        self.folder, self.thread_prefixes, self.on_done = folder, thread_prefixes, on_done
+        self.lock = threading.Lock(); self.thread = None; self.base_path = None; self.cycle_profile_path = None; self.last_result = None
+
+    @property
+    def running(self): return self.thread is not None and self.thread.is_alive()
+
+    def start(self, window=PROFILE_WINDOW_SECONDS, interval=PROFILE_SAMPLE_INTERVAL_SECONDS):
+        """Starts a capture; returns (started, base path of the .folded/.pstats files). Only one capture runs at a time."""
+        with self.lock:
+            if self.running: return False, self.base_path
+            os.makedirs(self.folder, exist_ok=True)
+            self.base_path = os.path.join(self.folder, f"profile-{time.strftime('%Y%m%d-%H%M%S')}")
+            self.cycle_profile_path = self.base_path + ".pstats"
+            window = min(max(window, interval), PROFILE_MAX_WINDOW_SECONDS)
+            self.thread = threading.Thread(target=self._run, args=(self.base_path, window, interval), daemon=True, name="SamplingProfiler"); self.thread.start()
+        logging.info(f"Profiling the pipeline threads for {window:g}s; output goes to {self.base_path}.*")
+        return True, self.base_path
+
+    def claim_cycle_profile(self):
+        """The .pstats path the next update pass should be profiled into, once per capture (None otherwise)."""
+        if self.cycle_profile_path is None: return None
+        with self.lock: path, self.cycle_profile_path = self.cycle_profile_path, None
+        return path
+
+    def _run(self, base_path, window, interval):
+        stacks = defaultdict(int); labels = {}; samples = 0; deadline = time.monotonic() + window
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate() if thread.name.startswith(self.thread_prefixes)}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident)
+                if name is None: continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code; label = labels.get(code)
+                    if label is None: label = labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+                    stack.append(label); frame = frame.f_back
+                stack.append(name.replace(";", ",")); stacks[";".join(reversed(stack))] += 1
+            samples += 1; time.sleep(interval)
+        with self.lock: unclaimed, self.cycle_profile_path = self.cycle_profile_path is not None, None
+        result = {"folded": base_path + ".folded", "pstats": None if unclaimed else base_path + ".pstats", "window_s": window, "samples": samples, "stacks": len(stacks)}
+        try:
+            with open(result["folded"], "w", encoding="utf-8") as f: f.writelines(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+        except OSError as e: logging.error(f"Cannot write profile {result['folded']}: {e}"); result["folded"] = None
+        if unclaimed: logging.info("No update pass ran during the profile window, so no .pstats was written (auto-update off or no target).")
+        self.last_result = result
+        logging.info(f"Profile done: {samples} samples, {len(stacks)} distinct stacks in {result['folded']}")
+        if self.on_done: self.on_done(result)
+
+    def status(self): return {"running": self.running, "last": self.last_result}
@@ -0,0 +1,70 @@
+"""Flight recorder: a binary ring of pipeline events, dumped to disk after anomalies or on demand.
+The dump format must match excel2obs_flight_decode.py."""
+import logging
+import os
+import struct
+import threading
+import time
+
+# --- Flight Recorder (binary ring of pipeline events, dumped after anomalies; decode with excel2obs_flight_decode.py) ---
+FLIGHT_RECORDER_DIR = os.path.join(os.path.expanduser("~"), ".excel2obs", "flight_recorder")
+FLIGHT_RECORDER_EVENTS = 100_000                # ~1.9 MB; minutes of history at show rates
+FLIGHT_RECORDER_SLOW_CYCLE_SECONDS = 1.0        # an update pass slower than this dumps the recorder
+FLIGHT_RECORDER_ERROR_STREAK = 5                # consecutive failed sends on one target dump the recorder
+FLIGHT_RECORDER_MIN_DUMP_INTERVAL_SECONDS = 60  # automatic dumps are rate limited; on-demand dumps are not
+FLIGHT_RECORD = struct.Struct("<dBHHHf")        # wall time, event, name id, target id, detail, value (seconds or count)
+FLIGHT_DUMP_HEADER = struct.Struct("<4sHHII")   # magic, version, record size, record count, name count
+FLIGHT_DUMP_MAGIC = b"E2FR"
+FLIGHT_DUMP_VERSION = 1
+FLIGHT_EVENTS = ("reload", "cycle", "change", "batch", "ack", "failure", "connect", "disconnect", "dump")
+(EVENT_RELOAD, EVENT_CYCLE, EVENT_CHANGE, EVENT_BATCH, EVENT_ACK, EVENT_FAILURE, EVENT_CONNECT, EVENT_DISCONNECT, EVENT_DUMP) = range(len(FLIGHT_EVENTS))
+
+class FlightRecorder:
+    """Fixed-size ring of packed event records. record() is one struct.pack_into under a lock and never allocates
+    per event beyond interning a new source/target name, so it can stay on in every hot path."""
+    def __init__(self, capacity=FLIGHT_RECORDER_EVENTS, folder=FLIGHT_RECORDER_DIR):
+        self.capacity, self.folder = capacity, folder
+        self.buffer = bytearray(capacity * FLIGHT_RECORD.size)
+        self.lock = threading.Lock(); self.next_index = 0; self.count = 0
+        self.names = [""]; self.name_ids = {"": 0}
+        self.last_auto_dump = 0.0
+
+    def _name_id(self, name):
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            if len(self.names) >= 0xFFFF: return 0xFFFF
+            name_id = self.name_ids[name] = len(self.names); self.names.append(name)
+        return name_id
+
+    def record(self, event, name="", target="", detail=0, value=0.0):
+        with self.lock:
+            FLIGHT_RECORD.pack_into(self.buffer, self.next_index * FLIGHT_RECORD.size, time.time(), event, self._name_id(name), self._name_id(target), min(int(detail), 0xFFFF), value)
+            self.next_index = (self.next_index + 1) % self.capacity; self.count = min(self.count + 1, self.capacity)
+
+    def trigger(self, reason):
+        """Automatic dump after an anomaly, at most once per FLIGHT_RECORDER_MIN_DUMP_INTERVAL_SECONDS, written off-thread."""
+        now = time.monotonic()
+        with self.lock:
+            if now - self.last_auto_dump < FLIGHT_RECORDER_MIN_DUMP_INTERVAL_SECONDS: return
+            self.last_auto_dump = now
+        threading.Thread(target=self.dump, args=(reason,), daemon=True, name="FlightRecorderDump").start()
+
+    def dump(self, reason="manual"):
+        """Writes the ring, oldest event first, to FLIGHT_RECORDER_DIR. Returns the file path (None on failure)."""
+        self.record(EVENT_DUMP, reason)
+        with self.lock:
+            start = (self.next_index - self.count) % self.capacity
+            records = self.buffer[start * FLIGHT_RECORD.size:] + self.buffer[:start * FLIGHT_RECORD.size] if self.count == self.capacity else self.buffer[:self.count * FLIGHT_RECORD.size]
+            names, count = list(self.names), self.count
+        path = os.path.join(self.folder, f"flight-{time.strftime('%Y%m%d-%H%M%S')}-{''.join(ch if ch.isalnum() else '-' for ch in reason)}.e2fr")
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(FLIGHT_DUMP_HEADER.pack(FLIGHT_DUMP_MAGIC, FLIGHT_DUMP_VERSION, FLIGHT_RECORD.size, count, len(names)))
+                for name in names: encoded = name.encode("utf-8")[:0xFFFF]; f.write(struct.pack("<H", len(encoded)) + encoded)
+                f.write(records)
+        except OSError as e: logging.error(f"Flight recorder dump failed: {e}"); return None
+        logging.warning(f"Flight recorder dumped {count} events ({reason}) to {path}")
+        return path
+
+FLIGHT = FlightRecorder()
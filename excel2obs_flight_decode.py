@@ -0,0 +1,72 @@
+"""Decodes an Excel2OBS flight recorder dump (*.e2fr) into one line per event.
+
+    python excel2obs_flight_decode.py ~/.excel2obs/flight_recorder/flight-20260101-200000-slow-cycle.e2fr
+    python excel2obs_flight_decode.py dump.e2fr --event failure --event disconnect --last 200
+    python excel2obs_flight_decode.py dump.e2fr --summary
+
+The format below must match FlightRecorder in excel2obs_flight.py.
+"""
+import argparse
+import struct
+import sys
+import time
+from collections import Counter
+
+FLIGHT_RECORD = struct.Struct("<dBHHHf")        # wall time, event, name id, target id, detail, value (seconds or count)
+FLIGHT_DUMP_HEADER = struct.Struct("<4sHHII")   # magic, version, record size, record count, name count
+FLIGHT_DUMP_MAGIC = b"E2FR"
+FLIGHT_DUMP_VERSION = 1
+FLIGHT_EVENTS = ("reload", "cycle", "change", "batch", "ack", "failure", "connect", "disconnect", "dump")
+# How each event's detail and value fields read: (detail label, value is a duration)
+FLIGHT_FIELDS = {"reload": (None, True), "cycle": ("queued", True), "change": (None, False), "batch": ("requests", True), "ack": (None, True),
+                 "failure": ("code", False), "connect": (None, False), "disconnect": (None, False), "dump": (None, False)}
+
+def read_dump(path):
+    """Returns a list of event dicts (time, event, name, target, detail, value), oldest first."""
+    with open(path, "rb") as f: data = f.read()
+    magic, version, record_size, count, name_count = FLIGHT_DUMP_HEADER.unpack_from(data, 0)
+    if magic != FLIGHT_DUMP_MAGIC or version != FLIGHT_DUMP_VERSION or record_size != FLIGHT_RECORD.size:
+        raise ValueError(f"{path} is not a version {FLIGHT_DUMP_VERSION} flight recorder dump")
+    offset, names = FLIGHT_DUMP_HEADER.size, []
+    for _ in range(name_count):
+        (length,) = struct.unpack_from("<H", data, offset); offset += 2
+        names.append(data[offset:offset + length].decode("utf-8", "replace")); offset += length
+    name = lambda name_id: names[name_id] if name_id < len(names) else "<overflow>"
+    events = []
+    for timestamp, event, name_id, target_id, detail, value in FLIGHT_RECORD.iter_unpack(data[offset:offset + count * FLIGHT_RECORD.size]):
+        events.append({"time": timestamp, "event": FLIGHT_EVENTS[event] if event < len(FLIGHT_EVENTS) else f"event-{event}",
+                       "name": name(name_id), "target": name(target_id), "detail": detail, "value": value})
+    return events
+
+def format_event(event):
+    detail_label, is_duration = FLIGHT_FIELDS.get(event["event"], (None, False))
+    stamp = time.strftime("%H:%M:%S", time.localtime(event["time"])) + f".{int(event['time'] * 1000) % 1000:03d}"
+    parts = [stamp, f"{event['event']:<10}"]
+    if event["name"]: parts.append(f"'{event['name']}'")
+    if event["target"]: parts.append(f"@{event['target']}")
+    if detail_label: parts.append(f"{detail_label}={event['detail']}")
+    if is_duration: parts.append(f"{event['value'] * 1000:.1f} ms")
+    return "  ".join(parts)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("dump", help="path to a .e2fr file")
+    parser.add_argument("--event", action="append", choices=FLIGHT_EVENTS, help="only show these event types (repeatable)")
+    parser.add_argument("--last", type=int, help="only show the last N matching events")
+    parser.add_argument("--summary", action="store_true", help="print event counts and the slowest durations instead of every event")
+    args = parser.parse_args()
+    try: events = read_dump(args.dump)
+    except (OSError, ValueError, struct.error) as e: sys.exit(f"Cannot read {args.dump}: {e}")
+    if args.event: events = [event for event in events if event["event"] in args.event]
+    if args.last: events = events[-args.last:]
+    if not args.summary:
+        for event in events: print(format_event(event))
+        return
+    if events: print(f"{len(events)} events from {format_event(events[0])[:12]} to {format_event(events[-1])[:12]}")
+    for name, count in Counter(event["event"] for event in events).most_common(): print(f"  {name:<10} {count}")
+    timed = sorted((event for event in events if FLIGHT_FIELDS.get(event["event"], (None, False))[1]), key=lambda event: event["value"], reverse=True)[:10]
+    if timed: print("Slowest:")
+    for event in timed: print("  " + format_event(event))
+
+if __name__ == "__main__":
+    main()
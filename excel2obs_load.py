@@ -0,0 +1,288 @@
+"""End-to-end load generator: N mappings changing at M Hz through the real headless app into the mock OBS server.
+
+    python excel2obs_load.py --mappings 500 --rate 10 --change-fraction 0.2 --duration 3600
+    python excel2obs_load.py --mode push --mappings 2000 --rate 50 --latency-ms 5 --jitter-ms 3 --json report.json
+    python excel2obs_load.py --soak --duration 36000 --diagnostics-interval 300
+
+The app runs as its own process (excel2obs_refactored5.py --headless), so its CPU and RSS are measured apart
+from this harness and the mock OBS server, which run here. In workbook mode each tick rewrites the workbook
+(save to a temp file, then rename, the way editors save). In push mode each tick posts the changed cells to the
+local API. Every change gets a unique text value, so the mock can match each SetInputSettings back to the tick
+that produced it. A change that never reaches OBS because a newer value for the same source overtook it is
+counted as superseded (this is expected coalescing). If the newest value never arrives, it is counted as lost.
+
+--soak runs the app with memory diagnostics on (tracemalloc + RSS, see /diagnostics/memory). It then checks that
+the app's RSS trend after warm-up stays under --rss-slope-limit, and that its long-lived structures did not grow.
+The report lists the top growing allocation sites, and the exit status is 1 if memory kept growing.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from urllib.request import urlopen
+
+import openpyxl
+
+from excel2obs_mock_obs import MockOBSServer
+from excel2obs_stats import percentile, rss_slope_mb_per_hour
+
+try: import psutil
+except ImportError: psutil = None
+
+APP_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "excel2obs_refactored5.py")
+SHEET_NAME = "Data"
+SOURCE_PREFIX = "Text "
+WARMUP_TIMEOUT_SECONDS = 60
+SAMPLE_INTERVAL_SECONDS = 1.0
+APP_METRICS = ("excel2obs_sends_total", "excel2obs_send_failures_total", "excel2obs_skipped_updates_total")
+SOAK_WARMUP_FRACTION = 0.1           # RSS samples from the first 10% of a soak are left out of the trend
+DEFAULT_RSS_SLOPE_LIMIT_MB_PER_HOUR = 2.0
+DEFAULT_DIAGNOSTICS_INTERVAL_SECONDS = 60.0
+
+def free_port():
+    with socket.socket() as sock: sock.bind(("127.0.0.1", 0)); return sock.getsockname()[1]
+
+class ProcessSampler:
+    """CPU seconds and RSS of the app process, via psutil when installed, else /proc (Linux)."""
+    def __init__(self, pid):
+        self.pid = pid; self.process = psutil.Process(pid) if psutil is not None else None
+        self.rss_samples = []
+
+    def cpu_seconds(self):
+        try:
+            if self.process is not None: times = self.process.cpu_times(); return times.user + times.system
+            with open(f"/proc/{self.pid}/stat") as f: fields = f.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        except (OSError, ValueError, IndexError): return None
+        except Exception: return None  # psutil.NoSuchProcess and friends once the app has exited
+
+    def rss_bytes(self):
+        try:
+            if self.process is not None: return self.process.memory_info().rss
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"): return int(line.split()[1]) * 1024
+        except Exception: return None
+        return None
+
+    def sample(self):
+        rss = self.rss_bytes()
+        if rss is not None: self.rss_samples.append((time.time(), rss))
+
+class DeliveryTracker:
+    """Matches values seen by the mock OBS server back to the change that produced them."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.outstanding = {}            # value -> (generated_at, source, seq)
+        self.latest_seq = {}             # source -> seq of its newest generated value
+        self.delivered_seq = {}          # source -> seq of its newest delivered value
+        self.latencies = array("d")
+        self.generated = 0; self.delivered = 0; self.stale = 0; self.failed = 0
+
+    def generated_value(self, source, value, seq, generated_at):
+        with self.lock:
+            self.outstanding[value] = (generated_at, source, seq); self.latest_seq[source] = seq; self.generated += 1
+
+    def restamp(self, values, generated_at):
+        """Moves the start time of values not delivered yet (a workbook change exists only once the file is in place)."""
+        with self.lock:
+            for value in values:
+                change = self.outstanding.get(value)
+                if change: self.outstanding[value] = (generated_at,) + change[1:]
+
+    def on_request(self, entry):
+        if entry["requestType"] != "SetInputSettings": return
+        value = (entry["requestData"].get("inputSettings") or {}).get("text")
+        with self.lock:
+            if entry["code"] != 100: self.failed += 1; return
+            change = self.outstanding.pop(value, None)
+            if change is None: return  # warm-up value or a resend of one already counted
+            generated_at, source, seq = change
+            self.latencies.append(entry["time"] - generated_at); self.delivered += 1
+            if seq < self.delivered_seq.get(source, -1): self.stale += 1  # an older value landed after a newer one
+            else: self.delivered_seq[source] = seq
+
+    def settled(self):
+        """True once every source's newest value has been delivered."""
+        with self.lock: return all(self.delivered_seq.get(source, -1) >= seq for source, seq in self.latest_seq.items())
+
+    def summary(self):
+        with self.lock:
+            superseded = sum(1 for _, source, seq in self.outstanding.values() if seq < self.latest_seq[source])
+            return {"generated": self.generated, "delivered": self.delivered, "superseded": superseded, "lost": len(self.outstanding) - superseded,
+                    "stale_deliveries": self.stale, "rejected_by_obs": self.failed, "latencies": sorted(self.latencies)}
+
+class WorkbookWriter:
+    def __init__(self, path, mappings):
+        self.path = path; self.values = [f"init.{i}" for i in range(mappings)]
+
+    def apply(self, changes):
+        for index, value in changes: self.values[index] = value
+        workbook = openpyxl.Workbook(write_only=True); sheet = workbook.create_sheet(SHEET_NAME)
+        for value in self.values: sheet.append([value])
+        workbook.save(self.path + ".tmp"); os.replace(self.path + ".tmp", self.path)
+
+class CellPusher:
+    def __init__(self, port): self.connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+
+    def apply(self, changes):
+        body = json.dumps({"sheet": SHEET_NAME, "cells": {f"A{index + 1}": value for index, value in changes}})
+        self.connection.request("POST", "/cells", body, {"Content-Type": "application/json"})
+        response = self.connection.getresponse(); response.read()
+        if response.status != 200: raise RuntimeError(f"local API answered {response.status}")
+
+def write_settings(path, workbook_path, obs_port, api_port, mappings, group_size, atomic):
+    groups = []
+    for start in range(0, mappings, group_size):
+        groups.append({"group_name": f"Load {start // group_size + 1}", "atomic": int(atomic),
+                       "mappings": [{"type": "Text", "name": f"{SOURCE_PREFIX}{i + 1}", "row": i + 1, "col": 1, "auto_update": 1} for i in range(start, min(mappings, start + group_size))]})
+    settings = {"obs_settings": {"host": "127.0.0.1", "port": obs_port, "password": "", "local_api_enabled": 1, "local_api_port": api_port},
+                "excel_settings": {"file_path": workbook_path, "sheet_name": SHEET_NAME}, "mapping_groups": groups}
+    with open(path, "w", encoding="utf-8") as f: json.dump(settings, f, indent=2)
+
+def fetch_memory_report(api_port):
+    try:
+        with urlopen(f"http://127.0.0.1:{api_port}/diagnostics/memory", timeout=30) as response: return json.loads(response.read())
+    except (OSError, ValueError): return None
+
+def scrape_app_metrics(api_port):
+    """Sums the app's own send counters from /metrics, or {} if the local API is gone."""
+    try:
+        with urlopen(f"http://127.0.0.1:{api_port}/metrics", timeout=5) as response: text = response.read().decode()
+    except OSError: return {}
+    totals = {}
+    for line in text.splitlines():
+        name = line.split("{", 1)[0].split(" ", 1)[0]
+        if name in APP_METRICS: totals[name] = totals.get(name, 0) + float(line.rsplit(" ", 1)[1])
+    return totals
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="excel2obs_load_")
+    workbook_path, settings_path, log_path = (os.path.join(workdir, name) for name in ("load.xlsx", "settings.json", "app.log"))
+    tracker = DeliveryTracker()
+    server = MockOBSServer(port=0, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate, disconnect_every=args.disconnect_every,
+                           record_limit=1000, seed=args.seed, on_request=tracker.on_request)
+    for i in range(args.mappings): server.add_input(f"{SOURCE_PREFIX}{i + 1}")
+    server.start()
+    writer = WorkbookWriter(workbook_path, args.mappings); writer.apply([])
+    api_port = free_port()
+    write_settings(settings_path, workbook_path, server.port, api_port, args.mappings, args.group_size, args.atomic)
+    log_file = open(log_path, "w", encoding="utf-8")
+    command = [sys.executable, APP_SCRIPT, "--headless", settings_path] + (["--diagnostics", str(args.diagnostics_interval)] if args.soak else [])
+    app = subprocess.Popen(command, stdout=log_file, stderr=subprocess.STDOUT)
+    sampler = ProcessSampler(app.pid); rng = random.Random(args.seed)
+    print(f"App pid {app.pid}, mock OBS on port {server.port}, local API on {api_port}, logs in {log_path}", file=sys.stderr)
+    try:
+        warmup_deadline = time.time() + WARMUP_TIMEOUT_SECONDS
+        while server.request_counts["SetInputSettings"] < args.mappings:
+            if app.poll() is not None: raise RuntimeError(f"app exited during warm-up (code {app.returncode}); see {log_path}")
+            if time.time() > warmup_deadline: raise RuntimeError(f"app did not send the initial values within {WARMUP_TIMEOUT_SECONDS}s; see {log_path}")
+            time.sleep(0.1)
+        target = writer if args.mode == "workbook" else CellPusher(api_port)
+        per_tick = max(1, round(args.mappings * args.change_fraction)); interval = 1.0 / args.rate
+        print(f"Warm-up done. {args.mode} mode: {per_tick} of {args.mappings} mappings every {interval * 1000:.0f} ms for {args.duration}s", file=sys.stderr)
+        cpu_start, started = sampler.cpu_seconds(), time.time(); sampler.sample()
+        next_tick, next_sample, tick, late_ticks = started, started, 0, 0
+        memory_start = fetch_memory_report(api_port) if args.soak else None; next_memory = started + args.diagnostics_interval
+        while time.time() - started < args.duration:
+            tick += 1
+            changes = [(index, f"c{tick}.{index}") for index in rng.sample(range(args.mappings), per_tick)]
+            generated_at = time.time()
+            # Registered before applying: a fast app can deliver a pushed value before apply() returns
+            for index, value in changes: tracker.generated_value(index, value, tick, generated_at)
+            target.apply(changes)
+            if args.mode == "workbook": tracker.restamp([value for _, value in changes], time.time())  # the change exists once the renamed file is in place
+            now = time.time()
+            if now >= next_sample: sampler.sample(); next_sample = now + SAMPLE_INTERVAL_SECONDS
+            if args.soak and now >= next_memory:
+                next_memory = now + args.diagnostics_interval; memory = fetch_memory_report(api_port)
+                if memory: print(f"  [{now - started:7.0f}s] app RSS {memory['rss_mb']} MB, trend {memory['rss_slope_mb_per_hour']} MB/h, traced {memory['traced_mb']} MB", file=sys.stderr)
+            next_tick += interval
+            if next_tick > now: time.sleep(next_tick - now)
+            else: late_ticks += 1
+            if app.poll() is not None: raise RuntimeError(f"app exited during the run (code {app.returncode}); see {log_path}")
+        elapsed = time.time() - started; cpu_end = sampler.cpu_seconds()
+        drain_deadline = time.time() + args.drain
+        while not tracker.settled() and time.time() < drain_deadline: time.sleep(0.1)
+        sampler.sample(); app_metrics = scrape_app_metrics(api_port)
+        memory_end = fetch_memory_report(api_port) if args.soak else None
+    finally:
+        if app.poll() is None:
+            app.send_signal(signal.SIGINT if os.name != "nt" else signal.CTRL_C_EVENT)
+            try: app.wait(timeout=15)
+            except subprocess.TimeoutExpired: app.kill()
+        log_file.close(); server.stop()
+
+    result = tracker.summary(); latencies = result.pop("latencies")
+    rss = [value for _, value in sampler.rss_samples]
+    report = {"mode": args.mode, "mappings": args.mappings, "rate_hz": args.rate, "change_fraction": args.change_fraction, "duration_s": round(elapsed, 1),
+              "ticks": tick, "late_ticks": late_ticks, "changes_per_s": round(result["generated"] / elapsed, 1), "delivered_per_s": round(result["delivered"] / elapsed, 1), **result,
+              "latency_ms": {name: round(value * 1000, 2) if value is not None else None for name, value in (("p50", percentile(latencies, 0.50)), ("p90", percentile(latencies, 0.90)),
+                             ("p99", percentile(latencies, 0.99)), ("max", latencies[-1] if latencies else None), ("mean", statistics.fmean(latencies) if latencies else None))},
+              "app_cpu_percent": round(100 * (cpu_end - cpu_start) / elapsed, 1) if cpu_start is not None and cpu_end is not None else None,
+              "app_rss_mb": {"start": round(rss[0] / 2**20, 1), "end": round(rss[-1] / 2**20, 1), "peak": round(max(rss) / 2**20, 1), "growth": round((rss[-1] - rss[0]) / 2**20, 1)} if rss else None,
+              "app_metrics": app_metrics, "mock": {"injected_errors": server.injected_errors, "injected_disconnects": server.injected_disconnects}}
+    if args.soak:
+        steady = [(t, value) for t, value in sampler.rss_samples if t >= started + elapsed * SOAK_WARMUP_FRACTION]
+        slope = rss_slope_mb_per_hour(steady)
+        before, after = (memory_start or {}).get("structures", {}), (memory_end or {}).get("structures", {})
+        report["soak"] = {"rss_slope_mb_per_hour": round(slope, 3) if slope is not None else None, "rss_slope_limit": args.rss_slope_limit,
+                          "rss_flat": slope is not None and slope <= args.rss_slope_limit,
+                          "grown_structures": {name: [before[name], size] for name, size in after.items() if name in before and size > before[name]},
+                          "top_growth": (memory_end or {}).get("top_growth", [])}
+    return report
+
+def print_report(report):
+    latency = report["latency_ms"]; rss = report["app_rss_mb"]
+    print(f"{report['mode']} mode, {report['mappings']} mappings, {report['rate_hz']} Hz x {report['change_fraction']:.0%} for {report['duration_s']}s ({report['late_ticks']} late ticks)")
+    print(f"  throughput   {report['changes_per_s']} changes/s generated, {report['delivered_per_s']} delivered/s")
+    print(f"  changes      {report['generated']} generated, {report['delivered']} delivered, {report['superseded']} superseded, {report['lost']} lost, "
+          f"{report['stale_deliveries']} stale, {report['rejected_by_obs']} rejected")
+    print(f"  latency ms   p50 {latency['p50']}  p90 {latency['p90']}  p99 {latency['p99']}  max {latency['max']}")
+    print(f"  app          CPU {report['app_cpu_percent']}%  RSS " + (f"{rss['start']} -> {rss['end']} MB (peak {rss['peak']}, growth {rss['growth']:+})" if rss else "n/a"))
+    if report["app_metrics"]: print("  app metrics  " + "  ".join(f"{name.replace('excel2obs_', '')}={value:g}" for name, value in report["app_metrics"].items()))
+    soak = report.get("soak")
+    if not soak: return
+    print(f"  soak         RSS trend {soak['rss_slope_mb_per_hour']} MB/h (limit {soak['rss_slope_limit']}): {'flat' if soak['rss_flat'] else 'GROWING'}")
+    for name, (before, after) in soak["grown_structures"].items(): print(f"    structure {name}: {before} -> {after}")
+    for entry in soak["top_growth"][:10]: print(f"    {entry['size_diff_kb']:>10.1f} KiB {entry['count_diff']:>+8} blocks  {entry['site']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=("workbook", "push"), default="workbook")
+    parser.add_argument("--mappings", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=10.0, help="change ticks per second")
+    parser.add_argument("--change-fraction", type=float, default=0.2, help="fraction of mappings changed per tick")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds of load after warm-up")
+    parser.add_argument("--drain", type=float, default=10.0, help="seconds to wait for the last changes after the load stops")
+    parser.add_argument("--group-size", type=int, default=50, help="mappings per group")
+    parser.add_argument("--atomic", action="store_true", help="make every group atomic (one request batch per group)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="mock OBS response latency")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of SetInputSettings the mock rejects")
+    parser.add_argument("--disconnect-every", type=float, default=0.0, metavar="SECONDS", help="mock drops the app's connections on this interval")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--soak", action="store_true", help="track the app's memory and fail if RSS keeps growing")
+    parser.add_argument("--diagnostics-interval", type=float, default=DEFAULT_DIAGNOSTICS_INTERVAL_SECONDS, help="seconds between the app's memory snapshots (--soak)")
+    parser.add_argument("--rss-slope-limit", type=float, default=DEFAULT_RSS_SLOPE_LIMIT_MB_PER_HOUR, help="allowed RSS growth in MB/hour after warm-up (--soak)")
+    parser.add_argument("--json", metavar="FILE", help="also write the report as JSON")
+    args = parser.parse_args()
+    try: report = run(args)
+    except RuntimeError as e: sys.exit(str(e))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f: json.dump(report, f, indent=2)
+    if report.get("soak") and not report["soak"]["rss_flat"]: sys.exit(1)
+
+if __name__ == "__main__":
+    main()
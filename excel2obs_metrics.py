@@ -0,0 +1,146 @@
+"""Metrics in Prometheus text format and per-change latency tracing, served at /metrics and /traces by the local API."""
+import bisect
+import itertools
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+
+from excel2obs_stats import percentile
+
+# --- Metrics (Prometheus text format, served at /metrics by the local API) ---
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEPTH_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+def _metric_labels(labels):
+    if not labels: return ""
+    escape = lambda value: str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in labels) + "}"
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name, self.help_text, self.kind = name, help_text, "counter"
+        self.lock = threading.Lock(); self.values = defaultdict(float)  # sorted label tuple -> total
+
+    def inc(self, amount=1, **labels):
+        with self.lock: self.values[tuple(sorted(labels.items()))] += amount
+
+    def samples(self):
+        with self.lock: return [(self.name, labels, value) for labels, value in self.values.items()]
+
+    def total(self):
+        with self.lock: return sum(self.values.values())
+
+class Histogram:
+    """Bucketed histogram, exported cumulatively; observe() is a bisect under a lock, cheap enough for every send."""
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name, self.help_text, self.kind, self.buckets = name, help_text, "histogram", buckets
+        self.lock = threading.Lock(); self.series = {}  # sorted label tuple -> [per-bucket counts..., sum, count]
+
+    def observe(self, value, **labels): self.observe_labeled(value, tuple(sorted(labels.items())))
+
+    def observe_labeled(self, value, key):
+        """observe() with a prebuilt sorted label tuple, for per-tick callers that should not allocate one each time."""
+        with self.lock:
+            series = self.series.get(key)
+            if series is None: series = self.series[key] = [0] * (len(self.buckets) + 2)
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets): series[index] += 1
+            series[-2] += value; series[-1] += 1
+
+    def totals(self):
+        """(sum, count) over every label set."""
+        with self.lock: return sum(series[-2] for series in self.series.values()), sum(series[-1] for series in self.series.values())
+
+    def samples(self):
+        with self.lock: series = {labels: list(values) for labels, values in self.series.items()}
+        rows = []
+        for labels, values in series.items():
+            rows += [(f"{self.name}_bucket", labels + (("le", repr(float(bound))),), count) for bound, count in zip(self.buckets, itertools.accumulate(values[:len(self.buckets)]))]
+            rows += [(f"{self.name}_bucket", labels + (("le", "+Inf"),), values[-1]), (f"{self.name}_sum", labels, values[-2]), (f"{self.name}_count", labels, values[-1])]
+        return rows
+
+class Gauge:
+    """Read at scrape time from a callback returning {sorted label tuple: value}."""
+    def __init__(self, name, help_text):
+        self.name, self.help_text, self.kind, self.function = name, help_text, "gauge", None
+
+    def set_function(self, function): self.function = function
+
+    def samples(self):
+        try: return [(self.name, labels, value) for labels, value in (self.function() if self.function else {}).items()]
+        except Exception as e: logging.debug(f"Gauge {self.name} failed: {e}"); return []
+
+class MetricsRegistry:
+    def __init__(self): self.metrics = []
+
+    def register(self, metric): self.metrics.append(metric); return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines += [f"# HELP {metric.name} {metric.help_text}", f"# TYPE {metric.name} {metric.kind}"]
+            lines += [f"{name}{_metric_labels(labels)} {value:g}" for name, labels, value in metric.samples()]
+        return "\n".join(lines) + "\n"
+
+METRICS = MetricsRegistry()
+WORKBOOK_RELOAD_SECONDS = METRICS.register(Histogram("excel2obs_workbook_reload_seconds", "Time to read the sheet (and its embedded pictures) after the workbook changed."))
+UPDATE_CYCLE_SECONDS = METRICS.register(Histogram("excel2obs_update_cycle_seconds", "Duration of one update_obs_data pass: cache check, diff and enqueue."))
+UPDATE_CYCLE_LABELS = {True: (("mode", "auto"),), False: (("mode", "manual"),)}  # by check_changes; built once so an idle tick observes without allocating
+OBS_ROUND_TRIP_SECONDS = METRICS.register(Histogram("excel2obs_obs_round_trip_seconds", "Request batch round trip to OBS, submission to response."))
+CHANGE_TO_ACK_SECONDS = METRICS.register(Histogram("excel2obs_change_to_ack_seconds", "Time from a change being queued for a target to OBS acknowledging it."))
+SEND_QUEUE_DEPTH = METRICS.register(Histogram("excel2obs_send_queue_depth", "Sources drained from a target's queue per dispatch.", DEPTH_BUCKETS))
+SEND_QUEUE_PENDING = METRICS.register(Gauge("excel2obs_send_queue_pending", "Sources currently waiting per target (queued, deferred or parked)."))
+SENDS_TOTAL = METRICS.register(Counter("excel2obs_sends_total", "Source updates acknowledged by OBS."))
+SEND_FAILURES_TOTAL = METRICS.register(Counter("excel2obs_send_failures_total", "Source updates OBS rejected or that were lost to a dropped connection."))
+SKIPPED_UPDATES_TOTAL = METRICS.register(Counter("excel2obs_skipped_updates_total", "Updates not sent because OBS already showed the value."))
+
+# --- Change Tracing (per change and target: file save -> OBS ack) ---
+# A trace is a dict of wall-clock timestamps plus "source", "mapping" and "target"; stages are the gaps between them
+TRACE_TIMESTAMPS = ("file_mtime", "detected", "parse_start", "parse_end", "diff", "enqueue", "send", "ack")
+TRACE_STAGES = (("poll", "file_mtime", "detected"), ("parse", "parse_start", "parse_end"), ("diff", "parse_end", "diff"),
+                ("prepare", "diff", "enqueue"), ("queue", "enqueue", "send"), ("obs", "send", "ack"))
+TRACE_HISTORY = 2000
+TRACE_SLOWEST = 10
+
+def trace_total(trace):
+    start = min((trace[key] for key in TRACE_TIMESTAMPS[:-1] if trace.get(key) is not None), default=None)
+    return None if start is None or trace.get("ack") is None else trace["ack"] - start
+
+class LatencyTracer:
+    """Keeps the last TRACE_HISTORY acknowledged change traces and summarizes them per stage and per source."""
+    def __init__(self, history=TRACE_HISTORY):
+        self.lock = threading.Lock(); self.completed = deque(maxlen=history)
+
+    def record(self, trace):
+        with self.lock: self.completed.append(trace)
+
+    def report(self, source=None, slowest=TRACE_SLOWEST):
+        with self.lock: traces = [trace for trace in self.completed if source is None or trace.get("source") == source]
+        summarize = lambda values: {"count": len(values), "p50_ms": round(percentile(values, 0.5) * 1000, 1), "p99_ms": round(percentile(values, 0.99) * 1000, 1)} if values else {"count": 0}
+        stages = {name: summarize(sorted(trace[end] - trace[start] for trace in traces if trace.get(start) is not None and trace.get(end) is not None))
+                  for name, start, end in TRACE_STAGES}
+        stages["total"] = summarize(sorted(total for total in map(trace_total, traces) if total is not None))
+        by_source = defaultdict(list)
+        for trace in traces:
+            total = trace_total(trace)
+            if total is not None: by_source[trace.get("source")].append(total)
+        slowest_traces = sorted((trace for trace in traces if trace_total(trace) is not None), key=trace_total, reverse=True)[:slowest]
+        return {"stages": stages, "sources": {name: summarize(sorted(totals)) for name, totals in sorted(by_source.items())},
+                "slowest": [{"source": trace.get("source"), "mapping": trace.get("mapping"), "target": trace.get("target"), "total_ms": round(trace_total(trace) * 1000, 1),
+                             **{f"{name}_ms": round((trace[end] - trace[start]) * 1000, 1) for name, start, end in TRACE_STAGES if trace.get(start) is not None and trace.get(end) is not None},
+                             "acked_at": time.strftime("%H:%M:%S", time.localtime(trace["ack"]))} for trace in slowest_traces]}
+
+def format_trace_report(report):
+    """Plain-text table of LatencyTracer.report() for the UI and `curl .../traces?format=text`."""
+    stat = lambda summary: f"{summary['count']:>6}  {summary.get('p50_ms', '-'):>9}  {summary.get('p99_ms', '-'):>9}"
+    lines = [f"{'Stage':<12}{'Count':>6}  {'p50 ms':>9}  {'p99 ms':>9}"] + [f"{name:<12}{stat(summary)}" for name, summary in report["stages"].items()]
+    if report["sources"]: lines += ["", f"{'Source (total)':<24}{'Count':>6}  {'p50 ms':>9}  {'p99 ms':>9}"] + [f"{str(name)[:23]:<24}{stat(summary)}" for name, summary in report["sources"].items()]
+    if report["slowest"]:
+        lines += ["", "Slowest recent changes:"]
+        for entry in report["slowest"]:
+            stages = ", ".join(f"{name} {entry[f'{name}_ms']}" for name, _, _ in TRACE_STAGES if f"{name}_ms" in entry)
+            lines.append(f"  {entry['acked_at']}  {entry['total_ms']:>8} ms  '{entry['source']}' {entry['mapping'] or ''} on {entry['target']}  ({stages})")
+    return "\n".join(lines) + "\n"
+
+TRACES = LatencyTracer()
@@ -0,0 +1,455 @@
+"""Stand-in for OBS Studio's obs-websocket v5 server, for load, latency and soak tests without OBS (stdlib only).
+
+    python excel2obs_mock_obs.py --port 4444 --password secret --text-inputs 500
+    python excel2obs_mock_obs.py --latency-ms 20 --jitter-ms 10 --error-rate 0.01 --disconnect-every 300 --record requests.jsonl
+
+Implements Hello/Identify (with authentication), Reidentify, single requests, RequestBatch, and the input, scene, transition
+and scene item events the app listens for. Inputs and scenes live in memory, and SetInputSettings merges
+settings the way OBS does. Every request is counted and kept (the newest --record-limit in memory; all of them
+in --record). It can also be used as a library: excel2obs_load.py runs MockOBSServer(port=0).start(), which
+picks a free port.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import secrets
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+MOCK_OBS_VERSION = "30.2.0"
+MOCK_OBS_WS_VERSION = "5.5.0"
+MOCK_FPS = 60
+DEFAULT_MOCK_PORT = 4444  # the app's default, so it connects without any settings change
+DEFAULT_MOCK_SCENE = "Scene"
+DEFAULT_TEXT_INPUT_KIND = "text_gdiplus_v3"
+DEFAULT_ERROR_CODE = 702  # RequestProcessingFailed
+DEFAULT_ERROR_REQUESTS = ("SetInputSettings",)
+DEFAULT_RECORD_LIMIT = 100_000
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# obs-websocket opcodes, event subscription bits, request status and close codes
+OP_HELLO, OP_IDENTIFY, OP_IDENTIFIED, OP_REIDENTIFY, OP_EVENT = 0, 1, 2, 3, 5
+OP_REQUEST, OP_REQUEST_RESPONSE, OP_REQUEST_BATCH, OP_REQUEST_BATCH_RESPONSE = 6, 7, 8, 9
+SUB_GENERAL, SUB_SCENES, SUB_INPUTS, SUB_TRANSITIONS, SUB_SCENE_ITEMS, SUB_UI = 1 << 0, 1 << 2, 1 << 3, 1 << 4, 1 << 7, 1 << 10
+SUB_LOW_VOLUME = 0x7FF
+EVENT_SUBSCRIPTIONS = {"InputCreated": SUB_INPUTS, "InputRemoved": SUB_INPUTS, "InputNameChanged": SUB_INPUTS, "InputSettingsChanged": SUB_INPUTS,
+                       "CurrentProgramSceneChanged": SUB_SCENES, "CurrentPreviewSceneChanged": SUB_SCENES, "SceneCreated": SUB_SCENES, "SceneRemoved": SUB_SCENES,
+                       "SceneItemCreated": SUB_SCENE_ITEMS, "SceneItemRemoved": SUB_SCENE_ITEMS, "SceneItemEnableStateChanged": SUB_SCENE_ITEMS,
+                       "SceneTransitionStarted": SUB_TRANSITIONS, "SceneTransitionEnded": SUB_TRANSITIONS,
+                       "StudioModeStateChanged": SUB_UI, "ExitStarted": SUB_GENERAL}
+MOCK_TRANSITION = "Cut"
+STATUS_SUCCESS, STATUS_MISSING_REQUEST_TYPE, STATUS_UNKNOWN_REQUEST_TYPE = 100, 203, 204
+STATUS_MISSING_REQUEST_FIELD, STATUS_STUDIO_MODE_NOT_ACTIVE = 300, 506
+STATUS_RESOURCE_NOT_FOUND, STATUS_RESOURCE_ALREADY_EXISTS = 600, 601
+BATCH_SERIAL_REALTIME, BATCH_SERIAL_FRAME = 0, 1
+CLOSE_NORMAL, CLOSE_UNKNOWN_OPCODE, CLOSE_NOT_IDENTIFIED, CLOSE_AUTHENTICATION_FAILED = 1000, 4004, 4007, 4009
+
+class MockRequestError(Exception):
+    def __init__(self, code, comment=None): super().__init__(comment); self.code = code; self.comment = comment
+
+def _field(data, name):
+    if name not in data: raise MockRequestError(STATUS_MISSING_REQUEST_FIELD, f"Your request is missing the `{name}` field.")
+    return data[name]
+
+class MockConnection:
+    """One websocket client: RFC 6455 framing by hand, then the obs-websocket handshake and request loop."""
+    def __init__(self, server, sock, address):
+        self.server = server; self.sock = sock; self.address = f"{address[0]}:{address[1]}"
+        self.send_lock = threading.Lock(); self.closed = False
+        self.identified = False; self.subscriptions = 0
+
+    def _recv_exact(self, count):
+        buffer = bytearray()
+        while len(buffer) < count:
+            chunk = self.sock.recv(count - len(buffer))
+            if not chunk: raise ConnectionError("client closed the socket")
+            buffer += chunk
+        return bytes(buffer)
+
+    def _handshake(self):
+        request = b""
+        while b"\r\n\r\n" not in request:
+            chunk = self.sock.recv(4096)
+            if not chunk or len(request) > 65536: return False
+            request += chunk
+        headers = {}
+        for line in request.split(b"\r\n\r\n", 1)[0].decode("latin-1").split("\r\n")[1:]:
+            name, _, value = line.partition(":"); headers[name.strip().lower()] = value.strip()
+        key = headers.get("sec-websocket-key")
+        if not key: self.sock.sendall(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n"); return False
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        lines = ["HTTP/1.1 101 Switching Protocols", "Upgrade: websocket", "Connection: Upgrade", f"Sec-WebSocket-Accept: {accept}"]
+        if "obswebsocket.json" in headers.get("sec-websocket-protocol", ""): lines.append("Sec-WebSocket-Protocol: obswebsocket.json")
+        self.sock.sendall(("\r\n".join(lines) + "\r\n\r\n").encode())
+        return True
+
+    def recv_message(self):
+        """Returns the next text message, or None once the client sends a close frame. Answers pings."""
+        parts = []
+        while True:
+            first, second = self._recv_exact(2)
+            opcode, length = first & 0x0F, second & 0x7F
+            if length == 126: length, = struct.unpack(">H", self._recv_exact(2))
+            elif length == 127: length, = struct.unpack(">Q", self._recv_exact(8))
+            mask = self._recv_exact(4) if second & 0x80 else None
+            payload = self._recv_exact(length)
+            if mask and length: payload = (int.from_bytes(payload, "big") ^ int.from_bytes((mask * (length // 4 + 1))[:length], "big")).to_bytes(length, "big")
+            if opcode == 0x8: self.close(CLOSE_NORMAL); return None
+            if opcode == 0x9: self.send_frame(0xA, payload); continue
+            if opcode == 0xA: continue
+            parts.append(payload)
+            if first & 0x80: return b"".join(parts).decode("utf-8")
+
+    def send_frame(self, opcode, payload):
+        length = len(payload)
+        if length < 126: header = struct.pack(">BB", 0x80 | opcode, length)
+        elif length < 65536: header = struct.pack(">BBH", 0x80 | opcode, 126, length)
+        else: header = struct.pack(">BBQ", 0x80 | opcode, 127, length)
+        with self.send_lock:
+            if self.closed: return
+            self.sock.sendall(header + payload)
+
+    def send_json(self, op, data):
+        try: self.send_frame(0x1, json.dumps({"op": op, "d": data}).encode())
+        except OSError: self.close(abrupt=True)
+
+    def close(self, code=CLOSE_NORMAL, reason="", abrupt=False):
+        """Sends a close frame (unless abrupt, which simulates OBS crashing or the network dropping) and closes the socket."""
+        if not abrupt:
+            try: self.send_frame(0x8, struct.pack(">H", code) + reason.encode())
+            except OSError: pass
+        with self.send_lock:
+            if self.closed: return
+            self.closed = True
+        try: self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError: pass
+        self.sock.close()
+
+    def serve(self):
+        server = self.server
+        try:
+            if not self._handshake(): return
+            hello = {"obsWebSocketVersion": MOCK_OBS_WS_VERSION, "rpcVersion": 1}
+            challenge, salt = secrets.token_urlsafe(32), secrets.token_urlsafe(32)
+            if server.password: hello["authentication"] = {"challenge": challenge, "salt": salt}
+            self.send_json(OP_HELLO, hello)
+            while not self.closed:
+                text = self.recv_message()
+                if text is None: break
+                message = json.loads(text); op = message.get("op"); data = message.get("d") or {}
+                if op == OP_IDENTIFY and not self.identified:
+                    if server.password:
+                        secret = base64.b64encode(hashlib.sha256((server.password + salt).encode()).digest())
+                        if data.get("authentication") != base64.b64encode(hashlib.sha256(secret + challenge.encode()).digest()).decode():
+                            self.close(CLOSE_AUTHENTICATION_FAILED, "Authentication failed."); break
+                    self.subscriptions = data.get("eventSubscriptions", SUB_LOW_VOLUME); self.identified = True
+                    self.send_json(OP_IDENTIFIED, {"negotiatedRpcVersion": 1})
+                elif not self.identified: self.close(CLOSE_NOT_IDENTIFIED, "You must identify before sending other messages."); break
+                elif op == OP_REIDENTIFY:
+                    self.subscriptions = data.get("eventSubscriptions", self.subscriptions); self.send_json(OP_IDENTIFIED, {"negotiatedRpcVersion": 1})
+                elif op in (OP_REQUEST, OP_REQUEST_BATCH):
+                    if not server._simulate_network(self): break
+                    if op == OP_REQUEST: self.send_json(OP_REQUEST_RESPONSE, {"requestId": data.get("requestId"), **server.handle_request(self, data.get("requestType"), data.get("requestData"))})
+                    else: self.send_json(OP_REQUEST_BATCH_RESPONSE, {"requestId": data.get("requestId"), "results": server.handle_batch(self, data)})
+                else: self.close(CLOSE_UNKNOWN_OPCODE, f"Unknown OpCode: {op}"); break
+        except (OSError, ValueError): pass  # dropped sockets and malformed frames or JSON end the connection
+        finally:
+            self.close(abrupt=True)
+            with server.lock: server.connections.discard(self)
+
+class MockOBSServer:
+    """In-memory OBS: inputs (name -> {"kind", "settings"}), scenes (name -> [scene items]), a program scene and, in studio mode, a preview scene.
+
+    latency_ms/jitter_ms delay every request message (a batch counts once). error_rate fails that fraction of the
+    request types in error_requests with error_code. disconnect_rate drops a client instead of answering a
+    message, and disconnect_every drops every client on a timer.
+    """
+    def __init__(self, host="127.0.0.1", port=DEFAULT_MOCK_PORT, password="", latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, error_code=DEFAULT_ERROR_CODE,
+                 error_requests=DEFAULT_ERROR_REQUESTS, disconnect_rate=0.0, disconnect_every=0.0, record_path=None, record_limit=DEFAULT_RECORD_LIMIT, seed=None, on_request=None):
+        self.host, self.port, self.password = host, port, password
+        self.latency, self.jitter = latency_ms / 1000.0, jitter_ms / 1000.0
+        self.error_rate, self.error_code, self.error_requests = error_rate, error_code, set(error_requests or ())
+        self.disconnect_rate, self.disconnect_every = disconnect_rate, disconnect_every
+        self.random = random.Random(seed)
+        self.lock = threading.RLock()
+        self.inputs = {}; self.scenes = {DEFAULT_MOCK_SCENE: []}; self.program_scene = DEFAULT_MOCK_SCENE
+        self.preview_scene = None  # None while studio mode is off
+        self.next_item_id = 1
+        self.connections = set()
+        self.requests = deque(maxlen=record_limit)  # newest requests: {"time", "client", "requestType", "requestData", "code", "batch"}
+        self.request_counts = Counter(); self.injected_errors = 0; self.injected_disconnects = 0
+        self.on_request = on_request  # called with every recorded entry (on the client's thread), e.g. to time deliveries
+        self.record_file = open(record_path, "a", encoding="utf-8", buffering=1) if record_path else None  # line-buffered so a killed run keeps its log
+        self.listener = None; self.running = False
+
+    # --- State setup (usable before or after start) ---
+    def add_input(self, name, kind=DEFAULT_TEXT_INPUT_KIND, settings=None, scene=DEFAULT_MOCK_SCENE):
+        with self.lock:
+            self.inputs[name] = {"kind": kind, "settings": dict(settings or {})}
+            item = self._add_scene_item(scene, name) if scene else None
+        self.emit("InputCreated", {"inputName": name, "inputKind": kind, "unversionedInputKind": kind, "inputSettings": dict(settings or {}), "defaultInputSettings": {}})
+        if item: self.emit("SceneItemCreated", {"sceneName": scene, "sourceName": name, "sceneItemId": item["sceneItemId"], "sceneItemIndex": item["sceneItemIndex"]})
+
+    def remove_input(self, name):
+        with self.lock:
+            if self.inputs.pop(name, None) is None: return False
+            for items in self.scenes.values(): items[:] = [item for item in items if item["sourceName"] != name]
+        self.emit("InputRemoved", {"inputName": name}); return True
+
+    def set_program_scene(self, scene):
+        with self.lock:
+            if scene not in self.scenes: raise MockRequestError(STATUS_RESOURCE_NOT_FOUND, f"No source was found by the name of `{scene}`.")
+            self.program_scene = scene
+        self.emit("SceneTransitionStarted", {"transitionName": MOCK_TRANSITION}); self.emit("CurrentProgramSceneChanged", {"sceneName": scene})
+        self.emit("SceneTransitionEnded", {"transitionName": MOCK_TRANSITION})
+
+    def set_studio_mode(self, enabled):
+        with self.lock: self.preview_scene = self.program_scene if enabled else None
+        self.emit("StudioModeStateChanged", {"studioModeEnabled": bool(enabled)})
+
+    def set_preview_scene(self, scene):
+        with self.lock:
+            if self.preview_scene is None: raise MockRequestError(STATUS_STUDIO_MODE_NOT_ACTIVE, "Studio mode is not active.")
+            if scene not in self.scenes: raise MockRequestError(STATUS_RESOURCE_NOT_FOUND, f"No source was found by the name of `{scene}`.")
+            self.preview_scene = scene
+        self.emit("CurrentPreviewSceneChanged", {"sceneName": scene})
+
+    def _add_scene_item(self, scene, source_name, enabled=True):
+        items = self.scenes.setdefault(scene, [])
+        item = {"sourceName": source_name, "sourceType": "OBS_SOURCE_TYPE_SCENE" if source_name in self.scenes else "OBS_SOURCE_TYPE_INPUT",
+                "inputKind": self.inputs.get(source_name, {}).get("kind"), "isGroup": False, "sceneItemId": self.next_item_id,
+                "sceneItemEnabled": bool(enabled), "sceneItemIndex": len(items), "sceneItemTransform": {"positionX": 0.0, "positionY": 0.0, "scaleX": 1.0, "scaleY": 1.0}}
+        self.next_item_id += 1; items.append(item)
+        return item
+
+    def _scene_item(self, data):
+        scene, item_id = _field(data, "sceneName"), _field(data, "sceneItemId")
+        for item in self.scenes.get(scene, ()):
+            if item["sceneItemId"] == item_id: return scene, item
+        raise MockRequestError(STATUS_RESOURCE_NOT_FOUND, f"No scene items were found in scene `{scene}` with the ID `{item_id}`.")
+
+    def _input(self, data):
+        name = _field(data, "inputName")
+        if name not in self.inputs: raise MockRequestError(STATUS_RESOURCE_NOT_FOUND, f"No source was found by the name of `{name}`.")
+        return name, self.inputs[name]
+
+    # --- Lifecycle ---
+    def start(self):
+        self.listener = socket.create_server((self.host, self.port)); self.port = self.listener.getsockname()[1]
+        self.running = True
+        threading.Thread(target=self._accept_loop, daemon=True, name="MockOBSAccept").start()
+        if self.disconnect_every > 0: threading.Thread(target=self._disconnect_loop, daemon=True, name="MockOBSDisconnects").start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.listener is not None: self.listener.close()
+        self.drop_connections(abrupt=False)
+        if self.record_file is not None: self.record_file.close(); self.record_file = None
+
+    def drop_connections(self, abrupt=True):
+        with self.lock: connections = list(self.connections)
+        for connection in connections: connection.close(abrupt=abrupt)
+        return len(connections)
+
+    def _accept_loop(self):
+        while self.running:
+            try: sock, address = self.listener.accept()
+            except OSError: break
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection = MockConnection(self, sock, address)
+            with self.lock: self.connections.add(connection)
+            threading.Thread(target=connection.serve, daemon=True, name=f"MockOBS-{connection.address}").start()
+
+    def _disconnect_loop(self):
+        while self.running:
+            time.sleep(self.disconnect_every)
+            if self.running: self.injected_disconnects += self.drop_connections()
+
+    def _simulate_network(self, connection):
+        """Applies latency/jitter before a response. Returns False if this message drops the connection instead."""
+        if self.disconnect_rate and self.random.random() < self.disconnect_rate:
+            self.injected_disconnects += 1; connection.close(abrupt=True); return False
+        delay = self.latency + (self.random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        if delay > 0: time.sleep(delay)
+        return True
+
+    # --- Requests and events ---
+    def emit(self, event_type, event_data):
+        category = EVENT_SUBSCRIPTIONS.get(event_type, SUB_GENERAL)
+        with self.lock: connections = [c for c in self.connections if c.identified and c.subscriptions & category]
+        for connection in connections: connection.send_json(OP_EVENT, {"eventType": event_type, "eventIntent": category, "eventData": event_data})
+
+    def handle_batch(self, connection, data):
+        execution_type = data.get("executionType", BATCH_SERIAL_REALTIME); halt = data.get("haltOnFailure", False); results = []
+        for request in data.get("requests", []):
+            result = self.handle_request(connection, request.get("requestType"), request.get("requestData"), batch=execution_type)
+            if "requestId" in request: result["requestId"] = request["requestId"]
+            results.append(result)
+            if halt and not result["requestStatus"]["result"]: break
+        return results
+
+    def handle_request(self, connection, request_type, request_data, batch=None):
+        """Runs one request and returns its response fields (requestType, requestStatus, responseData), recording it."""
+        request_data = request_data or {}; response_data = None
+        try:
+            if not request_type: raise MockRequestError(STATUS_MISSING_REQUEST_TYPE, "Your request is missing a `requestType`.")
+            handler = getattr(self, f"_request_{request_type}", None)
+            if handler is None: raise MockRequestError(STATUS_UNKNOWN_REQUEST_TYPE, f"Your request type is not valid: {request_type}")
+            if request_type in self.error_requests and self.error_rate and self.random.random() < self.error_rate:
+                self.injected_errors += 1; raise MockRequestError(self.error_code, "Injected failure.")
+            with self.lock: response_data = handler(request_data, batch)
+            status = {"result": True, "code": STATUS_SUCCESS}
+        except MockRequestError as e:
+            status = {"result": False, "code": e.code, **({"comment": e.comment} if e.comment else {})}
+        self._record(connection, request_type, request_data, status["code"], batch)
+        return {"requestType": request_type, "requestStatus": status, **({"responseData": response_data} if response_data is not None else {})}
+
+    def _record(self, connection, request_type, request_data, code, batch):
+        entry = {"time": time.time(), "client": connection.address, "requestType": request_type, "requestData": request_data, "code": code, "batch": batch}
+        with self.lock:
+            self.requests.append(entry); self.request_counts[request_type] += 1
+            if self.record_file is not None: self.record_file.write(json.dumps(entry) + "\n")
+        if self.on_request is not None: self.on_request(entry)
+
+    def _request_GetVersion(self, data, batch):
+        return {"obsVersion": MOCK_OBS_VERSION, "obsWebSocketVersion": MOCK_OBS_WS_VERSION, "rpcVersion": 1, "platform": "mock", "platformDescription": "Excel2OBS mock OBS",
+                "availableRequests": sorted(name[len("_request_"):] for name in dir(self) if name.startswith("_request_")), "supportedImageFormats": ["png", "jpg"]}
+
+    def _request_GetInputList(self, data, batch):
+        kind = data.get("inputKind")
+        return {"inputs": [{"inputName": name, "inputKind": i["kind"], "unversionedInputKind": i["kind"]} for name, i in self.inputs.items() if kind in (None, i["kind"])]}
+
+    def _request_GetInputSettings(self, data, batch):
+        _, source = self._input(data); return {"inputSettings": dict(source["settings"]), "inputKind": source["kind"]}
+
+    def _request_SetInputSettings(self, data, batch):
+        name, source = self._input(data); settings = _field(data, "inputSettings")
+        if data.get("overlay", True): source["settings"].update(settings)
+        else: source["settings"] = dict(settings)
+        self.emit("InputSettingsChanged", {"inputName": name, "inputSettings": dict(source["settings"])})
+
+    def _request_CreateInput(self, data, batch):
+        scene, name, kind = _field(data, "sceneName"), _field(data, "inputName"), _field(data, "inputKind")
+        if name in self.inputs or name in self.scenes: raise MockRequestError(STATUS_RESOURCE_ALREADY_EXISTS, "A source already exists by that input name.")
+        if scene not in self.scenes: raise MockRequestError(STATUS_RESOURCE_NOT_FOUND, f"No source was found by the name of `{scene}`.")
+        self.add_input(name, kind, data.get("inputSettings"), scene=None)
+        item = self._add_scene_item(scene, name, data.get("sceneItemEnabled", True))
+        self.emit("SceneItemCreated", {"sceneName": scene, "sourceName": name, "sceneItemId": item["sceneItemId"], "sceneItemIndex": item["sceneItemIndex"]})
+        return {"sceneItemId": item["sceneItemId"]}
+
+    def _request_RemoveInput(self, data, batch):
+        name, _ = self._input(data); self.remove_input(name)
+
+    def _request_GetSceneList(self, data, batch):
+        return {"currentProgramSceneName": self.program_scene, "currentPreviewSceneName": self.preview_scene, "scenes": [{"sceneName": name, "sceneIndex": index} for index, name in enumerate(self.scenes)]}
+
+    def _request_GetCurrentProgramScene(self, data, batch):
+        return {"currentProgramSceneName": self.program_scene, "sceneName": self.program_scene}
+
+    def _request_SetCurrentProgramScene(self, data, batch):
+        self.set_program_scene(_field(data, "sceneName"))
+
+    def _request_GetCurrentPreviewScene(self, data, batch):
+        if self.preview_scene is None: raise MockRequestError(STATUS_STUDIO_MODE_NOT_ACTIVE, "Studio mode is not active.")
+        return {"currentPreviewSceneName": self.preview_scene, "sceneName": self.preview_scene}
+
+    def _request_SetCurrentPreviewScene(self, data, batch):
+        self.set_preview_scene(_field(data, "sceneName"))
+
+    def _request_GetStudioModeEnabled(self, data, batch):
+        return {"studioModeEnabled": self.preview_scene is not None}
+
+    def _request_SetStudioModeEnabled(self, data, batch):
+        self.set_studio_mode(_field(data, "studioModeEnabled"))
+
+    def _request_CreateScene(self, data, batch):
+        scene = _field(data, "sceneName")
+        if scene in self.scenes or scene in self.inputs: raise MockRequestError(STATUS_RESOURCE_ALREADY_EXISTS, "A source already exists by that scene name.")
+        self.scenes[scene] = []; self.emit("SceneCreated", {"sceneName": scene, "isGroup": False})
+
+    def _request_GetSceneItemList(self, data, batch):
+        scene = _field(data, "sceneName")
+        if scene not in self.scenes: raise MockRequestError(STATUS_RESOURCE_NOT_FOUND, f"No source was found by the name of `{scene}`.")
+        return {"sceneItems": [{key: value for key, value in item.items() if key != "sceneItemTransform"} for item in self.scenes[scene]]}
+
+    def _request_GetGroupSceneItemList(self, data, batch):
+        raise MockRequestError(STATUS_RESOURCE_NOT_FOUND, f"No group was found by the name of `{_field(data, 'sceneName')}`.")  # groups are not modelled
+
+    def _request_CreateSceneItem(self, data, batch):
+        scene, source = _field(data, "sceneName"), _field(data, "sourceName")
+        if scene not in self.scenes: raise MockRequestError(STATUS_RESOURCE_NOT_FOUND, f"No source was found by the name of `{scene}`.")
+        if source not in self.inputs and source not in self.scenes: raise MockRequestError(STATUS_RESOURCE_NOT_FOUND, f"No source was found by the name of `{source}`.")
+        item = self._add_scene_item(scene, source, data.get("sceneItemEnabled", True))
+        self.emit("SceneItemCreated", {"sceneName": scene, "sourceName": source, "sceneItemId": item["sceneItemId"], "sceneItemIndex": item["sceneItemIndex"]})
+        return {"sceneItemId": item["sceneItemId"]}
+
+    def _request_SetSceneItemEnabled(self, data, batch):
+        scene, item = self._scene_item(data); item["sceneItemEnabled"] = bool(_field(data, "sceneItemEnabled"))
+        self.emit("SceneItemEnableStateChanged", {"sceneName": scene, "sceneItemId": item["sceneItemId"], "sceneItemEnabled": item["sceneItemEnabled"]})
+
+    def _request_SetSceneItemIndex(self, data, batch):
+        scene, item = self._scene_item(data); items = self.scenes[scene]
+        items.remove(item); items.insert(max(0, min(int(_field(data, "sceneItemIndex")), len(items))), item)
+        for index, each in enumerate(items): each["sceneItemIndex"] = index
+
+    def _request_GetSceneItemTransform(self, data, batch):
+        _, item = self._scene_item(data); return {"sceneItemTransform": dict(item["sceneItemTransform"])}
+
+    def _request_SetSceneItemTransform(self, data, batch):
+        _, item = self._scene_item(data); item["sceneItemTransform"].update(_field(data, "sceneItemTransform"))
+
+    def _request_Sleep(self, data, batch):
+        # Only meaningful inside a batch; the lock is released while sleeping so other clients keep going
+        seconds = data.get("sleepFrames", 0) / MOCK_FPS if batch == BATCH_SERIAL_FRAME else data.get("sleepMillis", 0) / 1000.0
+        self.lock.release()
+        try: time.sleep(max(0.0, min(seconds, 50.0)))
+        finally: self.lock.acquire()
+
+    def stats(self):
+        with self.lock:
+            return {"requests": sum(self.request_counts.values()), "by_type": dict(self.request_counts), "injected_errors": self.injected_errors,
+                    "injected_disconnects": self.injected_disconnects, "connections": len(self.connections)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_MOCK_PORT)
+    parser.add_argument("--password", default="", help="enable authentication with this password")
+    parser.add_argument("--input", action="append", default=[], metavar="NAME=KIND", help=f"add an input (repeatable; kind defaults to {DEFAULT_TEXT_INPUT_KIND})")
+    parser.add_argument("--text-inputs", type=int, default=0, metavar="N", help="add N text inputs named 'Text 1' .. 'Text N'")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of --error-request requests that fail")
+    parser.add_argument("--error-code", type=int, default=DEFAULT_ERROR_CODE)
+    parser.add_argument("--error-request", action="append", metavar="TYPE", help=f"request type that can fail (repeatable; default {', '.join(DEFAULT_ERROR_REQUESTS)})")
+    parser.add_argument("--disconnect-rate", type=float, default=0.0, help="chance that a request message drops the connection instead of being answered")
+    parser.add_argument("--disconnect-every", type=float, default=0.0, metavar="SECONDS", help="drop every client on this interval")
+    parser.add_argument("--record", metavar="FILE", help="append every request as a JSON line")
+    parser.add_argument("--stats-interval", type=float, default=10.0, help="seconds between request count lines (0 to disable)")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    server = MockOBSServer(args.host, args.port, args.password, args.latency_ms, args.jitter_ms, args.error_rate, args.error_code, args.error_request or DEFAULT_ERROR_REQUESTS,
+                           args.disconnect_rate, args.disconnect_every, args.record, seed=args.seed)
+    for spec in args.input:
+        name, _, kind = spec.partition("="); server.add_input(name.strip(), kind.strip() or DEFAULT_TEXT_INPUT_KIND)
+    for index in range(1, args.text_inputs + 1): server.add_input(f"Text {index}")
+    try: server.start()
+    except OSError as e: sys.exit(f"Cannot listen on {args.host}:{args.port}: {e}")
+    print(f"Mock OBS listening on ws://{args.host}:{server.port} with {len(server.inputs)} inputs{' (password required)' if args.password else ''}. Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(args.stats_interval or 3600)
+            if args.stats_interval: print(json.dumps(server.stats()), flush=True)
+    except KeyboardInterrupt: pass
+    finally: server.stop(); print(json.dumps(server.stats()))
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,8 @@
 import pandas as pd
 import openpyxl
 import obsws_python as obs
-from obsws_python.error import OBSSDKRequestError
+from obsws_python.error import OBSSDKRequestError, OBSSDKTimeoutError
+from websocket import WebSocketException
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from tkinter import filedialog, TclError
@@ -12,7 +13,28 @@ import threading
 import time
 import queue
 import json
+import random
+import functools
+import hashlib
+import posixpath
+import zipfile
+import cProfile
+import signal
+import xml.etree.ElementTree as ET
+from openpyxl.utils.cell import get_column_letter
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+from excel2obs_api import LOCAL_API_HOST, LocalAPIServer, OverlayHub, normalize_cell_value, parse_cell_address
+from excel2obs_diagnostics import MemoryDiagnostics, PROFILE_WINDOW_SECONDS, SamplingProfiler, format_memory_report
+from excel2obs_flight import (EVENT_ACK, EVENT_BATCH, EVENT_CHANGE, EVENT_CONNECT, EVENT_CYCLE, EVENT_DISCONNECT, EVENT_FAILURE, EVENT_RELOAD, FLIGHT,
+                              FLIGHT_RECORDER_ERROR_STREAK, FLIGHT_RECORDER_SLOW_CYCLE_SECONDS)
+from excel2obs_metrics import (CHANGE_TO_ACK_SECONDS, OBS_ROUND_TRIP_SECONDS, SENDS_TOTAL, SEND_FAILURES_TOTAL, SEND_QUEUE_DEPTH, SEND_QUEUE_PENDING,
+                               SKIPPED_UPDATES_TOTAL, TRACES, UPDATE_CYCLE_LABELS, UPDATE_CYCLE_SECONDS, WORKBOOK_RELOAD_SECONDS, format_trace_report)
+from excel2obs_snapshot import SharedSnapshotWriter
+try: from PIL import Image as PILImage
+except ImportError: PILImage = None  # optional: image pre-scaling is disabled without Pillow
+try: from watchdog.observers import Observer as WatchdogObserver
+except ImportError: WatchdogObserver = None  # optional: referenced files are polled without watchdog
 
 # --- Configuration (Defaults) ---
 DEFAULT_OBS_WS_HOST = "localhost"
@@ -23,10 +45,62 @@ DEFAULT_THEME = "litera"
 CONNECTION_TIMEOUT_SECONDS = 5
 DISCONNECT_TIMEOUT_SECONDS = 2
 STATUS_QUEUE_CHECK_MS = 100
+# Performance panel: while it is open the update thread rebuilds a snapshot this often; the Tk thread only reads it
+PERF_SNAPSHOT_INTERVAL_SECONDS = 1.0
+PERF_PANEL_REFRESH_MS = 1000
+PERF_STALE_WARNING_SECONDS = 2.0  # a group whose oldest unacknowledged change is older than this turns the staleness line amber
 LOG_LEVEL = logging.INFO
 DEFAULT_GROUP_NAME = "Default Group"
+DEFAULT_DEFER_HIDDEN_SOURCES = 0
 EXPAND_SYMBOL = "▼"
 COLLAPSE_SYMBOL = "▲"
+RECONNECT_BACKOFF_INITIAL_SECONDS = 0.5
+RECONNECT_BACKOFF_MAX_SECONDS = 30
+KEEPALIVE_INTERVAL_SECONDS = 5
+SUPERVISOR_TICK_SECONDS = 0.25
+# Errors meaning the websocket itself is gone (as opposed to a single request failing)
+OBS_CONNECTION_ERRORS = (ConnectionError, TimeoutError, OSError, WebSocketException, OBSSDKTimeoutError)
+# obs-websocket v5 RequestBatchExecutionType values
+BATCH_SERIAL_REALTIME = 0
+BATCH_SERIAL_FRAME = 1
+BATCH_PARALLEL = 2
+BATCH_RESPONSE_TIMEOUT_SECONDS = 10  # waiting longer than this for a batch's op 9 response counts as a lost connection
+BATCH_MAX_STRAY_FRAMES = 1000        # other frames (responses to abandoned requests) skipped while waiting, at most
+ATOMIC_BATCH_MODES = {"SerialFrame": BATCH_SERIAL_FRAME, "Parallel": BATCH_PARALLEL}
+DEFAULT_ATOMIC_BATCH_MODE = "SerialFrame"
+# Buffered image mappings swap between the mapped source and a hidden sibling input with this suffix
+DOUBLE_BUFFER_TYPE = "Image (Buffered)"
+DOUBLE_BUFFER_SUFFIX = " [buffer]"
+DOUBLE_BUFFER_SETTLE_FRAMES = 1
+# Image pre-scaling: referenced images are shrunk once into a content-addressed cache and OBS gets the cached copy
+IMAGE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".excel2obs", "image_cache")
+IMAGE_CACHE_WORKERS = 2
+IMAGE_PRESCALE_FORMATS = {"PNG": ".png", "WEBP": ".webp", "JPEG": ".jpg"}
+DEFAULT_IMAGE_PRESCALE_FORMAT = "PNG"
+ATOMIC_PRESCALE_WAIT_SECONDS = 5
+# Pictures pasted into the workbook are extracted here, named by content hash
+EMBEDDED_IMAGE_CACHE_DIR = os.path.join(IMAGE_CACHE_DIR, "embedded")
+# Files behind Image/Media mappings are watched so an in-place overwrite reaches OBS
+FILE_WATCH_POLL_SECONDS = 1.0
+FILE_WATCH_SETTLE_SECONDS = 0.3  # writers save in chunks; wait for the burst of events to end
+# Local HTTP API (excel2obs_api.py) where producers push cell values instead of writing the workbook
+DEFAULT_LOCAL_API_PORT = 4460
+DEFAULT_LOCAL_API_ENABLED = 0
+LOCAL_API_MAX_PUSHED_CELLS = 100_000  # across all sheets; DELETE /cells frees them
+# Text-file sink: one file per text source for OBS "Read from file" mode (no websocket needed)
+TEXT_SINK_TICK_SECONDS = 0.05
+TEXT_SINK_INVALID_CHARS = '<>:"/\\|?*'
+TEXT_SINK_HASH_CHARS = 8  # of sha1(source name), appended when two sources would share a file
+# Shared-memory snapshot of mapped values for other local processes (excel2obs_snapshot.py)
+DEFAULT_SHARED_SNAPSHOT_ENABLED = 0
+# Only the event categories the targets react to; everything else (and all high-volume events) stays off
+OBS_EVENT_SUBSCRIPTIONS = obs.Subs.INPUTS | obs.Subs.SCENES | obs.Subs.TRANSITIONS | obs.Subs.SCENEITEMS | obs.Subs.UI
+OBS_NOT_FOUND_CODE = 600
+# Caps on structures that would otherwise grow for the whole session (see also TRACE_HISTORY in excel2obs_metrics, FLIGHT_RECORDER_EVENTS in excel2obs_flight)
+STATUS_QUEUE_MAX = 1000       # status bar messages waiting for the Tk thread; the oldest is dropped when full
+IMAGE_JOB_CACHE_MAX = 512     # pre-scale results remembered by ImageAssetCache (one per file version and size)
+EMBEDDED_BLOB_CACHE_MAX = 512 # extracted workbook pictures remembered by WorkbookImageExtractor
+STATE_PRUNE_INTERVAL_SECONDS = 30  # per-source state for sources no mapping points at any more is dropped this often
 
 # --- Logging Setup ---
 logging.basicConfig(
@@ -34,34 +108,1034 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(threadName)s - %(message)s'
 )
 
+# --- OBS Helpers ---
+def _backoff_delay(attempt):
+    """Jittered exponential backoff: half of the capped delay is fixed, the other half is random."""
+    delay = min(RECONNECT_BACKOFF_MAX_SECONDS, RECONNECT_BACKOFF_INITIAL_SECONDS * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+def send_request(client, req_type, req_data=None):
+    """Sends a single request without obsws_python's exception logging. Returns responseData or raises OBSSDKRequestError."""
+    result = send_request_batch(client, [(req_type, req_data)])[0]
+    status = result.get("requestStatus", {})
+    if not status.get("result"): raise OBSSDKRequestError(req_type, status.get("code"), status.get("comment"))
+    return result.get("responseData") or {}
+
+# --- Settings Builders (compiled once per mapping type + OBS input kind) ---
+# The type menu offers the short names; exported settings from older versions use the long ones
+DATA_TYPE_CATEGORIES = {"Text": "text", "Image": "image", DOUBLE_BUFFER_TYPE: "image", "Browser": "url", "Browser URL": "url", "Media": "media", "Media File": "media"}
+INPUT_KIND_CATEGORIES = {
+    "text_ft2_source": "text", "text_ft2_source_v2": "text", "text_gdiplus": "text", "text_gdiplus_v2": "text", "text_gdiplus_v3": "text",
+    "image_source": "image", "slideshow": "image", "slideshow_v2": "image",
+    "browser_source": "url", "ffmpeg_source": "media", "vlc_source": "media",
+}
+
+# Builders only set the content key: OBS leaves default-valued flags out of GetInputSettings,
+# so sending mode flags would make every cached comparison look different.
+def _text_builder(value): return {"text": str(value).strip()}
+
+def _url_builder(value): return {"url": str(value).strip()}
+
+@functools.lru_cache(maxsize=4096)
+def resolve_media_path(value):
+    """Absolute path for a cell's file reference, resolved once per distinct cell string."""
+    return os.path.abspath(str(value).strip())
+
+def _path_builder(key):
+    def build(value):
+        path = str(value).strip()
+        return {key: resolve_media_path(path)} if path else None
+    return build
+
+def _playlist_builder(key):
+    def build(value):
+        path = str(value).strip()
+        return {key: [{"value": resolve_media_path(path), "hidden": False, "selected": False}]} if path else None
+    return build
+
+KIND_BUILDERS = {
+    "text_ft2_source": _text_builder, "text_ft2_source_v2": _text_builder, "text_gdiplus": _text_builder, "text_gdiplus_v2": _text_builder, "text_gdiplus_v3": _text_builder,
+    "image_source": _path_builder("file"), "slideshow": _playlist_builder("files"), "slideshow_v2": _playlist_builder("files"),
+    "browser_source": _url_builder, "ffmpeg_source": _path_builder("local_file"), "vlc_source": _playlist_builder("playlist"),
+}
+CATEGORY_BUILDERS = {"text": _text_builder, "image": _path_builder("file"), "url": _url_builder, "media": _path_builder("local_file")}
+
+@functools.lru_cache(maxsize=None)
+def compile_settings_builder(data_type, input_kind=None):
+    """Returns a value -> settings function for a mapping type driving an input of the given kind.
+    Unknown or third-party kinds get the type's usual settings key. Raises ValueError on a type/kind mismatch."""
+    category = DATA_TYPE_CATEGORIES.get(data_type)
+    if category is None: raise ValueError(f"Unknown data type '{data_type}'")
+    kind_category = INPUT_KIND_CATEGORIES.get(input_kind)
+    if kind_category is None: return CATEGORY_BUILDERS[category]
+    if kind_category != category: raise ValueError(f"a '{data_type}' mapping cannot drive a '{input_kind}' input")
+    return KIND_BUILDERS[input_kind]
+
+def _reject_value(value): return None
+
+def send_request_batch(client, requests, execution_type=BATCH_SERIAL_REALTIME, halt_on_failure=False):
+    """Sends (requestType, requestData) pairs as one RequestBatch and returns the per-request results.
+    obsws_python has no batch call, so this talks to the ReqClient's websocket directly."""
+    batch_id = f"excel2obs-{random.getrandbits(32):08x}"
+    payload = {"op": 8, "d": {"requestId": batch_id, "haltOnFailure": halt_on_failure, "executionType": execution_type,
+                              "requests": [{"requestType": req_type, "requestData": req_data} for req_type, req_data in requests]}}
+    ws = client.base_client.ws
+    ws.send(json.dumps(payload))
+    # A closed socket reads as an empty frame; raise connection errors (OBS_CONNECTION_ERRORS) so callers reconnect
+    deadline = time.monotonic() + BATCH_RESPONSE_TIMEOUT_SECONDS
+    for _ in range(BATCH_MAX_STRAY_FRAMES + 1):
+        frame = ws.recv()
+        if not frame: raise ConnectionError("OBS closed the connection while a request batch was waiting")
+        try: response = json.loads(frame)
+        except ValueError as e: raise ConnectionError(f"unreadable frame from OBS: {e}") from e
+        if response.get("op") == 9 and response.get("d", {}).get("requestId") == batch_id: return response["d"].get("results", [])
+        if time.monotonic() > deadline: raise TimeoutError(f"no response to request batch within {BATCH_RESPONSE_TIMEOUT_SECONDS}s")
+    raise ConnectionError(f"no response to request batch after {BATCH_MAX_STRAY_FRAMES} other frames")
+
+def _settings_match(current, settings):
+    """True if OBS's current settings already contain every key/value we would send."""
+    return current is not None and all(current.get(key) == value for key, value in settings.items())
+
+def _disconnect_quietly(client):
+    try: client.disconnect()
+    except Exception as e: logging.debug(f"Ignoring error while closing OBS client: {e}")
+
+def parse_obs_targets(host, port_str, password, extra_targets):
+    """Returns [(host, port, password), ...] for the main target plus the comma-separated extras.
+    Extras are 'host:port' (sharing the main password) or 'password@host:port'. Raises ValueError on bad input."""
+    if not port_str.strip().isdigit(): raise ValueError("Invalid OBS Port: Must be a number.")
+    targets = [(host.strip() or DEFAULT_OBS_WS_HOST, int(port_str.strip()), password)]
+    for entry in extra_targets.replace(";", ",").split(","):
+        entry = entry.strip()
+        if not entry: continue
+        entry_password, _, address = entry.rpartition("@")
+        entry_host, _, entry_port = address.rpartition(":")
+        if not entry_host or not entry_port.isdigit(): raise ValueError(f"Invalid extra OBS target '{entry}': expected host:port or password@host:port.")
+        targets.append((entry_host, int(entry_port), entry_password if "@" in entry else password))
+    return targets
+
+# --- OBS Target ---
+class OBSTarget:
+    """One OBS instance with its own connection, send queue, health state and last-sent cache.
+
+    A single worker thread per target connects with backoff, pings idle connections and drains the
+    queue, so a dead or slow OBS never delays the other targets fed by the same pipeline."""
+
+    def __init__(self, host, port, password, on_status=None, on_health=None, mapped_sources=None, scene_aware=False):
+        self.host, self.port, self.password = host, port, password
+        self.label = f"{host}:{port}"
+        self.on_status = on_status; self.on_health = on_health
+        self.mapped_sources = mapped_sources  # callable returning the source names the mappings point at
+        self.client = None; self.event_client = None; self.connected = False; self.health = "Disconnected"
+        self.inputs = None   # input name -> inputKind from GetInputList, kept current by input events; None if unknown
+        self.parked = {}     # source -> queued item for sources OBS does not have; resumed when the input appears
+        self.scene_aware = scene_aware
+        self.deferred = {}   # source -> newest item for sources not on program/preview; flushed when they become visible
+        self.program_scene = None; self.preview_scene = None
+        self.scene_inputs = {}         # scene name -> input names reachable from it (nested scenes and groups included)
+        self.visible_inputs = None     # inputs on program/preview; None means unknown or studio mode off, so nothing is deferred
+        self._warned_no_studio = False; self._preview_unknown = False; self._in_transition = False
+        self._visibility_dirty = False  # only ever set while scene_aware: _refresh_visibility, which clears it, runs only then
+        self.in_flight = set()
+        self.pending_groups = {}   # atomic group name -> [execution_type, {source: item}], sent as one request batch
+        self.deferred_groups = {}  # same shape, for atomic groups with no source on program/preview
+        self.group_latency_ms = {} # atomic group name -> last time from batch submission to OBS executing it
+        self.buffers = {}          # buffered image source -> {"pairs": [(scene, primary_item_id, buffer_item_id)], "active": ..., "buffer_name": ...}
+        self.desired = {}    # source -> (data_type, value) most recently produced by the pipeline (replayed on reconnect)
+        self.builders = {}   # (source, data_type) -> compiled settings builder for the source's input kind
+        self.last_sent = {}  # source -> settings OBS holds: seeded with GetInputSettings at connect, updated on every ack
+        self.pending = {}    # source -> (data_type, settings, force), newest value per source wins
+        self.queued_at = {}  # source -> perf_counter() when its oldest unacknowledged change was queued
+        self.traces = {}     # source -> trace of the newest change waiting for an ack (see TRACE_STAGES)
+        self.error_streak = 0  # consecutive failed sends; FLIGHT_RECORDER_ERROR_STREAK of them dumps the flight recorder
+        self.queue_cv = threading.Condition()
+        self.running = False; self.thread = None
+        self._last_activity = 0.0
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True, name=f"OBSTarget-{self.label}"); self.thread.start()
+
+    def stop(self, wait=True):
+        self.running = False
+        with self.queue_cv: self.queue_cv.notify_all()
+        if wait and self.thread and self.thread.is_alive():
+            self.thread.join(timeout=DISCONNECT_TIMEOUT_SECONDS)
+            if self.thread.is_alive(): logging.warning(f"OBS target {self.label} did not stop in time.")
+
+    def waiting_since(self):
+        """{source: perf_counter() when its oldest unacknowledged change was queued}, copied under the queue lock."""
+        with self.queue_cv: return dict(self.queued_at)
+
+    def queue_depth(self):
+        with self.queue_cv: return len(self.pending) + len(self.deferred) + len(self.parked) + sum(len(entries) for _, entries in self.pending_groups.values())
+
+    def enqueue(self, source_name, data_type, value, force=False, trace=None):
+        """Queues a mapping value for a source. Returns False if the value cannot be sent to this source's input kind.
+        trace, if given, is the change's timestamps so far; this target completes and records its own copy."""
+        with self.queue_cv:
+            settings = self._build(source_name, data_type, value)
+            if settings is None: return False
+            self.desired[source_name] = (data_type, value)
+            if not force and self._already_applied(source_name, data_type, settings):
+                # OBS already shows this, so anything older still waiting for the source is obsolete
+                self.pending.pop(source_name, None); self.deferred.pop(source_name, None); self.parked.pop(source_name, None)
+                self.queued_at.pop(source_name, None); self.traces.pop(source_name, None); SKIPPED_UPDATES_TOTAL.inc(target=self.label)
+                return True
+            self._mark_queued(source_name); self._start_trace(source_name, trace); self.pending[source_name] = (data_type, settings, force); self.queue_cv.notify()
+        return True
+
+    def enqueue_group(self, group_name, items, execution_type, force=False, traces=None):
+        """Queues the changed sources of an atomic group; they are sent together as one request batch. traces maps source -> trace."""
+        with self.queue_cv:
+            entries = {}
+            for source_name, data_type, value in items:
+                settings = self._build(source_name, data_type, value)
+                if settings is None: continue
+                self.desired[source_name] = (data_type, value); self.pending.pop(source_name, None)
+                if not force and self._already_applied(source_name, data_type, settings): SKIPPED_UPDATES_TOTAL.inc(target=self.label); continue
+                self._mark_queued(source_name); self._start_trace(source_name, (traces or {}).get(source_name)); entries[source_name] = (data_type, settings, force)
+            if not entries: return bool(items)
+            group = self.pending_groups.setdefault(group_name, [execution_type, {}]); group[0] = execution_type; group[1].update(entries)
+            self.queue_cv.notify()
+        return True
+
+    def _mark_queued(self, source_name):
+        """Starts the change-to-ack clock unless an older change for the source is still waiting. Caller holds queue_cv."""
+        waiting = source_name in self.in_flight or source_name in self.pending or source_name in self.deferred or source_name in self.parked
+        if not (waiting or any(source_name in entries for _, entries in self.pending_groups.values())) or source_name not in self.queued_at:
+            self.queued_at[source_name] = time.perf_counter()
+
+    def _start_trace(self, source_name, trace):
+        """Keeps this target's copy of a change trace; a newer change replaces an unsent one. Caller holds queue_cv."""
+        if trace is None: self.traces.pop(source_name, None)
+        else: self.traces[source_name] = {**trace, "target": self.label, "enqueue": time.time()}
+
+    def _mark_sent(self, sources):
+        now = time.time()
+        with self.queue_cv:
+            for source in sources:
+                if source in self.traces: self.traces[source]["send"] = now
+
+    def _already_applied(self, source_name, data_type, settings):
+        """True if OBS already shows these settings. Buffered images only trust the cache once their buffer pair is known. Caller holds queue_cv."""
+        if source_name in self.in_flight or (data_type == DOUBLE_BUFFER_TYPE and source_name not in self.buffers): return False
+        return _settings_match(self.last_sent.get(source_name), settings)
+
+    def _build(self, source_name, data_type, value):
+        """Converts a value with the builder compiled for this source. Caller must hold queue_cv."""
+        builder = self.builders.get((source_name, data_type))
+        if builder is None:
+            input_kind = self.inputs.get(source_name) if self.inputs else None
+            try: builder = compile_settings_builder(data_type, input_kind)
+            except ValueError as e:
+                builder = _reject_value
+                logging.warning(f"Not sending '{source_name}' on OBS {self.label}: {e}."); self._report(f"Type mismatch for '{source_name}' on {self.label}: {e}.", "warning")
+            self.builders[(source_name, data_type)] = builder
+        return builder(value)
+
+    def _forget_builders(self, *source_names):
+        """Drops compiled builders after an input's kind may have changed. Caller must hold queue_cv."""
+        for key in [key for key in self.builders if key[0] in source_names]: del self.builders[key]
+
+    def prune(self, mapped):
+        """Forgets per-source state for sources outside `mapped` (renamed or removed mappings), so it is not replayed
+        on reconnect and does not accumulate over a long session. Buffer twins of mapped sources are kept. Returns entries dropped."""
+        keep = lambda source: source in mapped or (source.endswith(DOUBLE_BUFFER_SUFFIX) and source[:-len(DOUBLE_BUFFER_SUFFIX)] in mapped)
+        with self.queue_cv:
+            stale = {source for table in (self.desired, self.last_sent, self.parked) for source in table if not keep(source)}
+            stale |= {key[0] for key in self.builders if not keep(key[0])}
+            for source in stale: self.desired.pop(source, None); self.last_sent.pop(source, None); self.parked.pop(source, None)
+            if stale: self._forget_builders(*stale)
+        return len(stale)
+    def set_scene_aware(self, enabled):
+        with self.queue_cv:
+            self.scene_aware = enabled; self._visibility_dirty = enabled
+            if not enabled: self._flush_deferred(lambda entries: True)
+            self.queue_cv.notify()
+
+    def _report(self, message, level):
+        if self.on_status:
+            try: self.on_status(message, level)
+            except Exception as e: logging.debug(f"Status callback failed for OBS target {self.label}: {e}")
+
+    def _set_health(self, health):
+        self.health = health
+        if self.on_health:
+            try: self.on_health()
+            except Exception as e: logging.debug(f"Health callback failed for OBS target {self.label}: {e}")
+
+    def _run(self):
+        logging.info(f"OBS target {self.label} worker starting.")
+        attempt, next_attempt_at = 0, 0.0
+        try:
+            while self.running:
+                if not self.connected:
+                    wait_time = next_attempt_at - time.monotonic()
+                    if wait_time > 0:
+                        with self.queue_cv: self.queue_cv.wait(min(wait_time, SUPERVISOR_TICK_SECONDS))
+                        continue
+                    if self._connect(quiet=attempt > 0): attempt = 0; self._load_input_catalog(); self._load_scene_state(); self._seed_last_sent(); self._replay()
+                    elif self.running:
+                        delay = _backoff_delay(attempt); attempt += 1; next_attempt_at = time.monotonic() + delay
+                        logging.info(f"OBS target {self.label}: connect attempt {attempt} failed, retrying in {delay:.1f}s.")
+                        self._set_health(f"Reconnecting in {delay:.0f}s (attempt {attempt})")
+                    continue
+                with self.queue_cv:
+                    if not self.pending and not self.pending_groups and not self._visibility_dirty and self.running: self.queue_cv.wait(SUPERVISOR_TICK_SECONDS)
+                if self._visibility_dirty and self.scene_aware: self._refresh_visibility()
+                with self.queue_cv: batch, self.pending, groups, self.pending_groups = self.pending, {}, self.pending_groups, {}
+                for group_name, (execution_type, entries) in groups.items(): self._send(entries, group=(group_name, execution_type))
+                if batch: self._send(batch)
+                elif not groups and self.running and time.monotonic() - self._last_activity >= KEEPALIVE_INTERVAL_SECONDS: self._keepalive()
+        except Exception as e: logging.exception(f"OBS target {self.label} worker crashed: {e}")
+        finally:
+            client, self.client, self.connected = self.client, None, False
+            event_client, self.event_client = self.event_client, None
+            for dead in (client, event_client):
+                if dead: _disconnect_quietly(dead)
+            self._set_health("Disconnected")
+            logging.info(f"OBS target {self.label} worker stopped.")
+
+    def _connect(self, quiet=False):
+        self._set_health("Connecting...")
+        logging.info(f"Attempting to connect to OBS at {self.label}...")
+        try: client = obs.ReqClient(host=self.host, port=self.port, password=self.password if self.password else None, timeout=CONNECTION_TIMEOUT_SECONDS)
+        except OBS_CONNECTION_ERRORS as e:
+            logging.error(f"OBS {self.label} Connection Failed: {e}")
+            if not quiet: self._report(f"OBS {self.label} Connection Failed: {e}", "error")
+            return False
+        except Exception as e:
+            logging.exception(f"OBS {self.label} connection error.")
+            if not quiet: self._report(f"OBS {self.label} Connection Error: {e}", "error")
+            return False
+        if not self.running: _disconnect_quietly(client); return False
+        with self.queue_cv: self.last_sent = {}; self.inputs = None; self.buffers = {}  # OBS may have restarted; all reloaded after connecting
+        self.client, self.connected, self._last_activity = client, True, time.monotonic()
+        FLIGHT.record(EVENT_CONNECT, target=self.label)
+        self._start_event_client()
+        logging.info(f"OBS {self.label} Connected."); self._report(f"OBS {self.label} Connected.", "success"); self._set_health("Connected")
+        return True
+
+    def _start_event_client(self):
+        try:
+            event_client = obs.EventClient(host=self.host, port=self.port, password=self.password if self.password else None, subs=OBS_EVENT_SUBSCRIPTIONS, timeout=CONNECTION_TIMEOUT_SECONDS)
+            event_client.callback.register([self.on_input_created, self.on_input_removed, self.on_input_name_changed, self.on_input_settings_changed,
+                                            self.on_current_program_scene_changed, self.on_current_preview_scene_changed, self.on_studio_mode_state_changed,
+                                            self.on_scene_transition_started, self.on_scene_transition_ended,
+                                            self.on_scene_item_created, self.on_scene_item_removed, self.on_scene_name_changed, self.on_scene_removed])
+            worker = getattr(event_client, "worker", None)
+            if worker is not None: worker.name = f"OBSEvents-{self.label}"  # named so logs and the profiler can tell it apart
+            self.event_client = event_client
+        except Exception as e:
+            self.event_client = None
+            logging.warning(f"OBS {self.label}: event subscription failed ({e}); the input list will be polled instead.")
+
+    def _load_input_catalog(self):
+        """Loads the names and kinds of all inputs once per connection; input events keep it current afterwards."""
+        if not self.connected: return
+        try: response = self.client.send("GetInputList", raw=True)
+        except OBS_CONNECTION_ERRORS as e: self._drop_connection(f"OBS {self.label} Connection Lost while listing inputs: {e}."); return
+        except Exception as e: logging.warning(f"OBS {self.label}: could not list inputs ({e}); missing sources will not be parked."); return
+        self._last_activity = time.monotonic()
+        catalog = {item["inputName"]: item.get("inputKind") for item in (response or {}).get("inputs", [])}
+        with self.queue_cv:
+            self.inputs = catalog; self.builders = {}
+            for source in [source for source in self.parked if source in catalog]: self._resume_parked(source)
+        logging.info(f"Loaded {len(catalog)} inputs from OBS {self.label}.")
+
+    def _resume_parked(self, source):
+        """Moves a parked source back onto the queue. Caller must hold queue_cv."""
+        data_type, settings, _ = self.parked.pop(source); self._forget_builders(source)
+        if source in self.desired: settings = self._build(source, *self.desired[source])
+        if settings is None: return
+        self.pending[source] = (data_type, settings, False); self.queue_cv.notify()
+        logging.info(f"Source '{source}' now exists on OBS {self.label}; resuming updates.")
+
+    # --- OBS input events (called on the EventClient thread; names must match the event names) ---
+    def on_input_created(self, data):
+        with self.queue_cv:
+            if self.inputs is None: return
+            self.inputs[data.input_name] = getattr(data, "input_kind", None); self._forget_builders(data.input_name)
+            if data.input_name in self.parked: self._resume_parked(data.input_name)
+
+    def on_input_removed(self, data):
+        with self.queue_cv:
+            if self.inputs is not None: self.inputs.pop(data.input_name, None)
+            self.last_sent.pop(data.input_name, None); self._forget_builders(data.input_name); self._invalidate_scenes()
+
+    def on_input_name_changed(self, data):
+        with self.queue_cv:
+            self._invalidate_scenes(); self._forget_builders(data.old_input_name, data.input_name)
+            if self.inputs is not None: self.inputs[data.input_name] = self.inputs.pop(data.old_input_name, None)
+            if data.old_input_name in self.last_sent: self.last_sent[data.input_name] = self.last_sent.pop(data.old_input_name)
+            if data.input_name in self.parked and self.inputs is not None: self._resume_parked(data.input_name)
+
+    def on_input_settings_changed(self, data):
+        # Someone edited the source in OBS itself; keep the cache honest so the next send is not skipped wrongly
+        with self.queue_cv: self.last_sent[data.input_name] = dict(data.input_settings or {})
+
+    def on_current_program_scene_changed(self, data):
+        with self.queue_cv: self.program_scene = data.scene_name; self._invalidate_scenes(keep_graph=True)
+
+    def on_current_preview_scene_changed(self, data):
+        with self.queue_cv: self.preview_scene = data.scene_name; self._invalidate_scenes(keep_graph=True)
+
+    def on_scene_transition_started(self, data):
+        # The event does not name the destination (normally the preview scene, whose inputs are never deferred, but a
+        # transition can be started straight to any scene), so send everything deferred and defer nothing until it ends
+        with self.queue_cv:
+            self._in_transition = True
+            if not self.scene_aware: return
+            self.visible_inputs = None; self._invalidate_scenes(keep_graph=True)
+            flushed = self._flush_deferred(lambda entries: True)
+        if not flushed: return
+        logging.info(f"OBS {self.label}: transition '{getattr(data, 'transition_name', '')}' started; flushing {flushed} deferred updates.")
+
+    def on_scene_transition_ended(self, data):
+        with self.queue_cv: self._in_transition = False; self._invalidate_scenes(keep_graph=True)
+
+    def on_studio_mode_state_changed(self, data):
+        with self.queue_cv:
+            self.preview_scene = None; self._preview_unknown = bool(data.studio_mode_enabled)  # the worker asks for the new preview
+            self._invalidate_scenes(keep_graph=True)
+
+    def on_scene_item_created(self, data):
+        with self.queue_cv: self._invalidate_scenes()
+
+    def on_scene_item_removed(self, data):
+        with self.queue_cv: self._invalidate_scenes()
+
+    def on_scene_name_changed(self, data):
+        with self.queue_cv:
+            if self.program_scene == data.old_scene_name: self.program_scene = data.scene_name
+            if self.preview_scene == data.old_scene_name: self.preview_scene = data.scene_name
+            self._invalidate_scenes()
+
+    def on_scene_removed(self, data):
+        with self.queue_cv: self._invalidate_scenes()
+
+    def _invalidate_scenes(self, keep_graph=False):
+        """Marks visibility for recomputation on the worker thread (events must not use the request client). Caller holds queue_cv."""
+        if not keep_graph: self.scene_inputs = {}; self.buffers = {}
+        if self.scene_aware: self._visibility_dirty = True; self.queue_cv.notify()
+
+    # --- Scene visibility (worker thread only) ---
+    def _load_scene_state(self):
+        if not self.connected: return
+        # One batch, so a failing GetCurrentPreviewScene (studio mode off) is just a result rather than an exception
+        try: program, preview = send_request_batch(self.client, [("GetCurrentProgramScene", None), ("GetCurrentPreviewScene", None)])
+        except OBS_CONNECTION_ERRORS as e: self._drop_connection(f"OBS {self.label} Connection Lost while reading scenes: {e}."); return
+        scene_name = lambda result, key: (result.get("responseData") or {}).get(key) or (result.get("responseData") or {}).get("sceneName")
+        with self.queue_cv:
+            self.program_scene = scene_name(program, "currentProgramSceneName"); self.preview_scene = scene_name(preview, "currentPreviewSceneName")
+            self.scene_inputs = {}; self.visible_inputs = None; self._visibility_dirty = self.scene_aware; self._in_transition = False
+
+    def _scene_input_names(self, graph, scene_name, request_type="GetSceneItemList", seen=None):
+        """Input names reachable from a scene or group, following nested scenes and groups. Scenes are cached in graph."""
+        if request_type == "GetSceneItemList" and scene_name in graph: return graph[scene_name]
+        seen = set() if seen is None else seen
+        if (request_type, scene_name) in seen: return set()
+        seen.add((request_type, scene_name)); found = set()
+        response = self.client.send(request_type, {"sceneName": scene_name}, raw=True) or {}
+        for item in response.get("sceneItems", []):
+            source_name = item.get("sourceName")
+            if item.get("isGroup"): found |= self._scene_input_names(graph, source_name, "GetGroupSceneItemList", seen)
+            elif item.get("sourceType") == "OBS_SOURCE_TYPE_SCENE": found |= self._scene_input_names(graph, source_name, "GetSceneItemList", seen)
+            elif source_name: found.add(source_name)
+        if request_type == "GetSceneItemList": graph[scene_name] = found
+        return found
+
+    def _refresh_visibility(self):
+        """Recomputes which inputs are on program/preview and flushes deferred updates that just became visible."""
+        with self.queue_cv:
+            self._visibility_dirty = False; program, preview, graph = self.program_scene, self.preview_scene, self.scene_inputs
+            reload_preview, self._preview_unknown = self._preview_unknown and not preview, False
+        try:
+            if reload_preview:
+                try: response = self.client.send("GetCurrentPreviewScene", raw=True) or {}
+                except OBSSDKRequestError: response = {}  # studio mode went off again meanwhile
+                preview = response.get("currentPreviewSceneName") or response.get("sceneName")
+                with self.queue_cv: self.preview_scene = preview = self.preview_scene or preview
+            visible = set()
+            for scene in (program, preview):
+                if scene: visible |= self._scene_input_names(graph, scene)
+        except OBS_CONNECTION_ERRORS as e: self._drop_connection(f"OBS {self.label} Connection Lost while reading scenes: {e}."); return
+        except Exception as e: logging.warning(f"OBS {self.label}: could not resolve visible sources ({e}); sending everything."); visible = None
+        self._last_activity = time.monotonic()
+        if program and not preview and not self._warned_no_studio:
+            logging.warning(f"OBS {self.label}: studio mode is off, so the next program scene is not known before it goes live; "
+                            f"hidden sources are not deferred until studio mode is enabled.")
+        self._warned_no_studio = bool(program and not preview)
+        with self.queue_cv:
+            # Deferral needs a preview scene: without one a switched-to scene would show stale values until the flush arrives
+            self.visible_inputs = visible if program and preview and not self._in_transition else None
+            visible_now = self.visible_inputs
+            flushed = self._flush_deferred(lambda entries: visible_now is None or any(source in visible_now for source in entries))
+        if flushed: logging.info(f"OBS {self.label}: flushing {flushed} deferred updates for program '{program}' / preview '{preview}'.")
+
+    def _flush_deferred(self, is_due):
+        """Moves deferred sources and atomic groups for which is_due(sources) holds back onto the queue. Caller holds queue_cv. Returns how many sources moved."""
+        flush = [source for source in self.deferred if is_due((source,))]
+        for source in flush: self.pending.setdefault(source, self.deferred.pop(source))
+        for group_name in [name for name, (_, entries) in self.deferred_groups.items() if is_due(entries)]:
+            execution_type, entries = self.deferred_groups.pop(group_name); flush.extend(entries)
+            pending_group = self.pending_groups.setdefault(group_name, [execution_type, {}]); pending_group[1] = {**entries, **pending_group[1]}
+        if flush: self.queue_cv.notify()
+        return len(flush)
+
+    def _drop_connection(self, reason):
+        logging.error(reason); self._report(f"{reason} Reconnecting...", "error")
+        FLIGHT.record(EVENT_DISCONNECT, target=self.label); self._count_failure()
+        client, self.client, self.connected = self.client, None, False
+        event_client, self.event_client = self.event_client, None
+        for dead in (client, event_client):
+            if dead: threading.Thread(target=_disconnect_quietly, args=(dead,), daemon=True, name="OBSDisconnectThread").start()
+        self._set_health("Reconnecting...")
+
+    def _keepalive(self):
+        if self.event_client is None: self._load_input_catalog()  # no events, so refresh the catalog instead
+        if not self.connected: return
+        try: self.client.get_version(); self._last_activity = time.monotonic()
+        except OBS_CONNECTION_ERRORS as e: self._drop_connection(f"OBS {self.label} keepalive failed: {e}.")
+        except Exception as e: logging.warning(f"OBS {self.label} keepalive request failed: {e}"); self._last_activity = time.monotonic()
+
+    def _seed_last_sent(self):
+        """Loads what OBS currently holds for every mapped source with a single GetInputSettings batch."""
+        if not self.connected: return
+        sources = set(self.desired)
+        if self.mapped_sources:
+            try: sources.update(self.mapped_sources())
+            except Exception as e: logging.warning(f"Could not list mapped sources for OBS {self.label}: {e}")
+        with self.queue_cv: sources = sorted(source for source in sources if source and (self.inputs is None or source in self.inputs))
+        if not sources: return
+        try: results = send_request_batch(self.client, [("GetInputSettings", {"inputName": source}) for source in sources])
+        except OBS_CONNECTION_ERRORS as e: self._drop_connection(f"OBS {self.label} Connection Lost while reading input settings: {e}."); return
+        self._last_activity = time.monotonic()
+        seeded = {source: result.get("responseData", {}).get("inputSettings", {}) for source, result in zip(sources, results) if result.get("requestStatus", {}).get("result")}
+        with self.queue_cv: self.last_sent = seeded
+        logging.info(f"Seeded settings cache for OBS {self.label}: {len(seeded)} of {len(sources)} mapped sources found.")
+
+    def _replay(self):
+        """After (re)connecting, pushes every source whose last known settings differ from OBS as a single request batch."""
+        if not self.connected: return
+        with self.queue_cv:
+            batch = {}
+            for source, (data_type, value) in self.desired.items():
+                settings = self._build(source, data_type, value)
+                if settings is not None and not _settings_match(self.last_sent.get(source), settings): batch[source] = (data_type, settings, False)
+            for source, item in self.pending.items():
+                if not _settings_match(self.last_sent.get(source), item[1]): batch[source] = item
+            self.pending = {}; self.deferred = {}; self.parked = {}; self.pending_groups = {}; self.deferred_groups = {}
+        if not batch: logging.info(f"OBS {self.label} already up to date after connect ({len(self.desired)} known sources)."); return
+        start_time = time.time(); failed = self._send(batch, log_each=False)
+        if self.connected: logging.info(f"Replayed {len(batch)} of {len(self.desired)} sources to OBS {self.label} in {time.time() - start_time:.3f}s ({failed} failed).")
+
+    def _send(self, batch, log_each=True, group=None):
+        """Sends queued settings as one request batch. Returns the number of failed requests.
+        Sources missing from the input catalog are parked locally instead of costing a NotFound round trip.
+        group is (name, execution_type) for atomic groups, which are deferred and sent as a unit."""
+        with self.queue_cv:
+            if self.inputs is not None:
+                for source in [source for source in batch if source not in self.inputs]:
+                    if source not in self.parked:
+                        logging.warning(f"Source '{source}' not found on OBS {self.label}; parking updates until it appears.")
+                        self._report(f"OBS Error: Source '{source}' not found on {self.label}. Waiting for it to appear.", "warning")
+                    self.parked[source] = batch.pop(source)
+            if self.scene_aware and self.visible_inputs is not None:
+                # Manual (forced) updates always go out; everything else waits until its scene is on program/preview
+                if group is None:
+                    for source in [source for source, item in batch.items() if not item[2] and source not in self.visible_inputs]: self.deferred[source] = batch.pop(source)
+                elif batch and not any(item[2] for item in batch.values()) and not any(source in self.visible_inputs for source in batch):
+                    deferred_group = self.deferred_groups.setdefault(group[0], [group[1], {}]); deferred_group[1].update(batch); return 0
+            if not batch: return 0
+            self.in_flight = set(batch); SEND_QUEUE_DEPTH.observe(len(batch), target=self.label)
+            buffered = {source: batch.pop(source) for source in [source for source, item in batch.items() if item[0] == DOUBLE_BUFFER_TYPE]}
+        try:
+            failed = sum(self._swap_buffered_image(source, item) for source, item in buffered.items() if self.connected)
+            if not batch or not self.connected: return failed
+            if group is None: return failed + self._send_now(batch, log_each)
+            group_name, execution_type = group
+            start_time = time.perf_counter(); failed += self._send_now(batch, log_each, execution_type)
+            if self.connected:
+                # SerialFrame batches are answered after the graphics tick that applied them, so this is submission-to-frame time
+                elapsed_ms = (time.perf_counter() - start_time) * 1000; self.group_latency_ms[group_name] = elapsed_ms
+                mode_name = next((name for name, value in ATOMIC_BATCH_MODES.items() if value == execution_type), execution_type)
+                logging.info(f"Atomic group '{group_name}' ({len(batch)} sources, {mode_name}) applied on OBS {self.label} in {elapsed_ms:.1f} ms.")
+            return failed
+        finally:
+            with self.queue_cv: self.in_flight = set()
+
+    # --- Double-buffered images (worker thread only) ---
+    def _setup_image_buffer(self, source):
+        """Finds every scene item of source and makes sure a hidden sibling image input sits right below each one."""
+        buffer_name = f"{source}{DOUBLE_BUFFER_SUFFIX}"
+        scenes = [scene["sceneName"] for scene in send_request(self.client, "GetSceneList").get("scenes", [])]
+        results = send_request_batch(self.client, [("GetSceneItemList", {"sceneName": scene}) for scene in scenes])
+        pairs, active, buffer_exists = [], None, self.inputs is not None and buffer_name in self.inputs
+        for scene, result in zip(scenes, results):
+            scene_items = (result.get("responseData") or {}).get("sceneItems", [])
+            primary = next((item for item in scene_items if item.get("sourceName") == source), None)
+            if primary is None: continue
+            buffer_item = next((item for item in scene_items if item.get("sourceName") == buffer_name), None)
+            if buffer_item is None: buffer_item_id = self._create_buffer_item(scene, source, buffer_name, primary, buffer_exists); buffer_exists = True
+            else: buffer_item_id = buffer_item["sceneItemId"]
+            if active is None: active = "buffer" if buffer_item and buffer_item.get("sceneItemEnabled") and not primary.get("sceneItemEnabled") else "primary"
+            pairs.append((scene, primary["sceneItemId"], buffer_item_id))
+        if not pairs: raise ValueError(f"'{source}' is not placed in any scene")
+        state = {"pairs": pairs, "active": active, "buffer_name": buffer_name}
+        with self.queue_cv: self.buffers[source] = state
+        logging.info(f"Double buffer for '{source}' on OBS {self.label}: {len(pairs)} scene(s), showing the {active} input.")
+        return state
+
+    def _create_buffer_item(self, scene, source, buffer_name, primary, buffer_exists):
+        if buffer_exists: item_id = send_request(self.client, "CreateSceneItem", {"sceneName": scene, "sourceName": buffer_name, "sceneItemEnabled": False})["sceneItemId"]
+        else:
+            input_kind = (self.inputs or {}).get(source) or "image_source"
+            item_id = send_request(self.client, "CreateInput", {"sceneName": scene, "inputName": buffer_name, "inputKind": input_kind,
+                                                                "inputSettings": self.last_sent.get(source, {}), "sceneItemEnabled": False})["sceneItemId"]
+        transform = send_request(self.client, "GetSceneItemTransform", {"sceneName": scene, "sceneItemId": primary["sceneItemId"]}).get("sceneItemTransform", {})
+        transform = {key: value for key, value in transform.items() if key not in ("width", "height", "sourceWidth", "sourceHeight")}
+        send_request_batch(self.client, [("SetSceneItemTransform", {"sceneName": scene, "sceneItemId": item_id, "sceneItemTransform": transform}),
+                                         ("SetSceneItemIndex", {"sceneName": scene, "sceneItemId": item_id, "sceneItemIndex": primary.get("sceneItemIndex", 0)})])
+        return item_id
+
+    def _swap_buffered_image(self, source, item):
+        """Loads the new image into the hidden sibling, then flips both items' visibility on the same frame. Returns 1 on failure."""
+        data_type, settings, _ = item
+        try:
+            state = self.buffers.get(source) or self._setup_image_buffer(source)
+            to_primary = state["active"] == "buffer"
+            # SetInputSettings only returns once OBS has loaded the file, so the hidden input is ready to show
+            send_request(self.client, "SetInputSettings", {"inputName": source if to_primary else state["buffer_name"], "inputSettings": settings, "overlay": True})
+            self._mark_sent([source]); requests = [("Sleep", {"sleepFrames": DOUBLE_BUFFER_SETTLE_FRAMES})]
+            for scene, primary_id, buffer_id in state["pairs"]:
+                requests.append(("SetSceneItemEnabled", {"sceneName": scene, "sceneItemId": primary_id, "sceneItemEnabled": to_primary}))
+                requests.append(("SetSceneItemEnabled", {"sceneName": scene, "sceneItemId": buffer_id, "sceneItemEnabled": not to_primary}))
+            start_time = time.perf_counter(); results = send_request_batch(self.client, requests, BATCH_SERIAL_FRAME)
+            OBS_ROUND_TRIP_SECONDS.observe(time.perf_counter() - start_time, target=self.label); FLIGHT.record(EVENT_BATCH, source, self.label, len(requests), time.perf_counter() - start_time)
+            if not all(result.get("requestStatus", {}).get("result") for result in results[1:]): raise ValueError("scene items changed during the swap")
+        except OBS_CONNECTION_ERRORS as e:
+            SEND_FAILURES_TOTAL.inc(target=self.label)
+            with self.queue_cv: self.pending.setdefault(source, item)
+            self._drop_connection(f"OBS {self.label} Connection Lost during buffered image swap: {e}."); return 1
+        except (OBSSDKRequestError, ValueError, KeyError) as e:
+            SEND_FAILURES_TOTAL.inc(target=self.label); self._count_failure(source, getattr(e, "code", 0))
+            with self.queue_cv: self.buffers.pop(source, None); self.queued_at.pop(source, None); self.traces.pop(source, None)
+            log_msg = f"Buffered image swap failed for '{source}' on {self.label}: {e}"; logging.error(log_msg); self._report(log_msg, "error"); return 1
+        self._last_activity = time.monotonic(); state["active"] = "primary" if to_primary else "buffer"
+        with self.queue_cv: self.last_sent[source] = {**self.last_sent.get(source, {}), **settings}; self._acknowledge(source, time.perf_counter())
+        logging.info(f"Swapped OBS {self.label} buffered image '{source}' to '{next(iter(settings.values()))}' ({state['active']} input now visible).")
+        return 0
+
+    def _count_failure(self, source="", code=0):
+        FLIGHT.record(EVENT_FAILURE, source, self.label, code or 0); self.error_streak += 1
+        if self.error_streak == FLIGHT_RECORDER_ERROR_STREAK: FLIGHT.trigger(f"error-streak {self.label}")
+
+    def _acknowledge(self, source, ack_time):
+        """Records a source update OBS confirmed. Caller holds queue_cv."""
+        SENDS_TOTAL.inc(target=self.label); self.error_streak = 0
+        queued_at = self.queued_at.pop(source, None)
+        if queued_at is not None: CHANGE_TO_ACK_SECONDS.observe(ack_time - queued_at, target=self.label)
+        FLIGHT.record(EVENT_ACK, source, self.label, value=ack_time - queued_at if queued_at is not None else 0.0)
+        trace = self.traces.pop(source, None)
+        if trace is not None: trace["ack"] = time.time(); TRACES.record(trace)
+
+    def _send_now(self, batch, log_each, execution_type=BATCH_SERIAL_REALTIME):
+        items = list(batch.items())
+        requests = [("SetInputSettings", {"inputName": source, "inputSettings": settings, "overlay": True}) for source, (_, settings, _) in items]
+        self._mark_sent(batch); start_time = time.perf_counter()
+        try: results = send_request_batch(self.client, requests, execution_type)
+        except OBS_CONNECTION_ERRORS as e:
+            SEND_FAILURES_TOTAL.inc(len(items), target=self.label)
+            with self.queue_cv:
+                for source, item in items: self.pending.setdefault(source, item)
+            self._drop_connection(f"OBS {self.label} Connection Lost during update: {e}."); return len(items)
+        self._last_activity = time.monotonic(); failed = 0; ack_time = time.perf_counter()
+        OBS_ROUND_TRIP_SECONDS.observe(ack_time - start_time, target=self.label); FLIGHT.record(EVENT_BATCH, target=self.label, detail=len(items), value=ack_time - start_time)
+        for (source, (data_type, settings, _)), result in zip(items, results):
+            status = result.get("requestStatus", {})
+            if status.get("result"):
+                with self.queue_cv: self.last_sent[source] = {**self.last_sent.get(source, {}), **settings}; self._acknowledge(source, ack_time)
+                if log_each:
+                    shown = str(next(iter(settings.values()), ""))
+                    logging.info(f"Updated OBS {self.label} {data_type} '{source}' to '{shown[:50]}{'...' if len(shown)>50 else ''}'")
+                continue
+            failed += 1; SEND_FAILURES_TOTAL.inc(target=self.label); self._count_failure(source, status.get("code"))
+            if status.get("code") == OBS_NOT_FOUND_CODE:
+                with self.queue_cv:
+                    if self.inputs is not None: self.inputs.pop(source, None)
+                    self.parked[source] = (data_type, settings, False)
+                log_msg, level = f"OBS Error: Source '{source}' not found on {self.label}. Waiting for it to appear.", "warning"
+            else:
+                log_msg, level = f"Failed OBS update '{source}' on {self.label}: {status.get('comment') or status.get('code')}", "error"
+                with self.queue_cv: self.queued_at.pop(source, None); self.traces.pop(source, None)
+            logging.error(log_msg); self._report(log_msg, level)
+        return failed
+
+# --- Text File Sink ---
+def text_sink_file_name(source_name, unique=False):
+    """File name for a source's text file; characters Windows rejects become '_'.
+    unique appends a short hash of the original name, for sources whose cleaned name is taken ('A/B' vs 'A_B')."""
+    stem = "".join("_" if ch in TEXT_SINK_INVALID_CHARS or ord(ch) < 32 else ch for ch in source_name).strip(" .")
+    return f"{stem}-{hashlib.sha1(source_name.encode('utf-8')).hexdigest()[:TEXT_SINK_HASH_CHARS]}.txt" if unique else stem + ".txt"
+
+class TextFileSink:
+    """Writes Text mapping values to <folder>/<source>.txt for OBS text sources in "Read from file" mode.
+    Takes the same enqueue calls as OBSTarget. Values are coalesced per source, written once per tick with
+    write-and-rename (OBS never reads a half-written file), and unchanged text is never rewritten."""
+    def __init__(self, folder, tick_seconds=TEXT_SINK_TICK_SECONDS):
+        self.folder, self.tick_seconds = folder, tick_seconds
+        self.cv = threading.Condition()
+        self.pending = {}   # source -> (text, force) waiting for the next tick
+        self.written = {}   # source -> text currently in its file
+        self.file_names = {}  # source -> its file name, unique ignoring case (Windows); see assign_file_names
+        self.running = True
+        os.makedirs(folder, exist_ok=True)
+        self.thread = threading.Thread(target=self._run, daemon=True, name="TextFileSink"); self.thread.start()
+
+    def enqueue(self, source_name, data_type, value, force=False, trace=None):
+        if DATA_TYPE_CATEGORIES.get(data_type) != "text": return False
+        text = _text_builder(value)["text"]
+        with self.cv:
+            if not force and self.pending.get(source_name, (self.written.get(source_name),))[0] == text: return True
+            self.pending[source_name] = (text, force); self.cv.notify()
+        return True
+
+    def enqueue_group(self, group_name, items, execution_type=None, force=False, traces=None):
+        # Files have no frame boundary to sync to; the group is written in one tick instead
+        return any([self.enqueue(source_name, data_type, value, force=force) for source_name, data_type, value in items])
+
+    def assign_file_names(self, source_names):
+        """Names the files of all mapped sources up front. When cleaned names clash, a source whose name needed no
+        cleaning keeps the plain file and the others get hashed names (logged). Sources whose file moves are rewritten."""
+        clashes = defaultdict(list)
+        for source in sorted(source_names): clashes[text_sink_file_name(source).lower()].append(source)
+        names = {}
+        for sources in clashes.values():
+            plain = sources[0] if len(sources) == 1 else next((source for source in sources if text_sink_file_name(source) == f"{source}.txt"), None)
+            for source in sources: names[source] = text_sink_file_name(source, unique=source != plain)
+        with self.cv:
+            for sources in clashes.values():
+                if len(sources) > 1 and any(self.file_names.get(source) != names[source] for source in sources):
+                    logging.warning(f"Text sources {', '.join(repr(source) for source in sources)} would share the file '{text_sink_file_name(sources[0])}'; "
+                                    f"writing {', '.join(names[source] for source in sources)} instead.")
+            for source, name in names.items():
+                if self.file_names.get(source, name) != name and source in self.written: self.pending.setdefault(source, (self.written.pop(source), True)); self.cv.notify()
+            self.file_names = names
+
+    def _file_name(self, source_name):
+        """Caller holds cv. Sources assign_file_names has not seen get the plain name unless another source holds it."""
+        name = self.file_names.get(source_name)
+        if name is None:
+            name = text_sink_file_name(source_name)
+            if name.lower() in {taken.lower() for taken in self.file_names.values()}:
+                name = text_sink_file_name(source_name, unique=True); logging.warning(f"Text file for '{source_name}' is taken by another source; writing {name} instead.")
+            self.file_names[source_name] = name
+        return name
+
+    def _run(self):
+        while True:
+            with self.cv:
+                self.cv.wait_for(lambda: self.pending or not self.running)
+                if not self.running: return
+            time.sleep(self.tick_seconds)  # let the rest of this update pass arrive so it is written together
+            with self.cv: batch, self.pending = self.pending, {}; file_names = {source_name: self._file_name(source_name) for source_name in batch}
+            written = 0
+            for source_name, (text, force) in batch.items():
+                path = os.path.join(self.folder, file_names[source_name])
+                if not force and self.written.get(source_name) == text: continue
+                if force and self.written.get(source_name) == text and os.path.exists(path): continue
+                temp_path = f"{path}.tmp"
+                try:
+                    with open(temp_path, "w", encoding="utf-8", newline="") as f: f.write(text)
+                    os.replace(temp_path, path)
+                except OSError as e:
+                    # Typically Windows refusing the rename while OBS reads the file; retry next tick unless newer text arrived
+                    logging.warning(f"Cannot write text file for '{source_name}': {e}")
+                    with self.cv: self.pending.setdefault(source_name, (text, force)); self.cv.notify()
+                    continue
+                with self.cv: self.written[source_name] = text
+                written += 1
+            if written: logging.debug(f"Text file sink wrote {written} of {len(batch)} queued file(s).")
+
+    def stop(self, wait=True):
+        with self.cv: self.running = False; self.cv.notify_all()
+        if wait: self.thread.join(timeout=1)
+
+# --- Image Asset Cache ---
+def parse_prescale_size(spec):
+    """'200x120' -> (200, 120), '200' -> (200, 200), blank -> None. Raises ValueError on anything else."""
+    spec = str(spec).strip().lower()
+    if not spec: return None
+    width, _, height = spec.partition("x")
+    size = (int(width), int(height or width))
+    if min(size) <= 0: raise ValueError(f"Image size must be positive: '{spec}'")
+    return size
+
+class ImageAssetCache:
+    """Shrinks image files into an on-disk cache on a small thread pool.
+    Cached files are named by the source's content hash plus the output size and format, so
+    identical logos share one copy and a repeated swap is a dict lookup and a stat()."""
+    def __init__(self, cache_dir=IMAGE_CACHE_DIR, workers=IMAGE_CACHE_WORKERS):
+        self.cache_dir = cache_dir
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ImageAsset")
+        self.lock = threading.Lock()
+        self.jobs = {}  # (path, size, mtime_ns, max_size, fmt) -> Future of the path to send, least recently used first
+
+    def resolve(self, path, max_size, fmt, signature=None):
+        """Returns a Future of the path OBS should load: the cached copy, or path itself if it needs no scaling.
+        signature is the file's (mtime_ns, size) if the caller already has it."""
+        path = resolve_media_path(path)
+        if signature is None: stat = os.stat(path); signature = (stat.st_mtime_ns, stat.st_size)
+        key = (path, signature[1], signature[0], max_size, fmt)
+        with self.lock:
+            job = self.jobs.pop(key, None)
+            if job is None: job = self.executor.submit(self._transcode, key)
+            self.jobs[key] = job
+            while len(self.jobs) > IMAGE_JOB_CACHE_MAX: self.jobs.pop(next(iter(self.jobs)))  # callers keep their own Future
+        return job
+
+    def _transcode(self, key):
+        path, _, _, (width, height), fmt = key
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""): digest.update(chunk)
+        cached_path = os.path.join(self.cache_dir, f"{digest.hexdigest()[:32]}_{width}x{height}{IMAGE_PRESCALE_FORMATS[fmt]}")
+        if os.path.exists(cached_path): return cached_path
+        start_time = time.perf_counter()
+        with PILImage.open(path) as image:
+            if image.width <= width and image.height <= height and image.format == fmt: return path
+            image.thumbnail((width, height), PILImage.LANCZOS)
+            if fmt == "JPEG" and image.mode not in ("RGB", "L"): image = image.convert("RGB")
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_path = f"{cached_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            image.save(temp_path, format=fmt); os.replace(temp_path, cached_path)
+        logging.info(f"Pre-scaled '{os.path.basename(path)}' to {width}x{height} {fmt} in {(time.perf_counter() - start_time) * 1000:.0f} ms.")
+        return cached_path
+
+    def shutdown(self): self.executor.shutdown(wait=False, cancel_futures=True)
+
+# --- Referenced File Watcher ---
+class ReferencedFileWatcher:
+    """Watches the files behind Image/Media mappings and calls on_change(source, data_type, value) when one is rewritten.
+    Uses watchdog (inotify on Linux) when installed, otherwise polls stat() every FILE_WATCH_POLL_SECONDS."""
+    def __init__(self, on_change, poll_seconds=FILE_WATCH_POLL_SECONDS):
+        self.on_change, self.poll_seconds = on_change, poll_seconds
+        self.cv = threading.Condition()
+        self.sources = {}      # source -> (data_type, value, resolved path) last sent to it
+        self.signatures = {}   # resolved path -> (mtime_ns, size), None while missing
+        self.dirty = set()     # paths with filesystem events not yet re-checked
+        self.watched_dirs = set(); self.running = True; self.observer = None
+        if WatchdogObserver is not None:
+            try: self.observer = WatchdogObserver(); self.observer.start()
+            except Exception as e: logging.warning(f"File events unavailable, polling referenced files instead: {e}"); self.observer = None
+        self.thread = threading.Thread(target=self._run, daemon=True, name="FileWatcher"); self.thread.start()
+
+    @staticmethod
+    def _signature(path):
+        try: stat = os.stat(path); return (stat.st_mtime_ns, stat.st_size)
+        except OSError: return None
+
+    def watch(self, source_name, data_type, value):
+        """Records the file a source now shows (a blank value stops watching it). Returns the file's cached signature."""
+        path = resolve_media_path(value) if str(value).strip() else None
+        with self.cv:
+            previous = self.sources.pop(source_name, None)
+            if path is not None: self.sources[source_name] = (data_type, value, path)
+            if previous and previous[2] != path and all(entry[2] != previous[2] for entry in self.sources.values()): self.signatures.pop(previous[2], None)
+            if path is None: return None
+            if path not in self.signatures:
+                self.signatures[path] = self._signature(path)
+                if self.observer is not None and os.path.dirname(path) not in self.watched_dirs: self._watch_dir(os.path.dirname(path))
+            return self.signatures[path]
+
+    def _watch_dir(self, folder):
+        try: self.observer.schedule(self, folder, recursive=False); self.watched_dirs.add(folder)
+        except Exception as e: logging.warning(f"Cannot watch '{folder}' for changes: {e}")
+
+    def dispatch(self, event):
+        """watchdog callback (observer thread): marks the event's paths for a stat() check."""
+        paths = {os.path.abspath(path) for path in (getattr(event, "src_path", None), getattr(event, "dest_path", None)) if path}
+        with self.cv:
+            hits = paths & self.signatures.keys()
+            if hits: self.dirty |= hits; self.cv.notify()
+
+    def _run(self):
+        while True:
+            with self.cv:
+                if self.observer is not None: self.cv.wait_for(lambda: self.dirty or not self.running)
+                else: self.cv.wait_for(lambda: not self.running, timeout=self.poll_seconds)
+                if not self.running: return
+            if self.observer is not None: time.sleep(FILE_WATCH_SETTLE_SECONDS)
+            with self.cv:
+                paths = set(self.dirty) if self.observer is not None else set(self.signatures); self.dirty.clear()
+            changed = []
+            for path in paths:
+                signature = self._signature(path)
+                with self.cv:
+                    if path not in self.signatures or self.signatures[path] == signature: continue
+                    self.signatures[path] = signature
+                    if signature is None: continue  # deleted; the rewrite that follows is the change we send
+                    changed += [(source, data_type, value) for source, (data_type, value, watched) in self.sources.items() if watched == path]
+            for source, data_type, value in changed:
+                logging.info(f"Referenced file '{value}' changed on disk; reloading '{source}'.")
+                try: self.on_change(source, data_type, value)
+                except Exception as e: logging.exception(f"Error reloading '{source}' after a file change: {e}")
+
+    def watched_sources(self):
+        with self.cv: return set(self.sources)
+
+    def stop(self):
+        with self.cv: self.running = False; self.cv.notify_all()
+        if self.observer is not None: self.observer.stop()
+
+# --- Embedded Workbook Images ---
+XLSX_NS = {"main": "http://schemas.openxmlformats.org/spreadsheetml/2006/main", "rel": "http://schemas.openxmlformats.org/package/2006/relationships",
+           "xdr": "http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing", "a": "http://schemas.openxmlformats.org/drawingml/2006/main"}
+XLSX_REL_ID = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+XLSX_REL_EMBED = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed"
+
+def _xlsx_rels(archive, part):
+    """Relationship id -> archive member path for an .xlsx part (e.g. 'xl/workbook.xml')."""
+    folder, name = posixpath.split(part); rels_part = posixpath.join(folder, "_rels", name + ".rels")
+    if rels_part not in archive.namelist(): return {}
+    rels = {}
+    for rel in ET.fromstring(archive.read(rels_part)).findall("rel:Relationship", XLSX_NS):
+        if rel.get("TargetMode") == "External": continue
+        target = rel.get("Target", "")
+        rels[rel.get("Id")] = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join(folder, target))
+    return rels
+
+class WorkbookImageExtractor:
+    """Finds pictures anchored on a sheet's cells (xl/drawings -> xl/media) and extracts them into a content-addressed cache.
+    Blobs are remembered by zip CRC and size, so a workbook save only hashes and writes pictures that actually changed."""
+    def __init__(self, cache_dir=EMBEDDED_IMAGE_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.blobs = {}  # (member, CRC, size) -> extracted path, oldest first
+
+    def extract(self, xlsx_path, sheet_name):
+        """Returns {(row, col): extracted path} (0-based, anchor's top-left cell) for one sheet. Non-xlsx files have none."""
+        if not zipfile.is_zipfile(xlsx_path): return {}
+        with zipfile.ZipFile(xlsx_path) as archive:
+            sheet_part = self._sheet_part(archive, sheet_name)
+            if sheet_part is None: return {}
+            images = {}
+            for drawing_part in [target for target in _xlsx_rels(archive, sheet_part).values() if "/drawings/" in target]:
+                media = _xlsx_rels(archive, drawing_part)
+                for anchor in ET.fromstring(archive.read(drawing_part)):
+                    start, blip = anchor.find("xdr:from", XLSX_NS), anchor.find(".//xdr:pic/xdr:blipFill/a:blip", XLSX_NS)
+                    if start is None or blip is None or media.get(blip.get(XLSX_REL_EMBED)) is None: continue
+                    cell = (int(start.findtext("xdr:row", "0", XLSX_NS)), int(start.findtext("xdr:col", "0", XLSX_NS)))
+                    images[cell] = self._extract_blob(archive, media[blip.get(XLSX_REL_EMBED)])  # later anchors are drawn on top
+            return images
+
+    def _sheet_part(self, archive, sheet_name):
+        workbook_rels = _xlsx_rels(archive, "xl/workbook.xml")
+        for sheet in ET.fromstring(archive.read("xl/workbook.xml")).iterfind("main:sheets/main:sheet", XLSX_NS):
+            if sheet.get("name") == sheet_name: return workbook_rels.get(sheet.get(XLSX_REL_ID))
+        return None
+
+    def _extract_blob(self, archive, member):
+        info = archive.getinfo(member); key = (member, info.CRC, info.file_size)
+        cached_path = self.blobs.get(key)
+        if cached_path is not None and os.path.exists(cached_path): return cached_path
+        data = archive.read(member)
+        cached_path = os.path.join(self.cache_dir, hashlib.sha256(data).hexdigest()[:32] + posixpath.splitext(member)[1].lower())
+        if not os.path.exists(cached_path):
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_path = f"{cached_path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as f: f.write(data)
+            os.replace(temp_path, cached_path); logging.info(f"Extracted embedded picture '{member}' to {os.path.basename(cached_path)}.")
+        self.blobs[key] = cached_path
+        while len(self.blobs) > EMBEDDED_BLOB_CACHE_MAX: self.blobs.pop(next(iter(self.blobs)))  # the files stay; only the lookup is forgotten
+        return cached_path
+
+# --- Headless Stand-ins ---
+class PlainVar:
+    """Tk-variable stand-in (get/set) so a headless ExcelToOBS keeps the same group and mapping records."""
+    def __init__(self, value=""): self.value = value
+    def get(self): return self.value
+    def set(self, value): self.value = value
+
+class HeadlessLabel:
+    """Value label stand-in for headless runs; update_obs_data styles it like a real label and nothing happens."""
+    def config(self, **kwargs): pass
+    configure = config
+
+HEADLESS_LABEL = HeadlessLabel()
+
+_MISSING = object()  # previous_values default: the mapping has not been seen yet
+
+@functools.lru_cache(maxsize=None)
+def label_style_name(bootstyle_constant, base_widget_type="TLabel"):
+    style_prefix_map = {PRIMARY: "primary", INFO: "info", SUCCESS: "success", WARNING: "warning", DANGER: "danger", LIGHT: "light", DARK: "dark", SECONDARY: "secondary", DEFAULT: ""}
+    prefix = style_prefix_map.get(bootstyle_constant, "")
+    return f"{prefix}.{base_widget_type}" if prefix else base_widget_type
+
 # --- Main Application Class ---
 class ExcelToOBS:
-    def __init__(self, root):
+    def __init__(self, root=None):
+        # Without a root the app runs headless (benchmarks, load tests, --headless): same pipeline, no widgets
         self.root = root
-        self.root.title("Excel2OBS (Collapsible Groups + More Types) - 原版: B站: 直播说") # Updated Title
-
-        self.style = ttk.Style(theme=DEFAULT_THEME)
-        self.obs_host_var = ttk.StringVar(value=DEFAULT_OBS_WS_HOST)
-        self.obs_port_var = ttk.StringVar(value=str(DEFAULT_OBS_WS_PORT))
-        self.obs_password_var = ttk.StringVar(value=DEFAULT_OBS_WS_PASSWORD)
-        self.obs_client = None
-        self.obs_connected = False
-        self.obs_connection_lock = threading.Lock()
-        self._connecting = False
-        self.file_path = ttk.StringVar()
-        self.sheet_name = ttk.StringVar()
+        self.headless = root is None
+        string_var, int_var = (PlainVar, PlainVar) if self.headless else (ttk.StringVar, ttk.IntVar)
+        if not self.headless:
+            self.root.title("Excel2OBS (Collapsible Groups + More Types) - 原版: B站: 直播说") # Updated Title
+            self.style = ttk.Style(theme=DEFAULT_THEME)
+        self.obs_host_var = string_var(value=DEFAULT_OBS_WS_HOST)
+        self.obs_port_var = string_var(value=str(DEFAULT_OBS_WS_PORT))
+        self.obs_password_var = string_var(value=DEFAULT_OBS_WS_PASSWORD)
+        self.obs_extra_targets_var = string_var(value="")
+        self.defer_hidden_var = int_var(value=DEFAULT_DEFER_HIDDEN_SOURCES)
+        self.image_prescale_var = string_var(value="")
+        self.image_format_var = string_var(value=DEFAULT_IMAGE_PRESCALE_FORMAT)
+        self.image_assets = ImageAssetCache() if PILImage is not None else None
+        self.latest_image_values = {}  # source -> last image cell value, so a slow pre-scale never overwrites a newer one
+        self.file_watcher = ReferencedFileWatcher(lambda source, data_type, value: self.send_update_to_obs(data_type, value, source, force=True))
+        self.obs_targets = []
+        self.text_sink_dir_var = string_var(value="")
+        self.text_sink = None
+        self.shared_snapshot_var = int_var(value=DEFAULT_SHARED_SNAPSHOT_ENABLED)
+        self.shared_snapshot = None
+        self.file_path = string_var(value="")
+        self.sheet_name = string_var(value="")
         self.inputs_data = []
         self.previous_values = {}
         self.running = True
         self.update_thread = None
-        self.status_queue = queue.Queue()
+        self.status_queue = queue.Queue(maxsize=STATUS_QUEUE_MAX)
         self.last_excel_mtime = None
         self.cached_df = None
+        self.pushed_values = {}  # sheet -> {(row, col): value} pushed over the local API; overrides the workbook until cleared
+        self.update_wakeup = threading.Event()  # set by pushes so the update loop diffs right away
+        self.local_api_enabled_var = int_var(value=DEFAULT_LOCAL_API_ENABLED)
+        self.local_api_port_var = string_var(value=str(DEFAULT_LOCAL_API_PORT))
+        self.local_api_token = ""  # settings-file only (obs_settings.local_api_token); see excel2obs_api.LocalAPIHandler._refuse_write
+        self.local_api = None
+        self.overlay_hub = OverlayHub()
+        SEND_QUEUE_PENDING.set_function(lambda: {(("target", target.label),): target.queue_depth() for target in list(self.obs_targets)})
+        self.last_reload = {}  # trace timestamps of the latest workbook read, attached to the changes it revealed
+        self.embedded_images = WorkbookImageExtractor()
+        self.cached_images = {}  # (row, col) -> extracted picture anchored there, read with cached_df
         self.excel_read_lock = threading.Lock()
+        self.last_prune = time.time()
+        # update_obs_data skips the walk while nothing changed since a pass that had nothing to send (see _mark_inputs_changed)
+        self.change_generation = 0; self.quiet_generation = None
+        self.auto_update_generation = None; self.auto_update_cached = False; self.snapshot_generation = None
+        self.memory_diagnostics = MemoryDiagnostics(structure_sizes=self._structure_sizes)
+        self.profiler = SamplingProfiler(on_done=self._profile_done)
+        self.last_cycle_seconds = None
+        # Performance panel: built by the update thread while perf_panel_open, read by _refresh_perf_panel on the Tk thread
+        self.perf_panel_open = False; self.perf_snapshot = None; self.perf_shown = None; self.perf_previous = None; self.last_perf_snapshot = 0.0
 
+        if self.headless: return  # callers load settings, then start_update_thread() and connect_obs() (benchmarks drive update_obs_data themselves)
+        for var in (self.file_path, self.sheet_name): var.trace_add("write", self._mark_inputs_changed)
         self._setup_ui()
+        self._apply_local_api()
         self.start_update_thread()
         self.root.after(STATUS_QUEUE_CHECK_MS, self.process_status_queue)
+        self.root.after(PERF_PANEL_REFRESH_MS, self._refresh_perf_panel)
         self.root.after(500, self.connect_obs)
         self.root.protocol("WM_DELETE_WINDOW", self.stop)
 
@@ -80,6 +1154,12 @@ class ExcelToOBS:
         self.sheet_entry = ttk.Entry(file_frame, textvariable=self.sheet_name, width=40)
         self.sheet_entry.grid(row=1, column=1, padx=5, pady=5, sticky=EW)
         self.sheet_entry.bind("<Return>", lambda event: self.update_obs_data(check_changes=False))
+        ttk.Label(file_frame, text="Image Max Size:").grid(row=2, column=0, padx=5, pady=5, sticky=W)
+        image_frame = ttk.Frame(file_frame); image_frame.grid(row=2, column=1, columnspan=2, padx=5, pady=5, sticky=EW)
+        self.image_prescale_entry = ttk.Entry(image_frame, textvariable=self.image_prescale_var, width=12)
+        self.image_prescale_entry.pack(side=LEFT)
+        ttk.OptionMenu(image_frame, self.image_format_var, self.image_format_var.get(), *IMAGE_PRESCALE_FORMATS).pack(side=LEFT, padx=5)
+        ttk.Label(image_frame, text="e.g. 200x200; blank sends originals" if self.image_assets else "Pre-scaling needs Pillow", bootstyle=SECONDARY).pack(side=LEFT, padx=5)
         file_frame.columnconfigure(1, weight=1)
 
         obs_frame = ttk.LabelFrame(main_frame, text="OBS Connection", padding="10")
@@ -94,10 +1174,25 @@ class ExcelToOBS:
         ttk.Label(obs_frame, text="Password:").grid(row=1, column=0, padx=(0,5), pady=5, sticky=W)
         self.obs_password_entry = ttk.Entry(obs_frame, textvariable=self.obs_password_var, width=15, show="*")
         self.obs_password_entry.grid(row=1, column=1, columnspan=3, padx=(0,10), pady=5, sticky=EW)
+        ttk.Label(obs_frame, text="Extra Targets:").grid(row=2, column=0, padx=(0,5), pady=5, sticky=W)
+        self.obs_extra_targets_entry = ttk.Entry(obs_frame, textvariable=self.obs_extra_targets_var, width=15)
+        self.obs_extra_targets_entry.grid(row=2, column=1, columnspan=3, padx=(0,10), pady=5, sticky=EW)
         self.connect_button = ttk.Button(obs_frame, text="Connect / Reconnect", command=self.connect_obs, bootstyle=INFO)
-        self.connect_button.grid(row=0, column=4, rowspan=2, padx=5, pady=5, sticky=NS+E)
+        self.connect_button.grid(row=0, column=4, rowspan=3, padx=5, pady=5, sticky=NS+E)
+        ttk.Checkbutton(obs_frame, text="Defer updates for sources not on Program/Preview (studio mode)", variable=self.defer_hidden_var, command=self._apply_defer_hidden, bootstyle=ROUND+TOGGLE).grid(row=3, column=1, columnspan=3, padx=(0,10), pady=5, sticky=W)
+        ttk.Checkbutton(obs_frame, text="Share values in memory", variable=self.shared_snapshot_var, command=self._apply_shared_snapshot, bootstyle=ROUND+TOGGLE).grid(row=3, column=4, padx=5, pady=5, sticky=W)
+        local_api_frame = ttk.Frame(obs_frame); local_api_frame.grid(row=4, column=1, columnspan=3, padx=(0,10), pady=5, sticky=W)
+        ttk.Checkbutton(local_api_frame, text="Accept pushed cell values on local port", variable=self.local_api_enabled_var, command=self._apply_local_api, bootstyle=ROUND+TOGGLE).pack(side=LEFT)
+        self.local_api_port_entry = ttk.Entry(local_api_frame, textvariable=self.local_api_port_var, width=6)
+        self.local_api_port_entry.pack(side=LEFT, padx=5)
+        ttk.Label(obs_frame, text="Text Files:").grid(row=5, column=0, padx=(0,5), pady=5, sticky=W)
+        self.text_sink_entry = ttk.Entry(obs_frame, textvariable=self.text_sink_dir_var, width=15)
+        self.text_sink_entry.grid(row=5, column=1, columnspan=3, padx=(0,10), pady=5, sticky=EW)
+        ttk.Button(obs_frame, text="Browse", command=self.choose_text_sink_dir, bootstyle=SECONDARY).grid(row=5, column=4, padx=5, pady=5, sticky=E)
         self.obs_status_label = ttk.Label(obs_frame, text="OBS Status: Disconnected", anchor=W)
-        self.obs_status_label.grid(row=2, column=0, columnspan=5, padx=0, pady=(5,0), sticky=EW)
+        self.obs_status_label.grid(row=6, column=0, columnspan=5, padx=0, pady=(5,0), sticky=EW)
+
+        self._setup_perf_panel(main_frame)
 
         inputs_outer_frame = ttk.LabelFrame(main_frame, text="OBS Source Mapping Groups", padding="10")
         inputs_outer_frame.pack(fill=BOTH, expand=YES, pady=(0, 10))
@@ -114,6 +1209,9 @@ class ExcelToOBS:
         button_frame.pack(fill=X, pady=(5, 0))
         ttk.Button(button_frame, text="Add Group", command=self.add_group, bootstyle=SUCCESS).pack(side=LEFT, padx=5)
         ttk.Button(button_frame, text="Update OBS Now", command=lambda: self.update_obs_data(check_changes=False), bootstyle=PRIMARY).pack(side=LEFT, padx=5)
+        ttk.Button(button_frame, text="Latency Report", command=self.show_latency_report, bootstyle=(INFO, OUTLINE)).pack(side=LEFT, padx=5)
+        ttk.Button(button_frame, text="Dump Recorder", command=self.dump_flight_recorder, bootstyle=(SECONDARY, OUTLINE)).pack(side=LEFT, padx=5)
+        ttk.Button(button_frame, text=f"Profile {PROFILE_WINDOW_SECONDS}s", command=self.start_profile, bootstyle=(SECONDARY, OUTLINE)).pack(side=LEFT, padx=5)
         ttk.Button(button_frame, text="Import Settings", command=self.import_settings, bootstyle=SECONDARY).pack(side=RIGHT, padx=5)
         ttk.Button(button_frame, text="Export Settings", command=self.export_settings, bootstyle=SECONDARY).pack(side=RIGHT, padx=5)
 
@@ -123,9 +1221,127 @@ class ExcelToOBS:
         self.inputs_data = []
         if not self.inputs_data: self.add_group(group_name=DEFAULT_GROUP_NAME)
 
+    def _setup_perf_panel(self, parent):
+        """Collapsible performance panel (closed at start); _refresh_perf_panel fills it from self.perf_snapshot."""
+        outer = ttk.Frame(parent); outer.pack(fill=X, pady=(0, 10))
+        header = ttk.Frame(outer); header.pack(fill=X)
+        self.perf_toggle_button = ttk.Button(header, text=EXPAND_SYMBOL, command=self._toggle_perf_panel, bootstyle=(SECONDARY, OUTLINE), width=2)
+        self.perf_toggle_button.pack(side=LEFT, padx=(0, 5))
+        ttk.Label(header, text="Performance").pack(side=LEFT)
+        self.perf_content_frame = ttk.Frame(outer, padding=(5, 5, 5, 0))
+        fields = (("reload", "Last reload"), ("cycle", "Cycle time"), ("sends", "Sends/s"), ("queue", "Queue depth"), ("round_trip", "OBS round trip"), ("skipped", "Skipped no-ops"))
+        self.perf_value_labels = {}
+        for index, (key, title) in enumerate(fields):
+            row, column = divmod(index, 3)
+            ttk.Label(self.perf_content_frame, text=f"{title}:").grid(row=row, column=column * 2, padx=(0, 5), pady=2, sticky=W)
+            self.perf_value_labels[key] = ttk.Label(self.perf_content_frame, text="-", width=18, anchor=W)
+            self.perf_value_labels[key].grid(row=row, column=column * 2 + 1, padx=(0, 15), pady=2, sticky=W)
+        ttk.Label(self.perf_content_frame, text="Staleness:").grid(row=2, column=0, padx=(0, 5), pady=2, sticky=NW)
+        self.perf_groups_label = ttk.Label(self.perf_content_frame, text="-", anchor=W, justify=LEFT, wraplength=560)
+        self.perf_groups_label.grid(row=2, column=1, columnspan=5, pady=2, sticky=W)
+
+    def _toggle_perf_panel(self):
+        self.perf_panel_open = not self.perf_panel_open
+        if self.perf_panel_open:
+            self.perf_previous = None; self.perf_snapshot = None  # rates restart from now, not from when the panel was last open
+            self.perf_content_frame.pack(fill=X); self.perf_toggle_button.config(text=COLLAPSE_SYMBOL)
+        else: self.perf_content_frame.pack_forget(); self.perf_toggle_button.config(text=EXPAND_SYMBOL)
+
+    def _build_perf_snapshot(self):
+        """Collects the panel's figures on the update thread. Rates and averages cover the time since the previous snapshot."""
+        now, perf_now = time.time(), time.perf_counter()
+        sends, skipped = SENDS_TOTAL.total(), SKIPPED_UPDATES_TOTAL.total()
+        cycle, round_trip = UPDATE_CYCLE_SECONDS.totals(), OBS_ROUND_TRIP_SECONDS.totals()
+        previous = self.perf_previous; self.perf_previous = (now, sends, skipped, cycle, round_trip)
+        def window_average(current, before): return (current[0] - before[0]) / (current[1] - before[1]) if before and current[1] > before[1] else None
+        elapsed = now - previous[0] if previous else 0
+        waiting = {}
+        for target in list(self.obs_targets):
+            for source, queued_at in target.waiting_since().items(): waiting[source] = min(queued_at, waiting.get(source, queued_at))
+        groups = []
+        for group_data in list(self.inputs_data):
+            queued = [waiting[source] for source in {m["name"].get().strip() for m in list(group_data["mappings"])} if source in waiting]
+            groups.append((group_data["name_var"].get(), perf_now - min(queued) if queued else None, len(queued)))
+        reload = self.last_reload
+        return {"reload_seconds": reload["parse_end"] - reload["parse_start"] if reload else None, "reload_age": now - reload["parse_end"] if reload else None,
+                "cycle_seconds": window_average(cycle, previous and previous[3]) or self.last_cycle_seconds,
+                "sends_per_second": (sends - previous[1]) / elapsed if elapsed > 0 else None,
+                "queue_depth": sum(target.queue_depth() for target in list(self.obs_targets)),
+                "round_trip_seconds": window_average(round_trip, previous and previous[4]),
+                "skipped_total": skipped, "skipped_per_second": (skipped - previous[2]) / elapsed if elapsed > 0 else None, "groups": groups}
+
+    def _refresh_perf_panel(self):
+        """Tk-thread side of the panel: shows the latest snapshot at PERF_PANEL_REFRESH_MS; never touches the engine itself."""
+        if not self.running: return
+        snapshot = self.perf_snapshot
+        try:
+            if self.perf_panel_open and snapshot is not None and snapshot is not self.perf_shown:
+                self.perf_shown = snapshot
+                def duration(seconds):
+                    if seconds is None: return "-"
+                    return f"{seconds * 1e6:.0f} µs" if seconds < 0.001 else (f"{seconds * 1000:.1f} ms" if seconds < 1 else f"{seconds:.2f} s")
+                texts = {"reload": "-" if snapshot["reload_seconds"] is None else f"{duration(snapshot['reload_seconds'])}, {snapshot['reload_age']:.0f}s ago",
+                         "cycle": duration(snapshot["cycle_seconds"]),
+                         "sends": "-" if snapshot["sends_per_second"] is None else f"{snapshot['sends_per_second']:.1f}",
+                         "queue": str(snapshot["queue_depth"]),
+                         "round_trip": duration(snapshot["round_trip_seconds"]) if snapshot["round_trip_seconds"] is not None else "idle",
+                         "skipped": f"{snapshot['skipped_total']:g}" + ("" if snapshot["skipped_per_second"] is None else f" ({snapshot['skipped_per_second']:.1f}/s)")}
+                for key, text in texts.items(): self.perf_value_labels[key].config(text=text)
+                groups = snapshot["groups"]
+                stale = any(age is not None and age > PERF_STALE_WARNING_SECONDS for _, age, _ in groups)
+                lines = [f"{name}: up to date" if age is None else f"{name}: {age:.1f}s behind ({count} waiting)" for name, age, count in groups]
+                self.perf_groups_label.config(text="   ".join(lines) or "-", style=self._get_style_name(WARNING if stale else DEFAULT))
+        except TclError as e: logging.error(f"Error refreshing performance panel: {e}")
+        finally:
+            if self.running: self.root.after(PERF_PANEL_REFRESH_MS, self._refresh_perf_panel)
+
+    def dump_flight_recorder(self):
+        def dump():
+            path = FLIGHT.dump("manual")
+            if path: self.update_status(f"Flight recorder saved to {path}", "success")
+            else: self.update_status("Flight recorder dump failed; see log.", "error")
+        threading.Thread(target=dump, daemon=True, name="FlightRecorderDump").start()
+
+    def start_profile(self, window=PROFILE_WINDOW_SECONDS):
+        """Samples the pipeline threads for `window` seconds and cProfiles the next update pass (see SamplingProfiler)."""
+        try: started, base_path = self.profiler.start(window)
+        except OSError as e: logging.error(f"Cannot start profiler: {e}"); self.update_status(f"Cannot start profiler: {e}", "error"); return False, None
+        if started: self.update_wakeup.set(); self.update_status(f"Profiling for {window:g}s...", "info")
+        else: self.update_status("A profile is already being captured.", "warning")
+        return started, base_path
+
+    def _profile_done(self, result):
+        if result["folded"]: self.update_status(f"Profile saved to {result['folded']}" + (" (+ .pstats)" if result["pstats"] else ""), "success")
+        else: self.update_status("Profile could not be written; see log.", "error")
+
+    def _profile_update_cycle(self, path):
+        """Runs one full update pass under cProfile (the idle shortcut is bypassed) and dumps its stats to `path`."""
+        self._mark_inputs_changed(); profiler = cProfile.Profile()
+        profiler.enable()
+        try: self.update_obs_data(check_changes=True)
+        finally:
+            profiler.disable()
+            try: profiler.dump_stats(path); logging.info(f"Update pass profile written to {path}")
+            except OSError as e: logging.error(f"Cannot write update pass profile {path}: {e}")
+
+    def show_latency_report(self):
+        """Opens (or refreshes) a window with per-stage p50/p99 and the slowest recent changes."""
+        window = getattr(self, "latency_window", None)
+        if window is None or not window.winfo_exists():
+            window = self.latency_window = ttk.Toplevel(self.root); window.title("Latency Report (file save -> OBS ack)")
+            self.latency_text = ttk.Text(window, width=110, height=30, font=("Courier", 9), wrap=NONE)
+            self.latency_text.pack(fill=BOTH, expand=YES, padx=5, pady=5)
+            ttk.Button(window, text="Refresh", command=self.show_latency_report, bootstyle=SECONDARY).pack(pady=(0, 5))
+        self.latency_text.delete("1.0", END); self.latency_text.insert("1.0", format_trace_report(TRACES.report()))
+        window.lift()
+
     def update_status(self, message, level="info"):
+        if self.headless: logging.log({"warning": logging.WARNING, "error": logging.ERROR}.get(level, logging.INFO), f"Status Update: {message}"); return
         if self.running:
-            try: self.status_queue.put((message, level))
+            try: self.status_queue.put_nowait((message, level))
+            except queue.Full:  # the Tk thread is stalled; keep the newest messages
+                try: self.status_queue.get_nowait(); self.status_queue.task_done(); self.status_queue.put_nowait((message, level))
+                except (queue.Empty, queue.Full): pass
             except Exception as e: logging.error(f"Failed to put message in status queue: {e}")
 
     def process_status_queue(self):
@@ -152,10 +1368,11 @@ class ExcelToOBS:
                 self.file_path.set(path); self.update_status(f"Selected file: {os.path.basename(path)}")
                 logging.info(f'Selected file: {path}')
                 with self.excel_read_lock: self.last_excel_mtime = None; self.cached_df = None
-                self.previous_values.clear(); self.update_all_value_labels()
+                self.previous_values.clear(); self._mark_inputs_changed(); self.update_all_value_labels()
         except Exception as e: logging.exception("Error choosing file."); self.update_status(f"Error choosing file: {e}", "error")
 
     def add_group(self, group_data=None, group_name=None):
+        if self.headless: return self._add_headless_group(group_data, group_name)
         group_index = len(self.inputs_data)
         is_expanded = True
         group_outer_frame = ttk.LabelFrame(self.groups_container_frame, text="", padding=5)
@@ -172,6 +1389,15 @@ class ExcelToOBS:
         add_mapping_button.pack(side=LEFT, padx=5)
         delete_group_button = ttk.Button(header_frame, text="Delete Group", command=lambda idx=group_index: self.delete_group(idx), bootstyle=(DANGER, OUTLINE), width=12)
         delete_group_button.pack(side=RIGHT, padx=5)
+        # Atomic groups send their changed sources as one request batch so they land on the same frame
+        group_cfg = group_data if isinstance(group_data, dict) else {}
+        atomic_mode_var = ttk.StringVar(value=group_cfg.get("atomic_mode", DEFAULT_ATOMIC_BATCH_MODE))
+        if atomic_mode_var.get() not in ATOMIC_BATCH_MODES: atomic_mode_var.set(DEFAULT_ATOMIC_BATCH_MODE)
+        atomic_var = ttk.IntVar(value=int(group_cfg.get("atomic", 0)))
+        atomic_mode_menu = ttk.OptionMenu(header_frame, atomic_mode_var, atomic_mode_var.get(), *ATOMIC_BATCH_MODES); atomic_mode_menu.config(width=10)
+        atomic_mode_menu.pack(side=RIGHT, padx=(0, 5))
+        ttk.Checkbutton(header_frame, text="Atomic", variable=atomic_var, bootstyle=ROUND+TOGGLE).pack(side=RIGHT, padx=5)
+        for var in (atomic_var, atomic_mode_var): var.trace_add("write", self._mark_inputs_changed)
         collapsible_content_frame = ttk.Frame(group_outer_frame)
         if is_expanded: collapsible_content_frame.pack(fill=X, pady=(5, 0))
         separator = ttk.Separator(collapsible_content_frame, orient=HORIZONTAL); separator.pack(fill=X, pady=0)
@@ -187,9 +1413,9 @@ class ExcelToOBS:
             "mappings_frame": mappings_frame, "collapsible_content_frame": collapsible_content_frame,
             "mapping_header_frame": mapping_header_frame, "separator": separator, "mappings": [],
             "delete_button": delete_group_button, "add_mapping_button": add_mapping_button,
-            "toggle_button": toggle_button, "is_expanded": is_expanded
+            "toggle_button": toggle_button, "is_expanded": is_expanded, "atomic": atomic_var, "atomic_mode": atomic_mode_var
         }
-        self.inputs_data.append(new_group)
+        self.inputs_data.append(new_group); self._mark_inputs_changed()
         is_new_group = True; final_group_name = None
         if group_data and isinstance(group_data, dict):
             final_group_name = group_data.get("group_name", f"Group {group_index + 1}"); is_new_group = False
@@ -202,6 +1428,21 @@ class ExcelToOBS:
             self.update_status(f"Added new group '{final_group_name}'.")
         self._update_dynamic_commands()
 
+    def _add_headless_group(self, group_data=None, group_name=None):
+        """Builds the same group/mapping records as add_group/add_input_row, minus the widgets."""
+        group_cfg = group_data if isinstance(group_data, dict) else {}
+        atomic_mode = group_cfg.get("atomic_mode", DEFAULT_ATOMIC_BATCH_MODE)
+        group = {"name_var": PlainVar(group_cfg.get("group_name") or group_name or f"Group {len(self.inputs_data) + 1}"), "mappings": [], "is_expanded": True,
+                 "atomic": PlainVar(int(group_cfg.get("atomic", 0))), "atomic_mode": PlainVar(atomic_mode if atomic_mode in ATOMIC_BATCH_MODES else DEFAULT_ATOMIC_BATCH_MODE)}
+        supported_types = ["Text", "Image", DOUBLE_BUFFER_TYPE, "Browser", "Media"]
+        for mapping_index, mapping_data in enumerate(group_cfg.get("mappings", [])):
+            data_type = mapping_data.get("type", "Text")
+            group["mappings"].append({"group_index": len(self.inputs_data), "mapping_index": mapping_index, "data_type": PlainVar(data_type if data_type in supported_types else "Text"),
+                                      "name": PlainVar(mapping_data.get("name", "")), "row": PlainVar(str(mapping_data.get("row", ""))), "col": PlainVar(str(mapping_data.get("col", ""))),
+                                      "auto_update": PlainVar(int(mapping_data.get("auto_update", 1))), "value_label": HEADLESS_LABEL})
+        self.inputs_data.append(group); self._mark_inputs_changed()
+        logging.debug(f"Added headless group '{group['name_var'].get()}' with {len(group['mappings'])} mappings.")
+
     def _update_group_name(self, group_index):
         if 0 <= group_index < len(self.inputs_data):
             group_data = self.inputs_data[group_index]
@@ -215,7 +1456,7 @@ class ExcelToOBS:
         if not (0 <= group_index < len(self.inputs_data)): logging.warning(f"Attempted to delete invalid group index: {group_index}"); return
         group_to_delete = self.inputs_data[group_index]; group_name = group_to_delete["name_var"].get()
         try:
-            group_to_delete["frame"].destroy(); self.inputs_data.pop(group_index)
+            group_to_delete["frame"].destroy(); self.inputs_data.pop(group_index); self._mark_inputs_changed()
             logging.info(f"Deleted group '{group_name}' at index {group_index}"); self.update_status(f"Deleted group '{group_name}'.")
             self._update_dynamic_commands()
         except Exception as e: logging.exception(f"Error deleting group {group_index}: {e}"); self.update_status(f"Error deleting group '{group_name}'.", "error")
@@ -224,7 +1465,7 @@ class ExcelToOBS:
         if not (0 <= group_index < len(self.inputs_data)): logging.warning(f"Toggle called for invalid group index: {group_index}"); return
         group_data = self.inputs_data[group_index]
         content_frame = group_data["collapsible_content_frame"]; toggle_button = group_data["toggle_button"]
-        group_data["is_expanded"] = not group_data["is_expanded"]; is_now_expanded = group_data["is_expanded"]
+        group_data["is_expanded"] = not group_data["is_expanded"]; is_now_expanded = group_data["is_expanded"]; self._mark_inputs_changed()
         if is_now_expanded: content_frame.pack(fill=X, pady=(5, 0)); toggle_button.config(text=COLLAPSE_SYMBOL); logging.debug(f"Expanded group {group_index}")
         else: content_frame.pack_forget(); toggle_button.config(text=EXPAND_SYMBOL); logging.debug(f"Collapsed group {group_index}")
 
@@ -244,13 +1485,13 @@ class ExcelToOBS:
         }
 
         # --- Add "Browser URL" and "Media File" to options ---
-        supported_types = ["Text", "Image", "Browser", "Media"]
+        supported_types = ["Text", "Image", DOUBLE_BUFFER_TYPE, "Browser", "Media"]
         # Set default value explicitly *before* creating OptionMenu if it's not the first item
         if mapping_data: default_type = mapping_data.get("type", "Text")
         else: default_type = "Text"
         data_type_var.set(default_type if default_type in supported_types else "Text") # Ensure default is valid
 
-        data_type_menu = ttk.OptionMenu(row_frame, data_type_var, supported_types[0], *supported_types)
+        data_type_menu = ttk.OptionMenu(row_frame, data_type_var, data_type_var.get(), *supported_types)
         # --------------------------------------------------------
         data_type_menu.config(width=10) # Increased width slightly for longer names
         data_type_menu.pack(side=LEFT, padx=5)
@@ -263,7 +1504,8 @@ class ExcelToOBS:
         check_button = ttk.Checkbutton(row_frame, variable=check_var, bootstyle=(PRIMARY, TOOLBUTTON)); check_button.pack(side=LEFT, padx=(5, 10))
         del_button = ttk.Button(row_frame, text="X", command=lambda gi=group_index, mi=mapping_index: self.delete_input_row(gi, mi), bootstyle=(DANGER, OUTLINE), width=3); del_button.pack(side=RIGHT, padx=5)
         row_data["delete_button"] = del_button
-        mappings_list.append(row_data)
+        mappings_list.append(row_data); self._mark_inputs_changed()
+        for var in (data_type_var, row_var, col_var, name_var, check_var): var.trace_add("write", self._mark_inputs_changed)
 
         if mapping_data: # Populate uses the already set data_type_var
             # data_type_var already set above
@@ -282,10 +1524,10 @@ class ExcelToOBS:
         row_data_to_delete = mappings_list[mapping_index]
         try:
             row_str, col_str = row_data_to_delete["row"].get(), row_data_to_delete["col"].get()
-            if row_str.isdigit() and col_str.isdigit(): cell_id = (int(row_str) - 1, int(col_str) - 1); self.previous_values.pop(cell_id, None); logging.debug(f"Cleared previous value for cell {cell_id} on delete.")
+            if row_str.isdigit() and col_str.isdigit(): mapping_key = (row_data_to_delete["name"].get().strip(), int(row_str) - 1, int(col_str) - 1); self.previous_values.pop(mapping_key, None); logging.debug(f"Cleared previous value for mapping {mapping_key} on delete.")
         except Exception as e: logging.warning(f"Could not clear previous_value for deleted row ({group_index},{mapping_index}): {e}")
         try:
-            row_data_to_delete["frame"].destroy(); mappings_list.pop(mapping_index)
+            row_data_to_delete["frame"].destroy(); mappings_list.pop(mapping_index); self._mark_inputs_changed()
             logging.info(f"Deleted mapping row {mapping_index} from group '{group_data['name_var'].get()}'."); self.update_status(f"Deleted mapping row from group '{group_data['name_var'].get()}'.")
             self._update_mapping_delete_commands(group_index)
         except Exception as e: logging.exception(f"Error deleting mapping row ({group_index},{mapping_index}): {e}"); self.update_status(f"Error deleting mapping row.", "error")
@@ -320,10 +1562,18 @@ class ExcelToOBS:
 
     def _check_update_needed(self, row_data): pass
 
-    def _get_style_name(self, bootstyle_constant, base_widget_type="TLabel"):
-        style_prefix_map = {PRIMARY: "primary", INFO: "info", SUCCESS: "success", WARNING: "warning", DANGER: "danger", LIGHT: "light", DARK: "dark", SECONDARY: "secondary", DEFAULT: ""}
-        prefix = style_prefix_map.get(bootstyle_constant, "")
-        return f"{prefix}.{base_widget_type}" if prefix else base_widget_type
+    def _get_style_name(self, bootstyle_constant, base_widget_type="TLabel"): return label_style_name(bootstyle_constant, base_widget_type)
+
+    def _set_value_label(self, mapping_data, text, bootstyle_constant):
+        """Configures a mapping's value label only when its text or style differs from what it already shows."""
+        style_name = label_style_name(bootstyle_constant)
+        if mapping_data.get("label_text") == text and mapping_data.get("label_style") == style_name: return
+        mapping_data["value_label"].config(text=text, style=style_name)
+        mapping_data["label_text"] = text; mapping_data["label_style"] = style_name
+
+    def _mark_inputs_changed(self, *_):
+        """Something feeding the diff changed (workbook, pushed cells, mappings, file or sheet): the next pass must walk every mapping."""
+        self.change_generation += 1
 
     def update_value_label(self, mapping_data):
         row_str, col_str = mapping_data["row"].get().strip(), mapping_data["col"].get().strip()
@@ -337,19 +1587,18 @@ class ExcelToOBS:
             self._ensure_excel_cache()
             try:
                 row_idx, col_idx = int(row_str) - 1, int(col_str) - 1
-                current_value = self._get_cell_value_from_cache(row_idx, col_idx)
+                current_value = self._get_cell_value_from_cache(row_idx, col_idx, mapping_data["data_type"].get())
                 if current_value is None: display_text = "?"; current_style = WARNING
                 else:
                     value_str = str(current_value)
                     display_text = value_str[:50] + ('...' if len(value_str)>50 else '')
-                    cell_id = (row_idx, col_idx)
-                    if cell_id in self.previous_values and self.previous_values[cell_id] != current_value: current_style = INFO
+                    mapping_key = (mapping_data["name"].get().strip(), row_idx, col_idx)
+                    if mapping_key in self.previous_values and self.previous_values[mapping_key] != current_value: current_style = INFO
                     else: current_style = DEFAULT
             except ValueError: display_text = "Num?"; current_style = WARNING
             except Exception as e: logging.error(f"Error getting/checking value for label update ({mapping_data.get('group_index')},{mapping_data.get('mapping_index')}): {e}"); display_text = "Err"; current_style = DANGER
-        try:
-            style_name = self._get_style_name(current_style, "TLabel")
-            label_widget.config(text=display_text, style=style_name)
+        style_name = label_style_name(current_style)
+        try: self._set_value_label(mapping_data, display_text, current_style)
         except TclError as e:
             logging.error(f"TclError configuring label ({mapping_data.get('group_index')},{mapping_data.get('mapping_index')}): {e}. Text: '{display_text}', Style: '{style_name}'")
             try: label_widget.config(text=display_text + " (StyleErr!)")
@@ -365,49 +1614,169 @@ class ExcelToOBS:
                  except Exception as e:
                      logging.error(f"Error updating label for mapping ({group_index},{mapping_index}): {e}")
                      if mapping_data.get("value_label"):
-                         try: err_style = self._get_style_name(DANGER, "TLabel"); mapping_data["value_label"].config(text="Err!", style=err_style)
+                         try: self._set_value_label(mapping_data, "Err!", DANGER)
                          except Exception as fallback_e: logging.error(f"Error setting error label state: {fallback_e}")
 
+    def choose_text_sink_dir(self):
+        folder = filedialog.askdirectory(title="Folder for OBS text files")
+        if folder: self.text_sink_dir_var.set(folder); self._apply_text_sink()
+
+    def _apply_text_sink(self):
+        """Starts, moves or stops the text-file sink to match the folder setting."""
+        folder = self.text_sink_dir_var.get().strip()
+        if self.text_sink is not None and self.text_sink.folder != folder: self.text_sink.stop(wait=False); self.text_sink = None
+        if not folder: return
+        if self.text_sink is None:
+            try: self.text_sink = TextFileSink(folder); logging.info(f"Writing text sources to files in '{folder}'.")
+            except OSError as e: logging.error(f"Cannot use text file folder '{folder}': {e}"); self.update_status(f"Cannot use text file folder: {e}", "error"); return
+        self.text_sink.assign_file_names(self._mapped_source_names())
+
+    def _apply_shared_snapshot(self):
+        if self.shared_snapshot_var.get() != 1:
+            if self.shared_snapshot is not None: self.shared_snapshot.close(); self.shared_snapshot = None; logging.info("Shared-memory snapshot removed.")
+            return
+        if self.shared_snapshot is not None: return
+        try: self.shared_snapshot = SharedSnapshotWriter(); self.snapshot_generation = None; logging.info(f"Publishing mapped values to shared memory '{self.shared_snapshot.name}'.")
+        except (OSError, ValueError) as e:
+            self.shared_snapshot_var.set(0); logging.error(f"Cannot create shared memory: {e}"); self.update_status(f"Cannot share values in memory: {e}", "error")
+        self.update_wakeup.set()
+
+    def _publish_shared_snapshot(self):
+        """Publishes every mapped cell's current value, by cell address and by source name."""
+        writer = self.shared_snapshot
+        if writer is None: return
+        self._ensure_excel_cache(); generation = self.change_generation
+        if generation == self.snapshot_generation: return  # readers already have these values
+        cells, sources = {}, {}
+        for group_data in list(self.inputs_data):
+            for mapping_data in list(group_data["mappings"]):
+                row_str, col_str = mapping_data["row"].get().strip(), mapping_data["col"].get().strip()
+                if not row_str.isdigit() or not col_str.isdigit() or int(row_str) < 1 or int(col_str) < 1: continue
+                value = self._get_cell_value_from_cache(int(row_str) - 1, int(col_str) - 1, mapping_data["data_type"].get())
+                if value is None: continue
+                value = value.item() if hasattr(value, "item") else value
+                cells[f"{get_column_letter(int(col_str))}{row_str}"] = value
+                source_name = mapping_data["name"].get().strip()
+                if source_name: sources[source_name] = value
+        try: writer.publish({"file": self.file_path.get(), "sheet": self.sheet_name.get(), "cells": cells, "sources": sources}); self.snapshot_generation = generation
+        except (TypeError, ValueError): pass  # the toggle closed the segment mid-publish
+
+    def _prune_stale_state(self):
+        """Drops state left behind by mappings that were renamed, re-pointed or removed (delete_input_row only covers deletes)."""
+        live_keys, mapped = set(), set()
+        for group_data in list(self.inputs_data):
+            for mapping_data in list(group_data["mappings"]):
+                source_name, row_str, col_str = mapping_data["name"].get().strip(), mapping_data["row"].get().strip(), mapping_data["col"].get().strip()
+                mapped.add(source_name)
+                if row_str.isdigit() and col_str.isdigit(): live_keys.add((source_name, int(row_str) - 1, int(col_str) - 1))
+        stale_keys = [key for key in self.previous_values if key not in live_keys]
+        for key in stale_keys: self.previous_values.pop(key, None)
+        stale_images = [source for source in self.latest_image_values if source not in mapped]
+        for source in stale_images: self.latest_image_values.pop(source, None)
+        stale_watches = self.file_watcher.watched_sources() - mapped
+        for source in stale_watches: self.file_watcher.watch(source, None, "")
+        if self.text_sink is not None: self.text_sink.assign_file_names(mapped)  # renamed mappings may clash with another source's file
+        dropped = len(stale_keys) + len(stale_images) + len(stale_watches) + sum(target.prune(mapped) for target in list(self.obs_targets))
+        if dropped: logging.info(f"Pruned {dropped} state entries for sources or cells no mapping uses any more.")
+        return dropped
+
+    def _structure_sizes(self):
+        """Entry counts of the long-lived structures, for the memory report."""
+        sizes = {"previous_values": len(self.previous_values), "latest_image_values": len(self.latest_image_values), "status_queue": self.status_queue.qsize(),
+                 "pushed_cells": sum(len(cells) for cells in list(self.pushed_values.values())), "watched_files": len(self.file_watcher.watched_sources()),
+                 "embedded_blobs": len(self.embedded_images.blobs), "image_jobs": len(self.image_assets.jobs) if self.image_assets else 0,
+                 "flight_names": len(FLIGHT.names), "traces": len(TRACES.completed), "overlay_subscribers": len(self.overlay_hub.subscribers)}
+        for target in list(self.obs_targets):
+            sizes[f"{target.label}:desired"] = len(target.desired); sizes[f"{target.label}:last_sent"] = len(target.last_sent)
+            sizes[f"{target.label}:builders"] = len(target.builders); sizes[f"{target.label}:pending"] = target.queue_depth()
+        return sizes
+
+    def _output_targets(self):
+        """Everything mapping values fan out to: each OBS instance plus the text-file sink."""
+        return self.obs_targets + [self.text_sink] if self.text_sink is not None else self.obs_targets
+
     def connect_obs(self):
-        if self._connecting: return
-        self._connecting = True; self.connect_button.config(state=DISABLED)
-        self.update_status("Connecting to OBS...", "info"); self.update_obs_status_label("Connecting...", WARNING)
-        if self.obs_client:
-             try:
-                 disconnect_thread = threading.Thread(target=self.obs_client.disconnect, daemon=True, name="OBSDisconnectThread"); disconnect_thread.start()
-                 disconnect_thread.join(timeout=DISCONNECT_TIMEOUT_SECONDS)
-                 if disconnect_thread.is_alive(): logging.warning("Previous OBS disconnect timed out.")
-             except Exception as e: logging.warning(f"Error during explicit OBS disconnect: {e}")
-             finally:
-                  with self.obs_connection_lock: self.obs_client = None; self.obs_connected = False
-        host, password = self.obs_host_var.get().strip(), self.obs_password_var.get()
-        port_str = self.obs_port_var.get().strip()
-        if not port_str.isdigit():
-            self.update_status("Invalid OBS Port: Must be a number.", "error"); logging.error(f"Invalid OBS Port provided: {port_str}")
-            self.root.after(0, self._finalize_connection_attempt, False, "Invalid OBS Port"); return
-        port = int(port_str)
-        logging.info(f"Attempting to connect to OBS at {host}:{port}...")
-        connect_thread = threading.Thread(target=self._obs_connect_worker, args=(host, port, password), daemon=True, name="OBSConnectThread"); connect_thread.start()
-
-    def _obs_connect_worker(self, host, port, password):
-        new_client, connected_successfully, error_message = None, False, ""
+        """(Re)creates one OBSTarget per configured OBS instance. Each connects and reconnects on its own."""
+        self._apply_text_sink()
+        try: target_params = parse_obs_targets(self.obs_host_var.get(), self.obs_port_var.get(), self.obs_password_var.get(), self.obs_extra_targets_var.get())
+        except ValueError as e: self.update_status(str(e), "error"); logging.error(f"Invalid OBS target settings: {e}"); return
+        old_targets = self.obs_targets
+        if old_targets: threading.Thread(target=lambda: [t.stop() for t in old_targets], daemon=True, name="OBSTargetShutdown").start()
+        self.update_status(f"Connecting to {len(target_params)} OBS target(s)...", "info")
+        self.obs_targets = [OBSTarget(host, port, password, on_status=self.update_status, on_health=self._refresh_obs_status_label, mapped_sources=self._mapped_source_names, scene_aware=self.defer_hidden_var.get() == 1)
+                            for host, port, password in target_params]
+        for target in self.obs_targets: target.start()
+        self._refresh_obs_status_label()
+
+    def _apply_defer_hidden(self):
+        enabled = self.defer_hidden_var.get() == 1
+        for target in self.obs_targets: target.set_scene_aware(enabled)
+        logging.info(f"Deferring updates for hidden sources {'enabled' if enabled else 'disabled'}.")
+
+    def _apply_local_api(self):
+        """Starts, restarts (port change) or stops the local API server to match the toggle."""
+        if self.local_api is not None: self.local_api.stop(); self.local_api = None; logging.info("Local API stopped.")
+        if self.local_api_enabled_var.get() != 1: return
         try:
-             new_client = obs.ReqClient(host=host, port=port, password=password if password else None, timeout=CONNECTION_TIMEOUT_SECONDS)
-             connected_successfully = True
-        except obs.ConnectionFailure as e: error_message = f"OBS Connection Failed: {e}"; logging.error(error_message)
-        except Exception as e: error_message = f"OBS Connection Error: {e}"; logging.exception("OBS connection error.")
-        finally:
-            with self.obs_connection_lock: self.obs_client = new_client if connected_successfully else None; self.obs_connected = connected_successfully
-            self.root.after(0, self._finalize_connection_attempt, connected_successfully, error_message)
+            port = int(self.local_api_port_var.get().strip())
+            self.local_api = LocalAPIServer(self, port, token=self.local_api_token)
+            logging.info(f"Local API listening on http://{LOCAL_API_HOST}:{port}"); self.update_status(f"Local API listening on port {port}.", "success")
+        except (ValueError, OSError) as e:
+            self.local_api_enabled_var.set(0); logging.error(f"Cannot start local API: {e}"); self.update_status(f"Cannot start local API: {e}", "error")
+
+    def push_cells(self, payload):
+        """Applies pushed cells (see excel2obs_api.LocalAPIHandler) to the overlay read by _get_cell_value_from_cache. Returns how many were applied."""
+        entries = payload if isinstance(payload, list) else [payload]
+        default_sheet = self.sheet_name.get(); updates = []
+        for entry in entries:
+            if not isinstance(entry, dict): raise ValueError("each update must be a JSON object")
+            sheet = str(entry.get("sheet") or default_sheet)
+            cells = entry["cells"] if "cells" in entry else {entry["address"]: entry.get("value")}
+            updates += [(sheet, parse_cell_address(address), normalize_cell_value(value)) for address, value in cells.items()]
+        with self.excel_read_lock:
+            new_cells = len({(sheet, cell) for sheet, cell, _ in updates if cell not in self.pushed_values.get(sheet, ())})
+            if sum(len(cells) for cells in self.pushed_values.values()) + new_cells > LOCAL_API_MAX_PUSHED_CELLS:
+                raise ValueError(f"more than {LOCAL_API_MAX_PUSHED_CELLS} pushed cells; DELETE /cells to clear them")
+            for sheet, cell, value in updates: self.pushed_values.setdefault(sheet, {})[cell] = value
+        self._mark_inputs_changed(); self.update_wakeup.set()
+        return len(updates)
+
+    def clear_pushed_cells(self, sheet=None):
+        with self.excel_read_lock:
+            if sheet is None: cleared = sum(len(cells) for cells in self.pushed_values.values()); self.pushed_values.clear()
+            else: cleared = len(self.pushed_values.pop(sheet, {}))
+        self._mark_inputs_changed(); self.update_wakeup.set()
+        return cleared
+
+    def read_overlay_cells(self, addresses):
+        """{address: value} for overlay clients; None for cells that cannot be read."""
+        values = {}
+        for address in addresses:
+            row, col = parse_cell_address(address); value = self._get_cell_value_from_cache(row, col)
+            values[address] = value.item() if hasattr(value, "item") else value  # numpy scalars -> plain JSON values
+        return values
 
-    def _finalize_connection_attempt(self, success, error_msg):
-         if success: logging.info("OBS Connected."); self.update_status("OBS Connected.", "success"); self.update_obs_status_label("Connected", SUCCESS)
-         else: self.update_status(error_msg, "error"); self.update_obs_status_label("Disconnected", DANGER)
-         self._connecting = False
-         try: self.connect_button.config(state=NORMAL)
-         except: pass
+    def _publish_overlays(self):
+        if not self.overlay_hub.has_subscribers(): return
+        self._ensure_excel_cache(); self.overlay_hub.publish(self.read_overlay_cells)
+
+    def _has_cell_overlay(self, row, col):
+        """True if a pushed value or embedded picture exists for a cell, even outside the sheet's data range."""
+        with self.excel_read_lock: return (row, col) in self.pushed_values.get(self.sheet_name.get(), {}) or (row, col) in self.cached_images
+
+    def _mapped_source_names(self):
+        return {mapping_data["name"].get().strip() for group_data in list(self.inputs_data) for mapping_data in list(group_data["mappings"])}
+
+    def _refresh_obs_status_label(self):
+        targets = list(self.obs_targets)
+        if not targets: self.update_obs_status_label("Disconnected", DANGER); return
+        connected = sum(1 for t in targets if t.connected)
+        style_constant = SUCCESS if connected == len(targets) else (DANGER if not connected and not any(t.running for t in targets) else WARNING)
+        text = targets[0].health if len(targets) == 1 else " | ".join(f"{t.label} {t.health}" for t in targets)
+        self.update_obs_status_label(text, style_constant)
 
     def update_obs_status_label(self, text, style_constant):
+        if self.headless: return
         def _update():
              if not self.running: return
              try: style_name = self._get_style_name(style_constant, "TLabel"); self.obs_status_label.config(text=f"OBS Status: {text}", style=style_name)
@@ -416,103 +1785,106 @@ class ExcelToOBS:
         if hasattr(self.root, 'after') and self.root.winfo_exists(): self.root.after(0, _update)
         else: logging.warning("Cannot schedule OBS status label update (root destroyed or no 'after').")
 
-    # --- MODIFIED send_update_to_obs: Handle new types ---
-    def send_update_to_obs(self, data_type, value, source_name):
-        """Sends the appropriate setting update to the specified OBS source."""
-        with self.obs_connection_lock:
-            if not self.obs_connected or not self.obs_client: return False
-            if not source_name: logging.warning("Skipping update: OBS Source Name empty."); return False
+    def _prescale_image(self, source_name, data_type, value):
+        """Watches the file behind an Image/Media value and starts pre-scaling images.
+        Returns a Future of the path to send, or None to send value unchanged."""
+        category = DATA_TYPE_CATEGORIES.get(data_type)
+        if category not in ("image", "media"): return None
+        signature = self.file_watcher.watch(source_name, data_type, value)
+        if category != "image": return None
+        self.latest_image_values[source_name] = value
+        if self.image_assets is None or not str(value).strip(): return None
+        try:
+            max_size = parse_prescale_size(self.image_prescale_var.get())
+            return self.image_assets.resolve(value, max_size, self.image_format_var.get(), signature) if max_size else None
+        except (ValueError, OSError) as e: logging.warning(f"Not pre-scaling '{value}' for '{source_name}': {e}"); return None
 
-            try:
-                settings = {}
-                value_str = str(value).strip() # Convert to string and strip whitespace
-
-                # Determine settings based on type
-                if data_type == "Text":
-                    settings = {"text": value_str} # Use stripped string for text too
-                    logging.info(f"Updating OBS Text '{source_name}' to '{value_str[:50]}{'...' if len(value_str)>50 else ''}'")
-                elif data_type == "Image":
-                    if not value_str: logging.warning(f"Skipping OBS Image '{source_name}': Empty file path."); return False
-                    abs_path = os.path.abspath(value_str)
-                    settings = {"file": abs_path}
-                    logging.info(f"Updating OBS Image '{source_name}' to '{abs_path}'")
-                # --- NEW TYPES ---
-                elif data_type == "Browser URL":
-                    # Basic check: allow empty URL to potentially clear/reset it in OBS? Or skip? Let's allow it.
-                    # if not value_str: logging.warning(f"Skipping OBS Browser URL '{source_name}': Empty URL."); return False
-                    settings = {"url": value_str}
-                    logging.info(f"Updating OBS Browser URL '{source_name}' to '{value_str}'")
-                elif data_type == "Media File":
-                    if not value_str: logging.warning(f"Skipping OBS Media File '{source_name}': Empty file path."); return False
-                    abs_path = os.path.abspath(value_str)
-                    settings = {"local_file": abs_path} # Key is 'local_file' for media sources
-                    logging.info(f"Updating OBS Media File '{source_name}' to '{abs_path}'")
-                # --- END NEW TYPES ---
-                else:
-                    logging.warning(f"Unknown data type '{data_type}' for source '{source_name}'"); return False
+    def _prescaled_value(self, job, value):
+        if job is None or not job.done(): return value
+        if job.exception() is not None: logging.warning(f"Pre-scaling '{value}' failed, sending the original: {job.exception()}"); return value
+        return job.result()
 
-                # Send the request
-                resp = self.obs_client.set_input_settings(name=source_name, settings=settings, overlay=True)
-                logging.debug(f"OBS response for '{source_name}' ({data_type}): {resp}")
-                return True
+    def send_update_to_obs(self, data_type, value, source_name, force=False, trace=None):
+        """Queues a mapping value on every OBS target; each converts it for its own input kind.
+        Image values wait for their pre-scaled copy first; the send then happens on the pool thread."""
+        if not self._output_targets(): return False
+        if not source_name: logging.warning("Skipping update: OBS Source Name empty."); return False
+        job = self._prescale_image(source_name, data_type, value)
+        if job is None: return self._enqueue_on_targets(data_type, value, source_name, force, trace)
+        def send_when_scaled(job):
+            if self.latest_image_values.get(source_name) == value: self._enqueue_on_targets(data_type, self._prescaled_value(job, value), source_name, force, trace)
+        job.add_done_callback(send_when_scaled)
+        return True
+
+    def _enqueue_on_targets(self, data_type, value, source_name, force, trace=None):
+        try:
+            accepted = [target.enqueue(source_name, data_type, value, force=force, trace=trace) for target in self._output_targets()]
+            if not any(accepted): logging.warning(f"Skipping OBS {data_type} '{source_name}': value '{str(value)[:50]}' cannot be sent (empty path or type mismatch).")
+            return any(accepted)
+        except Exception as e:
+            logging.exception(f"Unexpected OBS update error '{source_name}' ({data_type}): {e}")
+            self.update_status(f"Unexpected OBS Error for '{source_name}': {e}", "error");
+            return False
+
+    def send_group_update_to_obs(self, group_name, items, atomic_mode, force=False, traces=None):
+        """Queues an atomic group's changed (source, data_type, value) items on every OBS target as one batch."""
+        if not self._output_targets() or not items: return False
+        # The group goes out as one batch, so wait (bounded) for its images rather than sending them separately
+        jobs = [self._prescale_image(source_name, data_type, value) for source_name, data_type, value in items]
+        wait_futures([job for job in jobs if job is not None], timeout=ATOMIC_PRESCALE_WAIT_SECONDS)
+        items = [(source_name, data_type, self._prescaled_value(job, value)) for (source_name, data_type, value), job in zip(items, jobs)]
+        try:
+            execution_type = ATOMIC_BATCH_MODES.get(atomic_mode, ATOMIC_BATCH_MODES[DEFAULT_ATOMIC_BATCH_MODE])
+            return any([target.enqueue_group(group_name, items, execution_type, force=force, traces=traces) for target in self._output_targets()])
+        except Exception as e:
+            logging.exception(f"Unexpected OBS update error for atomic group '{group_name}': {e}")
+            self.update_status(f"Unexpected OBS Error for group '{group_name}': {e}", "error");
+            return False
 
-            except obs.ConnectionFailure:
-                logging.error("OBS Connection Lost during update."); self.update_status("OBS Connection Lost.", "error"); self.obs_connected = False
-                self.root.after(0, self.update_obs_status_label, "Disconnected", DANGER); return False
-            except OBSSDKRequestError as e:
-                # More specific error logging
-                err_details = str(e)
-                if "NotFound" in err_details:
-                     log_msg = f"OBS Error: Source '{source_name}' not found."
-                     status_level = "warning" # Treat not found as warning? Or error?
-                elif "InvalidData" in err_details: # Example, might be different
-                     log_msg = f"OBS Error: Invalid data/setting for '{source_name}' (Type: {data_type}). Check input."
-                     status_level = "error"
-                else:
-                     log_msg = f"Failed OBS update '{source_name}': {e}"
-                     status_level = "error"
-                logging.error(log_msg)
-                self.update_status(log_msg, status_level)
-                return False
-            except FileNotFoundError: # Catch local file not found before sending absolute path
-                 # This applies to Image and Media File after abspath
-                 logging.error(f"{data_type} file not found for OBS update '{source_name}': {value_str}");
-                 self.update_status(f"Error: {data_type} file not found for '{source_name}'", "error");
-                 return False
-            except Exception as e:
-                logging.exception(f"Unexpected OBS update error '{source_name}' ({data_type}): {e}")
-                self.update_status(f"Unexpected OBS Error for '{source_name}': {e}", "error");
-                return False
     # --- Data Handling (Excel Cache - Unchanged) ---
     def _ensure_excel_cache(self, force_read=False):
         file = self.file_path.get(); sheet = self.sheet_name.get()
         if not file or not sheet:
-            if self.cached_df is not None: logging.info("Clearing Excel cache due to missing file/sheet path."); self.cached_df = None; self.last_excel_mtime = None
+            if self.cached_df is not None: logging.info("Clearing Excel cache due to missing file/sheet path."); self.cached_df = None; self.last_excel_mtime = None; self._mark_inputs_changed()
             return False
-        if not os.path.exists(file):
-            if self.cached_df is not None: logging.warning(f"Excel file not found: {file}. Clearing cache."); self.cached_df = None; self.last_excel_mtime = None
+        try: current_mtime = os.stat(file).st_mtime  # one stat per tick; exists() plus getmtime() was two
+        except FileNotFoundError:
+            if self.cached_df is not None: logging.warning(f"Excel file not found: {file}. Clearing cache."); self.cached_df = None; self.last_excel_mtime = None; self._mark_inputs_changed()
             return False
-        try: current_mtime = os.path.getmtime(file)
-        except OSError as e: logging.error(f"Cannot get modification time for {file}: {e}"); self.cached_df = None; self.last_excel_mtime = None; return False
+        except OSError as e:
+            logging.error(f"Cannot get modification time for {file}: {e}")
+            if self.cached_df is not None: self._mark_inputs_changed()
+            self.cached_df = None; self.last_excel_mtime = None; return False
         with self.excel_read_lock:
             if force_read or self.cached_df is None or current_mtime != self.last_excel_mtime:
                 logging.debug(f"Reading Excel file '{os.path.basename(file)}' sheet '{sheet}'. Reason: {'Forced' if force_read else 'Cache miss or file changed'}")
                 try:
                     start_time = time.time(); self.cached_df = pd.read_excel(file, sheet_name=sheet, engine='openpyxl', header=None, index_col=None)
-                    read_time = time.time() - start_time; self.last_excel_mtime = current_mtime
+                    try: self.cached_images = self.embedded_images.extract(file, sheet)
+                    except (zipfile.BadZipFile, ET.ParseError, KeyError, ValueError, OSError) as e: logging.warning(f"Could not read embedded pictures: {e}"); self.cached_images = {}
+                    read_time = time.time() - start_time; self.last_excel_mtime = current_mtime; self._mark_inputs_changed(); WORKBOOK_RELOAD_SECONDS.observe(read_time); FLIGHT.record(EVENT_RELOAD, os.path.basename(file), value=read_time)
+                    self.last_reload = {"parse_start": start_time, "parse_end": start_time + read_time}
+                    if not force_read: self.last_reload.update(file_mtime=current_mtime, detected=start_time)  # a forced read says nothing about when the file was saved
                     logging.info(f"Excel cache updated in {read_time:.3f}s. Shape: {self.cached_df.shape}")
                     return True
                 except Exception as e:
-                    self.cached_df = None; self.last_excel_mtime = None
+                    self.cached_df = None; self.last_excel_mtime = None; self._mark_inputs_changed()
                     log_msg = f"Error reading Excel: {e}";
                     if "No sheet named" in str(e): log_msg = f"Error: Sheet '{sheet}' not found."
                     logging.error(log_msg + f" (File: {file})")
                     return False
             else: return True
 
-    def _get_cell_value_from_cache(self, row, col):
+    def _get_cell_value_from_cache(self, row, col, data_type=None):
         value = None; error = False
         with self.excel_read_lock:
+            pushed = self.pushed_values.get(self.sheet_name.get())
+            if pushed and (row, col) in pushed: return pushed[(row, col)]
+            # An image mapping on an empty cell takes the picture pasted over it; a path typed into the cell wins
+            picture = self.cached_images.get((row, col)) if DATA_TYPE_CATEGORIES.get(data_type) == "image" and self.cached_df is not None else None
+            if picture is not None:
+                shape = self.cached_df.shape
+                if not (row < shape[0] and col < shape[1]) or pd.isna(self.cached_df.iloc[row, col]) or str(self.cached_df.iloc[row, col]).strip() == "": return picture
             if self.cached_df is not None:
                 try:
                     if 0 <= row < self.cached_df.shape[0] and 0 <= col < self.cached_df.shape[1]:
@@ -526,25 +1898,40 @@ class ExcelToOBS:
         return None if error else value
 
     def update_obs_data(self, check_changes=False):
-        # (Unchanged - calls updated send_update_to_obs)
+        start_time = time.perf_counter(); queued = 0
+        try: queued = self._update_obs_data(check_changes)
+        finally:
+            elapsed = time.perf_counter() - start_time; self.last_cycle_seconds = elapsed
+            UPDATE_CYCLE_SECONDS.observe_labeled(elapsed, UPDATE_CYCLE_LABELS[check_changes]); FLIGHT.record(EVENT_CYCLE, detail=queued or 0, value=elapsed)
+            if elapsed > FLIGHT_RECORDER_SLOW_CYCLE_SECONDS: logging.warning(f"Update pass took {elapsed:.2f}s."); FLIGHT.trigger("slow-cycle")
+
+    def _update_obs_data(self, check_changes):
+        cycle_start = time.time()
         cache_valid = self._ensure_excel_cache(force_read=not check_changes)
         current_df = None
         with self.excel_read_lock:
             if cache_valid and self.cached_df is not None: current_df = self.cached_df
-        if current_df is None:
+        # Idle tick: nothing feeding the diff changed since a pass that found nothing to do, so there is nothing to walk
+        generation = self.change_generation
+        if check_changes and generation == self.quiet_generation: return 0
+        if current_df is None and not self.pushed_values.get(self.sheet_name.get()):
             if not check_changes: self.update_status("Cannot update OBS: Failed to read or cache Excel file.", "error")
             logging.warning("update_obs_data skipped: No valid Excel data available.")
             for group_data in self.inputs_data:
                 for mapping_data in group_data["mappings"]:
                     if mapping_data.get("value_label"):
-                        try: warn_style = self._get_style_name(WARNING); mapping_data["value_label"].config(text="Read?", style=warn_style)
+                        try: self._set_value_label(mapping_data, "Read?", WARNING)
                         except Exception as e: logging.error(f"Error setting 'Read?' label: {e}")
+            if check_changes: self.quiet_generation = generation  # warned once; the next read or edit brings the walk back
             return
-        updates_sent, updates_attempted, mappings_processed = 0, 0, 0
-        df_rows, df_cols = current_df.shape
+        updates_sent, updates_attempted, mappings_processed, changes_seen = 0, 0, 0, 0
+        # Changes found in this pass carry the timestamps of the read that revealed them (none if the workbook was not reread)
+        reload_trace = dict(self.last_reload) if self.last_reload.get("parse_start", 0) >= cycle_start else {}
+        df_rows, df_cols = current_df.shape if current_df is not None else (0, 0)
         for group_index, group_data in enumerate(self.inputs_data):
             group_name = group_data["name_var"].get()
             if not group_data.get("is_expanded", True): mappings_processed += len(group_data["mappings"]); continue # Skip collapsed
+            is_atomic = group_data["atomic"].get() == 1; atomic_items = []; atomic_traces = {}
             for mapping_index, mapping_data in enumerate(group_data["mappings"]):
                 mappings_processed += 1
                 row_str, col_str = mapping_data["row"].get().strip(), mapping_data["col"].get().strip()
@@ -557,60 +1944,73 @@ class ExcelToOBS:
                 if not row_str.isdigit() or not col_str.isdigit():
                     if is_auto_update or not check_changes: logging.warning(f"Skipping Group '{group_name}' Mapping {mapping_index+1}: Invalid row/col '{row_str}'/'{col_str}'.")
                     label_text, label_style_constant = "Num?", WARNING
-                    try: label_widget.config(text=label_text, style=self._get_style_name(label_style_constant))
+                    try: self._set_value_label(mapping_data, label_text, label_style_constant)
                     except TclError as e: logging.error(f"TclError configuring label for Num? ({group_index},{mapping_index}): {e}")
                     continue
-                row, col = int(row_str) - 1, int(col_str) - 1; cell_id = (row, col)
-                if not (0 <= row < df_rows and 0 <= col < df_cols):
-                    if is_auto_update or not check_changes: logging.warning(f"Skipping Group '{group_name}' Mapping {mapping_index+1}: Cell [{row+1},{col+1}] out of range {current_df.shape}.")
+                # Keyed per mapping (source + cell) so two mappings on one cell never mark each other as sent
+                row, col = int(row_str) - 1, int(col_str) - 1; mapping_key = (source_name, row, col)
+                if not (0 <= row < df_rows and 0 <= col < df_cols) and not self._has_cell_overlay(row, col):
+                    if is_auto_update or not check_changes: logging.warning(f"Skipping Group '{group_name}' Mapping {mapping_index+1}: Cell [{row+1},{col+1}] out of range {(df_rows, df_cols)}.")
                     label_text, label_style_constant = "Range?", WARNING
-                    try: label_widget.config(text=label_text, style=self._get_style_name(label_style_constant))
+                    try: self._set_value_label(mapping_data, label_text, label_style_constant)
                     except TclError as e: logging.error(f"TclError configuring label for Range? ({group_index},{mapping_index}): {e}")
                     continue
                 try:
-                    value = self._get_cell_value_from_cache(row, col)
+                    value = self._get_cell_value_from_cache(row, col, data_type)
                     if value is None:
                         label_text, label_style_constant = "Read?", WARNING
-                        try: label_widget.config(text=label_text, style=self._get_style_name(label_style_constant))
+                        try: self._set_value_label(mapping_data, label_text, label_style_constant)
                         except TclError as e: logging.error(f"TclError configuring label for Read? ({group_index},{mapping_index}): {e}")
                         continue
                     value_str_display = str(value); label_text = value_str_display[:50] + ('...' if len(value_str_display) > 50 else '')
-                    should_update_obs = False; _sentinel = object(); previous_value = self.previous_values.get(cell_id, _sentinel)
-                    changed = (previous_value is not _sentinel and previous_value != value)
+                    should_update_obs = False; previous_value = self.previous_values.get(mapping_key, _MISSING)
+                    changed = (previous_value is not _MISSING and previous_value != value)
                     label_style_constant = INFO if changed else DEFAULT
-                    try: label_widget.config(text=label_text, style=self._get_style_name(label_style_constant))
+                    if changed: changes_seen += 1
+                    try: self._set_value_label(mapping_data, label_text, label_style_constant)
                     except TclError as e:
                         logging.error(f"TclError configuring label before OBS update ({group_index},{mapping_index}): {e}")
                         try: label_widget.config(text=label_text + " (StyleErr!)")
                         except: pass
                     if not source_name:
-                        if changed: logging.debug(f"Change detected (no source): Group '{group_name}' Cell [{row+1},{col+1}]")
+                        # Nothing to send, so remember the value here or the mapping would read as changed on every pass
+                        if changed: logging.debug(f"Change detected (no source): Group '{group_name}' Cell [{row+1},{col+1}]"); self.previous_values[mapping_key] = value
                     elif check_changes:
-                        if previous_value is _sentinel or changed:
+                        if previous_value is _MISSING or changed:
                             if changed: logging.info(f"Change detected: Group '{group_name}' Source '{source_name}' Cell [{row+1},{col+1}]")
                             should_update_obs = True
                     else: should_update_obs = True
-                    if should_update_obs and source_name:
+                    trace = {**reload_trace, "source": source_name, "mapping": f"{group_name}!{get_column_letter(col + 1)}{row + 1}", "diff": time.time()} if should_update_obs else None
+                    if should_update_obs: FLIGHT.record(EVENT_CHANGE, source_name)
+                    if should_update_obs and source_name and is_atomic:
+                        updates_attempted += 1; atomic_items.append((mapping_key, source_name, data_type, value)); atomic_traces[source_name] = trace
+                    elif should_update_obs and source_name:
                         updates_attempted += 1
-                        if self.send_update_to_obs(data_type, value, source_name):
-                            updates_sent += 1; self.previous_values[cell_id] = value
+                        if self.send_update_to_obs(data_type, value, source_name, force=not check_changes, trace=trace):
+                            updates_sent += 1; self.previous_values[mapping_key] = value
                         else:
                             fail_style = WARNING if changed else DANGER
-                            try: label_widget.config(style=self._get_style_name(fail_style))
+                            try: self._set_value_label(mapping_data, label_text, fail_style)
                             except TclError as e:
                                 logging.error(f"TclError configuring label on OBS fail ({group_index},{mapping_index}): {e}")
                                 try: label_widget.config(text=label_text + " (SendFail!)")
                                 except: pass
-                    if previous_value is _sentinel: self.previous_values[cell_id] = value
+                    if previous_value is _MISSING: self.previous_values[mapping_key] = value
                 except Exception as cell_error:
                     logging.error(f"Error processing Group '{group_name}' Mapping {mapping_index+1} Cell [{row+1},{col+1}] Source '{source_name}': {cell_error}")
-                    try: label_widget.config(text="Error", style=self._get_style_name(DANGER))
+                    changes_seen += 1  # the error stays on the label; retry it on the next pass
+                    try: self._set_value_label(mapping_data, "Error", DANGER)
                     except TclError as e:
                          logging.error(f"TclError configuring label on cell processing error ({group_index},{mapping_index}): {e}")
                          try: label_widget.config(text="Error (StyleErr!)")
                          except: pass
-        if not check_changes: status = f"Manual update: Processed {mappings_processed}, Attempted {updates_attempted}, Successful {updates_sent}."; log_level = "success" if updates_sent > 0 else ("warning" if updates_attempted > 0 else "info"); self.update_status(status, log_level)
-        elif updates_sent > 0: logging.info(f"Auto-update: Sent {updates_sent} changes.")
+            if atomic_items and self.send_group_update_to_obs(group_name, [item[1:] for item in atomic_items], group_data["atomic_mode"].get(), force=not check_changes, traces=atomic_traces):
+                updates_sent += len(atomic_items)
+                for mapping_key, _, _, value in atomic_items: self.previous_values[mapping_key] = value
+        if check_changes and updates_attempted == 0 and changes_seen == 0: self.quiet_generation = generation
+        if not check_changes: status = f"Manual update: Processed {mappings_processed}, Attempted {updates_attempted}, Queued {updates_sent}."; log_level = "success" if updates_sent > 0 else ("warning" if updates_attempted > 0 else "info"); self.update_status(status, log_level)
+        elif updates_sent > 0: logging.info(f"Auto-update: Queued {updates_sent} changes.")
+        return updates_sent
 
     def start_update_thread(self):
         if self.update_thread is None or not self.update_thread.is_alive():
@@ -622,28 +2022,35 @@ class ExcelToOBS:
         while self.running:
             start_cycle = time.time()
             try:
-                with self.obs_connection_lock: is_connected = self.obs_connected
-                if is_connected:
-                    auto_update_enabled = False
-                    try:
-                        current_groups = list(self.inputs_data)
-                        for group_data in current_groups:
-                            if group_data.get("is_expanded", True) and any(m["auto_update"].get() == 1 for m in group_data["mappings"]):
-                                auto_update_enabled = True; break
-                    except Exception as e: logging.error(f"Error checking auto-update status in loop: {e}"); auto_update_enabled = False
-                    if auto_update_enabled: self.update_obs_data(check_changes=True)
+                # Targets queue changes while reconnecting, so keep diffing as long as any target is configured
+                if (self.obs_targets or self.text_sink is not None) and self._auto_update_enabled():
+                    cycle_profile_path = self.profiler.claim_cycle_profile()
+                    if cycle_profile_path: self._profile_update_cycle(cycle_profile_path)
+                    else: self.update_obs_data(check_changes=True)
+                self._publish_overlays(); self._publish_shared_snapshot()
+                if self.perf_panel_open and start_cycle - self.last_perf_snapshot >= PERF_SNAPSHOT_INTERVAL_SECONDS: self.last_perf_snapshot = start_cycle; self.perf_snapshot = self._build_perf_snapshot()
+                if start_cycle - self.last_prune >= STATE_PRUNE_INTERVAL_SECONDS: self.last_prune = start_cycle; self._prune_stale_state()
                 elapsed = time.time() - start_cycle; sleep_time = max(0, UPDATE_INTERVAL_SECONDS - elapsed)
-                sleep_chunk = 0.1
-                while self.running and sleep_time > 0: actual_sleep = min(sleep_chunk, sleep_time); time.sleep(actual_sleep); sleep_time -= actual_sleep
+                # A push wakes the loop early so pushed values are diffed and dispatched without waiting out the interval
+                if self.running and self.update_wakeup.wait(sleep_time): self.update_wakeup.clear()
             except Exception as e: logging.exception(f"Error in periodic update loop: {e}"); time.sleep(5)
         logging.info("Periodic update loop stopped.")
 
+    def _auto_update_enabled(self):
+        """Whether any expanded group has an auto-update mapping; rescanned only after _mark_inputs_changed."""
+        generation = self.change_generation
+        if generation != self.auto_update_generation:
+            try: self.auto_update_cached = any(group_data.get("is_expanded", True) and any(m["auto_update"].get() == 1 for m in group_data["mappings"]) for group_data in list(self.inputs_data))
+            except Exception as e: logging.error(f"Error checking auto-update status in loop: {e}"); self.auto_update_cached = False
+            self.auto_update_generation = generation
+        return self.auto_update_cached
+
     def export_settings(self):
         logging.info("Exporting settings...")
-        settings_data = {"obs_settings": {"host": self.obs_host_var.get(), "port": self.obs_port_var.get(), "password": self.obs_password_var.get()},"excel_settings": {"file_path": self.file_path.get(), "sheet_name": self.sheet_name.get()},"mapping_groups": [] }
+        settings_data = {"obs_settings": {"host": self.obs_host_var.get(), "port": self.obs_port_var.get(), "password": self.obs_password_var.get(), "extra_targets": self.obs_extra_targets_var.get(), "defer_hidden_sources": self.defer_hidden_var.get(), "local_api_enabled": self.local_api_enabled_var.get(), "local_api_port": self.local_api_port_var.get(), "local_api_token": self.local_api_token, "text_file_folder": self.text_sink_dir_var.get(), "shared_snapshot": self.shared_snapshot_var.get()},"excel_settings": {"file_path": self.file_path.get(), "sheet_name": self.sheet_name.get(), "image_max_size": self.image_prescale_var.get(), "image_format": self.image_format_var.get()},"mapping_groups": [] }
         for group_index, group_data in enumerate(self.inputs_data):
             try:
-                group_export = {"group_name": group_data["name_var"].get(), "mappings": []}
+                group_export = {"group_name": group_data["name_var"].get(), "atomic": group_data["atomic"].get(), "atomic_mode": group_data["atomic_mode"].get(), "mappings": []}
                 for mapping_index, mapping_data in enumerate(group_data["mappings"]):
                      try: group_export["mappings"].append({"type": mapping_data["data_type"].get(), "name": mapping_data["name"].get(), "row": mapping_data["row"].get(), "col": mapping_data["col"].get(), "auto_update": mapping_data["auto_update"].get()})
                      except Exception as map_e: logging.error(f"Error exporting mapping ({group_index},{mapping_index}): {map_e}")
@@ -661,56 +2068,92 @@ class ExcelToOBS:
         try:
             file_path = filedialog.askopenfilename(title="Import Settings From", filetypes=[("JSON files", "*.json"), ("All files", "*.*")])
             if not file_path: logging.info("Import cancelled."); self.update_status("Import cancelled."); return
-            with open(file_path, 'r', encoding='utf-8') as f: settings_data = json.load(f)
-            obs_cfg = settings_data.get("obs_settings", {}); excel_cfg = settings_data.get("excel_settings", {})
-            self.obs_host_var.set(obs_cfg.get("host", DEFAULT_OBS_WS_HOST)); self.obs_port_var.set(str(obs_cfg.get("port", DEFAULT_OBS_WS_PORT))); self.obs_password_var.set(obs_cfg.get("password", DEFAULT_OBS_WS_PASSWORD))
-            self.file_path.set(excel_cfg.get("file_path", "")); self.sheet_name.set(excel_cfg.get("sheet_name", ""))
-            with self.excel_read_lock: self.last_excel_mtime = None; self.cached_df = None
-            self.previous_values.clear()
-            logging.debug("Clearing existing groups UI and data...")
-            widgets_to_destroy = list(self.groups_container_frame.winfo_children())
-            for widget in widgets_to_destroy:
-                try: widget.destroy()
-                except Exception as destroy_e: logging.warning(f"Error destroying group widget during import clear: {destroy_e}")
-            self.inputs_data.clear(); logging.debug("Existing groups cleared.")
-            if "mappings" in settings_data and "mapping_groups" not in settings_data:
-                 logging.warning("Importing legacy settings format. Creating a single default group.")
-                 imported_groups = [{"group_name": DEFAULT_GROUP_NAME, "mappings": settings_data.get("mappings", [])}]
-            else: imported_groups = settings_data.get("mapping_groups", [])
-            if not isinstance(imported_groups, list): raise ValueError("'mapping_groups' must be a list.")
-            logging.debug(f"Importing {len(imported_groups)} groups.")
-            if not imported_groups: self.add_group(group_name=DEFAULT_GROUP_NAME)
-            else:
-                for group_import_data in imported_groups: self.add_group(group_data=group_import_data)
-            logging.info(f"Settings imported from {file_path}"); self.update_status(f"Settings imported from {os.path.basename(file_path)}", "success")
-            self.update_all_value_labels(); self.update_status("Settings imported. Reconnect to OBS if needed.", "info")
+            self.load_settings_file(file_path)
         except FileNotFoundError: logging.error(f"Import failed: File not found: {file_path}"); self.update_status("Error importing: File not found.", "error")
         except json.JSONDecodeError as e: logging.error(f"Import failed: Invalid JSON: {e}"); self.update_status(f"Error importing: Invalid JSON file.", "error")
         except Exception as e: logging.exception("Failed import settings."); self.update_status(f"Error importing settings: {e}", "error")
 
+    def load_settings_file(self, file_path):
+        """Applies an exported settings file; errors propagate to the caller (import dialog or headless start-up)."""
+        with open(file_path, 'r', encoding='utf-8') as f: settings_data = json.load(f)
+        obs_cfg = settings_data.get("obs_settings", {}); excel_cfg = settings_data.get("excel_settings", {})
+        self.obs_host_var.set(obs_cfg.get("host", DEFAULT_OBS_WS_HOST)); self.obs_port_var.set(str(obs_cfg.get("port", DEFAULT_OBS_WS_PORT))); self.obs_password_var.set(obs_cfg.get("password", DEFAULT_OBS_WS_PASSWORD))
+        extra_targets = obs_cfg.get("extra_targets", ""); self.obs_extra_targets_var.set(", ".join(extra_targets) if isinstance(extra_targets, list) else str(extra_targets))
+        self.defer_hidden_var.set(int(obs_cfg.get("defer_hidden_sources", DEFAULT_DEFER_HIDDEN_SOURCES))); self._apply_defer_hidden()
+        self.local_api_enabled_var.set(int(obs_cfg.get("local_api_enabled", DEFAULT_LOCAL_API_ENABLED))); self.local_api_port_var.set(str(obs_cfg.get("local_api_port", DEFAULT_LOCAL_API_PORT))); self.local_api_token = str(obs_cfg.get("local_api_token") or ""); self._apply_local_api()
+        self.text_sink_dir_var.set(obs_cfg.get("text_file_folder", "")); self._apply_text_sink()
+        self.shared_snapshot_var.set(int(obs_cfg.get("shared_snapshot", DEFAULT_SHARED_SNAPSHOT_ENABLED))); self._apply_shared_snapshot()
+        self.file_path.set(excel_cfg.get("file_path", "")); self.sheet_name.set(excel_cfg.get("sheet_name", ""))
+        image_format = excel_cfg.get("image_format", DEFAULT_IMAGE_PRESCALE_FORMAT)
+        self.image_prescale_var.set(excel_cfg.get("image_max_size", "")); self.image_format_var.set(image_format if image_format in IMAGE_PRESCALE_FORMATS else DEFAULT_IMAGE_PRESCALE_FORMAT)
+        with self.excel_read_lock: self.last_excel_mtime = None; self.cached_df = None
+        self.previous_values.clear(); self._mark_inputs_changed()
+        logging.debug("Clearing existing groups UI and data...")
+        widgets_to_destroy = [] if self.headless else list(self.groups_container_frame.winfo_children())
+        for widget in widgets_to_destroy:
+            try: widget.destroy()
+            except Exception as destroy_e: logging.warning(f"Error destroying group widget during import clear: {destroy_e}")
+        self.inputs_data.clear(); logging.debug("Existing groups cleared.")
+        if "mappings" in settings_data and "mapping_groups" not in settings_data:
+             logging.warning("Importing legacy settings format. Creating a single default group.")
+             imported_groups = [{"group_name": DEFAULT_GROUP_NAME, "mappings": settings_data.get("mappings", [])}]
+        else: imported_groups = settings_data.get("mapping_groups", [])
+        if not isinstance(imported_groups, list): raise ValueError("'mapping_groups' must be a list.")
+        logging.debug(f"Importing {len(imported_groups)} groups.")
+        if not imported_groups: self.add_group(group_name=DEFAULT_GROUP_NAME)
+        else:
+            for group_import_data in imported_groups: self.add_group(group_data=group_import_data)
+        logging.info(f"Settings imported from {file_path}"); self.update_status(f"Settings imported from {os.path.basename(file_path)}", "success")
+        if not self.headless: self.update_all_value_labels(); self.update_status("Settings imported. Reconnect to OBS if needed.", "info")
+
     def stop(self):
         if not self.running: return
-        logging.info("Stop requested. Shutting down..."); self.update_status("Exiting...", "info"); self.running = False
+        logging.info("Stop requested. Shutting down..."); self.update_status("Exiting...", "info"); self.running = False; self.update_wakeup.set()
+        if self.local_api is not None: self.local_api.stop()
         if self.update_thread and self.update_thread.is_alive():
             logging.debug("Waiting for update thread..."); self.update_thread.join(timeout=max(1.0, UPDATE_INTERVAL_SECONDS * 2))
             if self.update_thread.is_alive(): logging.warning("Update thread did not stop gracefully.")
-        obs_client_local = None
-        with self.obs_connection_lock:
-             if self.obs_client and self.obs_connected: obs_client_local = self.obs_client; self.obs_connected = False; self.obs_client = None
-        if obs_client_local:
-             logging.info("Disconnecting from OBS...");
-             try:
-                 disconnect_thread = threading.Thread(target=obs_client_local.disconnect, daemon=True, name="OBSFinalDisconnect"); disconnect_thread.start()
-                 disconnect_thread.join(timeout=DISCONNECT_TIMEOUT_SECONDS)
-                 if disconnect_thread.is_alive(): logging.warning("OBS disconnection timed out.")
-             except Exception as e: logging.error(f"Error during final OBS disconnection: {e}")
+        if self.obs_targets:
+             logging.info("Disconnecting from OBS...")
+             for target in self.obs_targets: target.stop(wait=False)
+             for target in self.obs_targets: target.stop()
+        if self.image_assets: self.image_assets.shutdown()
+        if self.text_sink is not None: self.text_sink.stop()
+        if self.shared_snapshot is not None: self.shared_snapshot.close()
+        self.file_watcher.stop(); self.memory_diagnostics.stop()
         logging.info("Destroying root window.")
         try:
              if self.root and self.root.winfo_exists(): self.root.destroy()
              else: logging.info("Root window already destroyed or doesn't exist.")
         except Exception as e: logging.error(f"Error destroying root window: {e}")
 
+def run_headless(settings_path, diagnostics_interval=None):
+    """Runs the update pipeline from an exported settings file without a window, until Ctrl+C.
+    With diagnostics_interval, memory diagnostics run from the start and their report is logged at that interval."""
+    app = ExcelToOBS()
+    try: app.load_settings_file(settings_path)
+    except (OSError, ValueError) as e: logging.error(f"Cannot load settings '{settings_path}': {e}"); app.stop(); return 1
+    app.start_update_thread(); app.connect_obs(); logging.info(f"Running headless with {sum(len(g['mappings']) for g in app.inputs_data)} mappings. Press Ctrl+C to stop.")
+    if diagnostics_interval: app.memory_diagnostics.start(diagnostics_interval)
+    profile_signal = getattr(signal, "SIGUSR1", None) or getattr(signal, "SIGBREAK", None)  # SIGBREAK is Ctrl+Break on Windows
+    if profile_signal is not None:
+        signal.signal(profile_signal, lambda signum, frame: app.start_profile()); logging.info(f"Send {signal.Signals(profile_signal).name} to pid {os.getpid()} to capture a {PROFILE_WINDOW_SECONDS}s profile.")
+    next_report = time.time() + (diagnostics_interval or 0)
+    try:
+        while app.running:
+            time.sleep(0.5)
+            if diagnostics_interval and time.time() >= next_report: next_report += diagnostics_interval; logging.info(format_memory_report(app.memory_diagnostics.report()))
+    except KeyboardInterrupt: logging.info("KeyboardInterrupt received. Stopping...")
+    if diagnostics_interval: app.memory_diagnostics.sample(); logging.info(format_memory_report(app.memory_diagnostics.report()))
+    app.stop(); return 0
+
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Excel2OBS")
+    parser.add_argument("--headless", metavar="SETTINGS_JSON", help="run without a window, using an exported settings file")
+    parser.add_argument("--diagnostics", type=float, metavar="SECONDS", help="with --headless: track memory (tracemalloc + RSS) and log a report this often")
+    args = parser.parse_args()
+    if args.headless: raise SystemExit(run_headless(args.headless, args.diagnostics))
     root = ttk.Window(themename=DEFAULT_THEME, minsize=(710, 550))
     app = ExcelToOBS(root)
     try: root.mainloop()
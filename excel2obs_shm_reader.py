@@ -0,0 +1,85 @@
+"""Reads the mapped-value snapshot Excel2OBS publishes in shared memory ("Share values in memory").
+
+    from excel2obs_shm_reader import SnapshotReader
+    with SnapshotReader() as reader:
+        sequence, snapshot = reader.read()
+        print(snapshot["sources"]["Score"], snapshot["cells"]["B3"])
+
+Run directly to print the snapshot, or with --watch to print every new version. When a second Excel2OBS instance
+finds the default segment owned by a running one, it publishes to "excel2obs_snapshot-<its pid>" (logged); pass --name.
+The layout below must match SharedSnapshotWriter in excel2obs_snapshot.py.
+"""
+import argparse
+import json
+import struct
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+SHARED_SNAPSHOT_NAME = "excel2obs_snapshot"
+SHARED_SNAPSHOT_MAGIC = b"E2OS"
+SHARED_SNAPSHOT_VERSION = 2
+SHARED_SNAPSHOT_HEADER = struct.Struct("<4sIQIII")  # magic, version, sequence (odd while writing), payload length, capacity, owner pid
+SEQUENCE = struct.Struct("<Q")  # at offset 8
+READ_RETRY_SECONDS = 1.0
+
+class SnapshotReader:
+    """Attaches to the segment read-only by convention; never unlinks it."""
+    def __init__(self, name=SHARED_SNAPSHOT_NAME):
+        if sys.version_info >= (3, 13): self.shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            # Before 3.13 attaching registers the segment with this process's resource tracker, which would unlink it on exit
+            try: resource_tracker.unregister(self.shm._name, "shared_memory")
+            except Exception: pass
+        magic, version, _, _, _, _ = SHARED_SNAPSHOT_HEADER.unpack_from(self.shm.buf, 0)
+        if magic != SHARED_SNAPSHOT_MAGIC or version != SHARED_SNAPSHOT_VERSION:
+            self.shm.close(); raise ValueError(f"'{name}' is not an Excel2OBS snapshot (version {SHARED_SNAPSHOT_VERSION})")
+
+    def sequence(self):
+        """Version counter: even and increasing; a changed value means a new snapshot."""
+        return SEQUENCE.unpack_from(self.shm.buf, 8)[0]
+
+    def read_bytes(self, timeout=READ_RETRY_SECONDS):
+        """Returns (sequence, payload bytes) copied while no write was in progress."""
+        buf, deadline = self.shm.buf, time.monotonic() + timeout
+        while True:
+            before = SEQUENCE.unpack_from(buf, 8)[0]
+            if not before & 1:
+                _, _, _, length, capacity, _ = SHARED_SNAPSHOT_HEADER.unpack_from(buf, 0)
+                payload = bytes(buf[SHARED_SNAPSHOT_HEADER.size:SHARED_SNAPSHOT_HEADER.size + min(length, capacity)])
+                if SEQUENCE.unpack_from(buf, 8)[0] == before: return before, payload
+            if time.monotonic() > deadline: raise TimeoutError("snapshot kept changing while being read")
+            time.sleep(0)
+
+    def read(self, timeout=READ_RETRY_SECONDS):
+        """Returns (sequence, snapshot dict) with "file", "sheet", "cells" (by address) and "sources" (by OBS source name)."""
+        sequence, payload = self.read_bytes(timeout)
+        return sequence, json.loads(payload) if payload else {}
+
+    def close(self): self.shm.close()
+
+    def __enter__(self): return self
+
+    def __exit__(self, *exc): self.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--name", default=SHARED_SNAPSHOT_NAME, help="shared memory segment name")
+    parser.add_argument("--watch", action="store_true", help="print every new snapshot until interrupted")
+    parser.add_argument("--interval", type=float, default=0.05, help="poll interval in seconds for --watch")
+    args = parser.parse_args()
+    try: reader = SnapshotReader(args.name)
+    except FileNotFoundError: sys.exit(f"No snapshot '{args.name}': enable \"Share values in memory\" in Excel2OBS.")
+    with reader:
+        last = None
+        while True:
+            if reader.sequence() != last:
+                last, snapshot = reader.read()
+                print(json.dumps({"sequence": last, **snapshot}, ensure_ascii=False), flush=True)
+            if not args.watch: return
+            try: time.sleep(args.interval)
+            except KeyboardInterrupt: return
+
+if __name__ == "__main__":
+    main()
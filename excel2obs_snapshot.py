@@ -0,0 +1,85 @@
+"""Shared-memory snapshot of mapped values for other local processes. The layout must match excel2obs_shm_reader.py."""
+import json
+import logging
+import os
+import struct
+import sys
+from multiprocessing import resource_tracker, shared_memory
+
+try: import psutil
+except ImportError: psutil = None  # optional: without it pid_alive uses os.kill(pid, 0) (and cannot tell on Windows)
+
+# Shared-memory snapshot of mapped values for other local processes; layout must match excel2obs_shm_reader.py
+SHARED_SNAPSHOT_NAME = "excel2obs_snapshot"
+SHARED_SNAPSHOT_SIZE = 1 << 20
+SHARED_SNAPSHOT_MAGIC = b"E2OS"
+SHARED_SNAPSHOT_VERSION = 2
+SHARED_SNAPSHOT_HEADER = struct.Struct("<4sIQIII")  # magic, version, sequence (odd while writing), payload length, capacity, owner pid
+
+# --- Shared-Memory Snapshot ---
+def pid_alive(pid):
+    """True unless pid is known not to run. Without psutil on Windows it cannot tell (os.kill there terminates) and says True;
+    Windows frees a segment with its last handle anyway, so an existing one always belongs to a running process."""
+    if psutil is not None: return psutil.pid_exists(pid)
+    if os.name == "nt": return True
+    try: os.kill(pid, 0)
+    except ProcessLookupError: return False
+    except PermissionError: return True
+    return True
+
+class SharedSnapshotWriter:
+    """Publishes a JSON snapshot into a shared_memory segment under a sequence lock.
+    The sequence is odd while the payload is rewritten; readers retry until they see the same even value before and after copying.
+    The header records the owning pid: a segment whose owner is gone is taken over, one whose owner still runs is left alone
+    and this instance publishes under '<name>-<pid>' instead (see self.name)."""
+    def __init__(self, name=SHARED_SNAPSHOT_NAME, size=SHARED_SNAPSHOT_SIZE):
+        try: self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            self.shm = shared_memory.SharedMemory(name=name); owner = self._owner_pid()
+            if owner is None or pid_alive(owner):
+                logging.warning(f"Shared memory '{name}' is in use by {f'pid {owner}' if owner else 'another program'}; publishing to '{name}-{os.getpid()}' instead.")
+                self._detach_foreign(); name = f"{name}-{os.getpid()}"
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            else:
+                logging.info(f"Taking over shared memory '{name}' left behind by pid {owner}.")
+                if self.shm.size < size: self.shm.close(); raise ValueError(f"Shared memory '{name}' exists and is too small ({self.shm.size} bytes)")
+        self.name, self.capacity = name, self.shm.size - SHARED_SNAPSHOT_HEADER.size
+        self.sequence, self.last_payload, self.warned = 0, None, False
+        SHARED_SNAPSHOT_HEADER.pack_into(self.shm.buf, 0, SHARED_SNAPSHOT_MAGIC, SHARED_SNAPSHOT_VERSION, self.sequence, 0, self.capacity, os.getpid())
+
+    def _detach_foreign(self):
+        """Closes a segment opened only to read its owner; before 3.13 opening registered it with this process's
+        resource tracker, which would otherwise unlink it under its owner when this process exits."""
+        if sys.version_info < (3, 13):
+            try: resource_tracker.unregister(self.shm._name, "shared_memory")
+            except Exception: pass
+        self.shm.close()
+
+    def _owner_pid(self):
+        """Pid in an Excel2OBS header of this version, else None (unknown layout: treat as somebody else's)."""
+        if self.shm.size < SHARED_SNAPSHOT_HEADER.size: return None
+        magic, version, _, _, _, owner = SHARED_SNAPSHOT_HEADER.unpack_from(self.shm.buf, 0)
+        return owner if magic == SHARED_SNAPSHOT_MAGIC and version == SHARED_SNAPSHOT_VERSION and owner else None
+
+    def publish(self, snapshot):
+        """Writes snapshot (JSON-able) if it differs from the last one. Returns True if written."""
+        payload = json.dumps(snapshot, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")
+        if payload == self.last_payload: return False
+        if len(payload) > self.capacity:
+            if not self.warned: logging.warning(f"Shared snapshot is {len(payload)} bytes, over the {self.capacity} byte segment; not publishing."); self.warned = True
+            return False
+        buf = self.shm.buf
+        self.sequence += 1; struct.pack_into("<Q", buf, 8, self.sequence)
+        buf[SHARED_SNAPSHOT_HEADER.size:SHARED_SNAPSHOT_HEADER.size + len(payload)] = payload
+        struct.pack_into("<I", buf, 16, len(payload))
+        self.sequence += 1; struct.pack_into("<Q", buf, 8, self.sequence)
+        self.last_payload, self.warned = payload, False
+        return True
+
+    def close(self):
+        """Unlinks the segment only while the header still names this process as its owner."""
+        owned = self._owner_pid() == os.getpid()
+        self.shm.close()
+        if not owned: return
+        try: self.shm.unlink()
+        except FileNotFoundError: pass
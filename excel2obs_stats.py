@@ -0,0 +1,13 @@
+"""Small statistics helpers shared by the app and its load harness (stdlib only, so the harness never imports the GUI stack)."""
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank value at `fraction` (0..1) of an already sorted list; None if it is empty."""
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))] if sorted_values else None
+
+def rss_slope_mb_per_hour(samples):
+    """Least-squares slope of [(time, rss_bytes)] in MB per hour; None with fewer than two samples."""
+    if len(samples) < 2: return None
+    mean_t = sum(t for t, _ in samples) / len(samples); mean_r = sum(r for _, r in samples) / len(samples)
+    spread = sum((t - mean_t) ** 2 for t, _ in samples)
+    if not spread: return None
+    return sum((t - mean_t) * (r - mean_r) for t, r in samples) / spread * 3600 / 2**20